@@ -36,12 +36,20 @@ setup(name='yobr',
       package_data={
           'yobr': ['*.png']
       },
-      install_requires=['setuptools', 'PyQt5'],
-      python_requires='>=3.4',
+      extras_require={
+          # `yobr-cli` doesn't need Qt
+          'gui': ['PyQt5'],
+      },
+      python_requires='>=3.7',
       entry_points={
           'gui_scripts': [
-              'yobr = yobr.ui:main',
-          ]
+              'yobr = yobr.ui:main [gui]',
+          ],
+          'console_scripts': [
+              'yobr-cli = yobr.cli:main',
+              'yobr-br-hook = yobr.hook:main',
+              'yobr-make = yobr.make:main',
+          ],
       },
       classifiers=[
           'Environment :: X11 Applications :: Qt',
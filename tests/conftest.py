@@ -0,0 +1,118 @@
+# Copyright (c) 2020 Philippe Proulx <eepp.ca>
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# fake Buildroot output trees
+
+import os
+import os.path
+import copy
+import pytest
+import yobr.br
+
+
+# small Buildroot `show-info` output
+#
+# `skeleton` isn't monitored: `libfoo`'s dependency on it is ignored.
+_BR_INFO = {
+    'host-m4': {
+        'type': 'host',
+        'version': '1.4.18',
+        'dependencies': [],
+    },
+    'host-bison': {
+        'type': 'host',
+        'version': '3.0.4',
+        'dependencies': ['host-m4'],
+    },
+    'zlib': {
+        'type': 'target',
+        'version': '1.2.11',
+        'install_target': True,
+        'install_staging': True,
+        'dependencies': [],
+    },
+    'libfoo': {
+        'type': 'target',
+        'version': '2.0',
+        'install_target': True,
+        'dependencies': ['host-bison', 'zlib', 'skeleton'],
+    },
+    'foo-headers': {
+        'type': 'target',
+        'version': '',
+        'dependencies': [],
+    },
+    'skeleton': {
+        'type': 'target',
+        'virtual': True,
+        'dependencies': [],
+    },
+}
+
+
+# `show-info` output of the fake Buildroot tree (new copy)
+@pytest.fixture
+def br_info():
+    return copy.deepcopy(_BR_INFO)
+
+
+# Buildroot build directory (`output/build`) of the fake tree
+@pytest.fixture
+def br_build_dir(tmp_path):
+    path = tmp_path / 'output' / 'build'
+    path.mkdir(parents=True)
+    return str(path)
+
+
+# package builds (dictionary) of `br_info` within `br_build_dir`
+@pytest.fixture
+def pkg_builds(br_info, br_build_dir):
+    pkg_infos = yobr.br.pkg_infos_from_br_info(br_info)
+    return yobr.br.pkg_builds_from_pkg_infos(pkg_infos, br_build_dir)
+
+
+# function which creates the stamp files of a package build (and its
+# build directory), optionally setting their modification time
+@pytest.fixture
+def touch_stamps():
+    def touch(pkg_build, *names, mtime=None):
+        os.makedirs(pkg_build.build_dir, exist_ok=True)
+
+        for name in names:
+            path = os.path.join(pkg_build.build_dir, '.stamp_' + name)
+
+            with open(path, 'w'):
+                pass
+
+            if mtime is not None:
+                os.utime(path, (mtime, mtime))
+
+    return touch
+
+
+# function which removes stamp files of a package build
+@pytest.fixture
+def remove_stamps():
+    def remove(pkg_build, *names):
+        for name in names:
+            os.remove(os.path.join(pkg_build.build_dir, '.stamp_' + name))
+
+    return remove
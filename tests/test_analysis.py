@@ -0,0 +1,373 @@
+# Copyright (c) 2020 Philippe Proulx <eepp.ca>
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# build analyses: critical path and estimated time of arrival
+
+import random
+import pytest
+import yobr.br
+import yobr.analysis
+
+
+# package graph of which `deps` is a dictionary of package names to
+# the names of their direct dependencies
+def _graph(deps):
+    br_info = {name: {'type': 'host', 'version': '1', 'dependencies': dep_names}
+               for name, dep_names in deps.items()}
+    pkg_infos = yobr.br.pkg_infos_from_br_info(br_info)
+    return next(iter(pkg_infos.values())).graph
+
+
+def _id(graph, name):
+    return next(pi.id for pi in graph.pkg_infos if pi.name == name)
+
+
+# lengths of the longest paths ending at each package of the graph
+# `graph` having the package weights `weights` (full recompute)
+def _full_lengths(graph, weights):
+    lengths = {}
+
+    def length(pkg_id):
+        if pkg_id not in lengths:
+            lengths[pkg_id] = weights[pkg_id] + max((length(i) for i in graph.dependency_ids(pkg_id)),
+                                                    default=0.)
+
+        return lengths[pkg_id]
+
+    return [length(pkg_id) for pkg_id in range(len(graph))]
+
+
+# checks the critical path `cp` against a full recompute
+def _check(cp):
+    graph = cp.graph
+    weights = [cp.weight(i) for i in range(len(graph))]
+    lengths = _full_lengths(graph, weights)
+    assert cp.length == pytest.approx(max(lengths, default=0.))
+
+    if cp.length == 0:
+        assert cp.pkg_ids == ()
+        return
+
+    # a path of dependencies (with ties, any longest path is fine)
+    pkg_ids = cp.pkg_ids
+
+    for dep_id, pkg_id in zip(pkg_ids, pkg_ids[1:]):
+        assert dep_id in graph.dependency_ids(pkg_id)
+
+    assert sum(weights[i] for i in pkg_ids) == pytest.approx(cp.length)
+    assert weights[pkg_ids[0]] > 0
+    assert weights[pkg_ids[-1]] > 0
+
+
+# names of the packages of the critical path `cp`
+def _names(cp):
+    return [cp.graph.pkg_info(i).name for i in cp.pkg_ids]
+
+
+_DIAMOND = {
+    'a': [],
+    'b': ['a'],
+    'c': ['a'],
+    'd': ['b', 'c'],
+}
+
+
+def test_empty():
+    cp = yobr.analysis.CriticalPath(_graph(_DIAMOND))
+    assert not cp.update()
+    assert cp.pkg_ids == ()
+    assert cp.length == 0.
+
+
+def test_diamond():
+    graph = _graph(_DIAMOND)
+    cp = yobr.analysis.CriticalPath(graph)
+
+    for name, weight in [('a', 1.), ('b', 5.), ('c', 3.), ('d', 2.)]:
+        cp.set_weight(_id(graph, name), weight)
+
+    assert cp.update()
+    assert _names(cp) == ['a', 'b', 'd']
+    assert cp.length == 8.
+    _check(cp)
+
+    # other branch becomes longer
+    cp.set_weight(_id(graph, 'c'), 10.)
+    assert cp.update()
+    assert _names(cp) == ['a', 'c', 'd']
+    assert cp.length == 13.
+    _check(cp)
+
+    # same weight: no change
+    cp.set_weight(_id(graph, 'c'), 10.)
+    assert not cp.update()
+
+
+def test_out_of_order():
+    graph = _graph(_DIAMOND)
+    cp = yobr.analysis.CriticalPath(graph)
+
+    # dependant first (its dependencies don't have weights yet)
+    cp.set_weight(_id(graph, 'd'), 2.)
+    assert cp.update()
+    assert _names(cp) == ['d']
+    _check(cp)
+    cp.set_weight(_id(graph, 'c'), 3.)
+    assert cp.update()
+    assert _names(cp) == ['c', 'd']
+    _check(cp)
+    cp.set_weight(_id(graph, 'a'), 1.)
+    cp.set_weight(_id(graph, 'b'), 1.)
+    assert cp.update()
+    assert _names(cp) == ['a', 'c', 'd']
+    assert cp.length == 6.
+    _check(cp)
+
+
+def test_last_pkgs_without_weight():
+    graph = _graph(_DIAMOND)
+    cp = yobr.analysis.CriticalPath(graph)
+    cp.set_weight(_id(graph, 'a'), 4.)
+    cp.set_weight(_id(graph, 'b'), 1.)
+    cp.update()
+    assert _names(cp) == ['a', 'b']
+    assert cp.length == 5.
+
+
+def test_weight_decrease():
+    graph = _graph(_DIAMOND)
+    cp = yobr.analysis.CriticalPath(graph)
+
+    for name, weight in [('a', 1.), ('b', 5.), ('c', 3.), ('d', 2.)]:
+        cp.set_weight(_id(graph, name), weight)
+
+    cp.update()
+    cp.set_weight(_id(graph, 'b'), 1.)
+    assert cp.update()
+    assert _names(cp) == ['a', 'c', 'd']
+    assert cp.length == 6.
+    _check(cp)
+
+    # back to nothing
+    for pkg_id in range(len(graph)):
+        cp.set_weight(pkg_id, 0.)
+
+    assert cp.update()
+    _check(cp)
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_random_dag(seed):
+    rng = random.Random(seed)
+    count = 40
+    names = ['p{:02}'.format(i) for i in range(count)]
+
+    # dependencies always have a smaller index: no cycles
+    deps = {name: rng.sample(names[:i], min(i, rng.randrange(4)))
+            for i, name in enumerate(names)}
+    graph = _graph(deps)
+    cp = yobr.analysis.CriticalPath(graph)
+
+    for _ in range(30):
+        for _ in range(rng.randrange(1, 6)):
+            cp.set_weight(rng.randrange(count), float(rng.randrange(4)))
+
+        cp.update()
+        _check(cp)
+        weights = [cp.weight(i) for i in range(count)]
+        assert list(cp._lengths) == pytest.approx(_full_lengths(graph, weights))
+
+
+# stamp modification times of the fake package builds (relative to
+# `_T0`), in build order: `host-m4`, `zlib`, and then `host-bison`
+# (after `host-m4`) and `libfoo` (after `host-bison` and `zlib`)
+_T0 = 1500000000
+_STAMP_TIMES = [
+    ('host-m4', [('downloaded', 0), ('extracted', 10), ('patched', 11),
+                 ('configured', 20), ('built', 50), ('host_installed', 55)]),
+    ('zlib', [('downloaded', 0), ('extracted', 1), ('patched', 2),
+              ('configured', 5), ('built', 15), ('staging_installed', 17)]),
+    ('host-bison', [('downloaded', 0), ('extracted', 2), ('patched', 3),
+                    ('configured', 65), ('built', 85),
+                    ('host_installed', 90)]),
+    ('libfoo', [('downloaded', 0), ('extracted', 1), ('patched', 2),
+                ('configured', 100), ('built', 120),
+                ('target_installed', 121)]),
+]
+
+
+def _pkg_build_names(pkg_build_cp):
+    return [pkg_build.info.name for pkg_build in pkg_build_cp.pkg_builds]
+
+
+# checks the critical path `pkg_build_cp` against a new one which
+# considers all the package builds of `monitor`
+def _check_pkg_build_cp(monitor, pkg_build_cp):
+    full_cp = yobr.analysis.PkgBuildCriticalPath(monitor)
+    full_cp.update(monitor.pkg_builds.values())
+    assert pkg_build_cp.length == pytest.approx(full_cp.length)
+    assert pkg_build_cp.pkg_builds == full_cp.pkg_builds
+
+
+def test_pkg_build_critical_path(pkg_builds, touch_stamps):
+    monitor = yobr.br.PkgBuildMonitor(pkg_builds)
+    pkg_build_cp = yobr.analysis.PkgBuildCriticalPath(monitor)
+    assert not pkg_build_cp.update(monitor.update())
+
+    # one stamp at a time
+    for name, stamp_times in _STAMP_TIMES:
+        for stamp, rel_time in stamp_times:
+            touch_stamps(pkg_builds[name], stamp, mtime=_T0 + rel_time)
+            pkg_build_cp.update(monitor.update())
+            _check_pkg_build_cp(monitor, pkg_build_cp)
+
+    # `host-bison`'s configuration only starts when `host-m4` is done
+    assert _pkg_build_names(pkg_build_cp) == ['host-m4', 'host-bison',
+                                              'libfoo']
+    assert pkg_build_cp.length == pytest.approx(55 + 38 + 33)
+
+
+def test_pkg_build_critical_path_out_of_order(pkg_builds, touch_stamps):
+    monitor = yobr.br.PkgBuildMonitor(pkg_builds)
+    pkg_build_cp = yobr.analysis.PkgBuildCriticalPath(monitor)
+
+    # dependants first: their work durations change when their
+    # dependencies are done
+    for name, stamp_times in reversed(_STAMP_TIMES):
+        for stamp, rel_time in stamp_times:
+            touch_stamps(pkg_builds[name], stamp, mtime=_T0 + rel_time)
+
+        pkg_build_cp.update(monitor.update())
+        _check_pkg_build_cp(monitor, pkg_build_cp)
+
+    assert _pkg_build_names(pkg_build_cp) == ['host-m4', 'host-bison',
+                                              'libfoo']
+
+
+def test_pkg_build_critical_path_duration_change(pkg_builds, touch_stamps,
+                                                 remove_stamps):
+    monitor = yobr.br.PkgBuildMonitor(pkg_builds)
+    pkg_build_cp = yobr.analysis.PkgBuildCriticalPath(monitor)
+
+    for name, stamp_times in _STAMP_TIMES:
+        for stamp, rel_time in stamp_times:
+            touch_stamps(pkg_builds[name], stamp, mtime=_T0 + rel_time)
+
+    pkg_build_cp.update(monitor.update())
+    length = pkg_build_cp.length
+
+    # `make zlib-rebuild`, now taking much longer
+    zlib = pkg_builds['zlib']
+    remove_stamps(zlib, 'built', 'staging_installed')
+
+    # not on the critical path
+    assert not pkg_build_cp.update(monitor.update())
+    _check_pkg_build_cp(monitor, pkg_build_cp)
+    touch_stamps(zlib, 'built', mtime=_T0 + 300)
+    touch_stamps(zlib, 'staging_installed', mtime=_T0 + 302)
+    assert pkg_build_cp.update(monitor.update())
+    _check_pkg_build_cp(monitor, pkg_build_cp)
+    assert _pkg_build_names(pkg_build_cp) == ['zlib', 'libfoo']
+    assert pkg_build_cp.length > length
+
+
+# expected durations of the fake package builds (`foo-headers` gets
+# the median, 15)
+@pytest.fixture
+def expected_durations(pkg_builds):
+    durations = {'host-m4': 10., 'host-bison': 20., 'zlib': 5.,
+                 'libfoo': 30.}
+    return {pkg_builds[name].info: duration
+            for name, duration in durations.items()}
+
+
+def test_estimate():
+    estimate = yobr.analysis.BuildEstimate(_T0 + 100, 50., 10.,
+                                           [(_T0, 5., 20.)])
+    assert estimate.end_time == _T0 + 100
+    assert estimate.remaining(_T0 + 40) == 60.
+    assert estimate.remaining(_T0 + 200) == 0.
+
+    # running one: 5 + 10, and then at most 20
+    assert estimate.progress(_T0 + 10) == pytest.approx(25. / 50.)
+    assert estimate.progress(_T0 + 1000) == pytest.approx(30. / 50.)
+    assert estimate.progress(_T0 - 10) == pytest.approx(15. / 50.)
+    unknown = yobr.analysis.BuildEstimate(None, 0., 0., [])
+    assert unknown.remaining(_T0) is None
+    assert unknown.progress(_T0) == 0.
+
+
+@pytest.mark.parametrize('jobs, duration', [
+    # sum of all the durations
+    (1, 80.),
+
+    # `host-m4`, `host-bison`, and then `libfoo` (critical path)
+    (2, 60.),
+    (8, 60.),
+])
+def test_eta_not_started(pkg_builds, expected_durations, jobs, duration):
+    monitor = yobr.br.PkgBuildMonitor(pkg_builds)
+    monitor.update()
+    eta = yobr.analysis.PkgBuildEta(monitor, expected_durations, jobs)
+    assert eta.estimate is None
+    estimate = eta.update(set(), _T0)
+    assert estimate.end_time == pytest.approx(_T0 + duration)
+    assert estimate.progress(_T0) == 0.
+
+    # nothing changed: same estimate
+    assert eta.update(set(), _T0 + 10) is estimate
+
+
+def test_eta_in_progress(pkg_builds, expected_durations, touch_stamps):
+    monitor = yobr.br.PkgBuildMonitor(pkg_builds)
+
+    # `zlib` is done and `host-m4` is extracting since 2 s (4 s ago)
+    for stamp, rel_time in _STAMP_TIMES[1][1]:
+        touch_stamps(pkg_builds['zlib'], stamp, mtime=_T0 + rel_time)
+
+    touch_stamps(pkg_builds['host-m4'], 'downloaded', mtime=_T0)
+    touch_stamps(pkg_builds['host-m4'], 'extracted', mtime=_T0 + 2)
+    now = _T0 + 6
+    eta = yobr.analysis.PkgBuildEta(monitor, expected_durations, 1)
+    estimate = eta.update(monitor.update(), now)
+
+    # `host-m4` has 4 s left, and then the others one at a time
+    assert estimate.end_time == pytest.approx(now + 4. + 15. + 20. + 30.)
+
+    # `zlib` (5), and `host-m4`'s 6 s
+    assert estimate.progress(now) == pytest.approx((5. + 6.) / 80.)
+    assert estimate.progress(now + 2) == pytest.approx((5. + 8.) / 80.)
+    assert estimate.progress(now + 100) == pytest.approx((5. + 10.) / 80.)
+
+
+def test_eta_without_durations(pkg_builds, touch_stamps):
+    monitor = yobr.br.PkgBuildMonitor(pkg_builds)
+
+    for stamp, rel_time in _STAMP_TIMES[1][1]:
+        touch_stamps(pkg_builds['zlib'], stamp, mtime=_T0 + rel_time)
+
+    eta = yobr.analysis.PkgBuildEta(monitor, {}, 4)
+    estimate = eta.update(monitor.update(), _T0)
+
+    # ratio of done package builds
+    assert estimate.end_time is None
+    assert estimate.remaining(_T0) is None
+    assert estimate.progress(_T0) == pytest.approx(1 / 5)
@@ -0,0 +1,205 @@
+# Copyright (c) 2020 Philippe Proulx <eepp.ca>
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# monitoring of several builds
+
+import os
+import json
+import types
+import shutil
+import pytest
+import yobr.builds
+
+
+@pytest.mark.parametrize('spec, br_root_dir, br_build_dir, name', [
+    ('buildroot', 'buildroot', os.path.join('buildroot', 'output', 'build'),
+     'buildroot'),
+    ('buildroot:out/rpi4/build', 'buildroot', 'out/rpi4/build', 'rpi4'),
+    ('/src/buildroot:/build/qemu/build', '/src/buildroot', '/build/qemu/build',
+     'qemu'),
+
+    # default output directory, explicitly
+    ('buildroot:buildroot/output/build', 'buildroot',
+     'buildroot/output/build', 'buildroot'),
+])
+def test_build_from_spec(spec, br_root_dir, br_build_dir, name):
+    build = yobr.builds.build_from_spec(spec)
+    assert build.br_root_dir == br_root_dir
+    assert build.br_build_dir == br_build_dir
+    assert build.name == name
+
+
+@pytest.mark.parametrize('spec', ['', ':out/build', 'buildroot:'])
+def test_build_from_spec_invalid(spec):
+    with pytest.raises(ValueError):
+        yobr.builds.build_from_spec(spec)
+
+
+def test_with_unique_names():
+    builds = [
+        yobr.builds.Build('br', 'a/rpi4/build'),
+        yobr.builds.Build('br', 'b/qemu/build'),
+        yobr.builds.Build('br2', 'c/rpi4/build'),
+        yobr.builds.Build('br', 'd/rpi4/build'),
+    ]
+    new_builds = yobr.builds.with_unique_names(builds)
+    assert [b.name for b in new_builds] == ['rpi4#1', 'qemu', 'rpi4#2',
+                                            'rpi4#3']
+    assert [(b.br_root_dir, b.br_build_dir) for b in new_builds] == [(b.br_root_dir, b.br_build_dir)
+                                                                    for b in builds]
+
+    # already unique
+    assert [b.name for b in yobr.builds.with_unique_names(builds[:2])] == ['rpi4', 'qemu']
+
+
+# fake Buildroot tree of which `make show-info` prints `br_info` (counts
+# its runs in `runs`)
+@pytest.fixture
+def br_root_dir(tmp_path, br_info):
+    if shutil.which('make') is None:
+        pytest.skip('`make` is not available')
+
+    root_dir = tmp_path / 'buildroot'
+    root_dir.mkdir()
+    (root_dir / 'Makefile').write_text('show-info:\n\t@echo run >> runs\n\t@cat show-info.json\n')
+    (root_dir / 'show-info.json').write_text(json.dumps(br_info))
+    return str(root_dir)
+
+
+def _make_run_count(br_root_dir):
+    with open(os.path.join(br_root_dir, 'runs')) as f:
+        return len(f.readlines())
+
+
+def test_loader_same_config(tmp_path, br_root_dir):
+    loader = yobr.builds.PkgBuildsLoader(use_cache=False)
+    build_a = yobr.builds.Build(br_root_dir, str(tmp_path / 'a' / 'build'))
+    build_b = yobr.builds.Build(br_root_dir, str(tmp_path / 'b' / 'build'))
+    pkg_builds_a = loader.pkg_builds(build_a)
+    pkg_builds_b = loader.pkg_builds(build_b)
+    assert _make_run_count(br_root_dir) == 1
+
+    # same package information objects, distinct package builds
+    assert pkg_builds_a['zlib'].info is pkg_builds_b['zlib'].info
+    assert pkg_builds_a['zlib'].build_dir.startswith(build_a.br_build_dir)
+    assert pkg_builds_b['zlib'].build_dir.startswith(build_b.br_build_dir)
+
+
+def test_loader_other_config(tmp_path, br_root_dir):
+    loader = yobr.builds.PkgBuildsLoader(use_cache=False)
+    builds = []
+
+    for name, config in [('a', 'BR2_arm=y\n'), ('b', 'BR2_aarch64=y\n')]:
+        (tmp_path / name).mkdir()
+        (tmp_path / name / '.config').write_text(config)
+        builds.append(yobr.builds.Build(br_root_dir,
+                                        str(tmp_path / name / 'build')))
+
+    pkg_builds_a = loader.pkg_builds(builds[0])
+    pkg_builds_b = loader.pkg_builds(builds[1])
+    assert _make_run_count(br_root_dir) == 2
+
+    # only the strings are shared
+    assert pkg_builds_a['zlib'].info is not pkg_builds_b['zlib'].info
+    assert pkg_builds_a['zlib'].info.version is pkg_builds_b['zlib'].info.version
+
+
+# package build monitor which only counts its updates
+class _FakeMonitor:
+    def __init__(self, waitables=()):
+        self.waitables = list(waitables)
+        self.update_count = 0
+
+    def update(self):
+        self.update_count += 1
+        return set()
+
+
+# fake `time` module of which sleep() only advances monotonic()
+@pytest.fixture
+def clock(monkeypatch):
+    clock = types.SimpleNamespace(now=1000.)
+
+    def sleep(duration):
+        clock.now += duration
+
+    monkeypatch.setattr(yobr.builds, 'time',
+                        types.SimpleNamespace(monotonic=lambda: clock.now,
+                                              sleep=sleep))
+    return clock
+
+
+def test_scheduler_spreads_updates(clock):
+    monitors = [_FakeMonitor() for _ in range(4)]
+    scheduler = yobr.builds.PkgBuildMonitorScheduler(monitors, 2.)
+    assert scheduler.tick_interval == .5
+
+    # initially all of them
+    assert scheduler.wait() == []
+    assert set(scheduler.update()) == set(monitors)
+    assert [m.update_count for m in monitors] == [1] * 4
+
+    # then one per tick, round-robin
+    for i in range(8):
+        start_time = clock.now
+        scheduler.wait()
+        changes = scheduler.update()
+        assert clock.now - start_time == pytest.approx(.5)
+        assert list(changes) == [monitors[(i + 1) % 4]]
+
+    assert [m.update_count for m in monitors] == [3] * 4
+
+
+def test_scheduler_late(clock):
+    monitors = [_FakeMonitor() for _ in range(2)]
+    scheduler = yobr.builds.PkgBuildMonitorScheduler(monitors, 2.)
+    scheduler.update()
+
+    # suspended for a while: no burst to catch up
+    clock.now += 60
+    assert len(scheduler.update()) == 1
+    assert len(scheduler.update()) == 0
+    start_time = clock.now
+    scheduler.wait()
+    assert clock.now - start_time == pytest.approx(1.)
+    assert len(scheduler.update()) == 1
+
+
+def test_scheduler_readable_waitable(clock):
+    read_fd, write_fd = os.pipe()
+
+    try:
+        with os.fdopen(read_fd, 'rb', buffering=0) as reader:
+            monitors = [_FakeMonitor(), _FakeMonitor([reader])]
+            scheduler = yobr.builds.PkgBuildMonitorScheduler(monitors, 3600.)
+            scheduler.update()
+            counts = [m.update_count for m in monitors]
+            os.write(write_fd, b'x')
+
+            # the monitor of the readable waitable, right away
+            start_time = clock.now
+            assert scheduler.wait() == []
+            assert clock.now - start_time < 1
+            assert list(scheduler.update()) == [monitors[1]]
+            assert [m.update_count for m in monitors] == [counts[0],
+                                                          counts[1] + 1]
+    finally:
+        os.close(write_fd)
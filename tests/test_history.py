@@ -0,0 +1,153 @@
+# Copyright (c) 2020 Philippe Proulx <eepp.ca>
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# package build duration history
+
+import os.path
+import sqlite3
+import statistics
+import pytest
+import yobr.br
+import yobr.history
+
+
+@pytest.fixture
+def history(tmp_path):
+    history = yobr.history.PkgBuildDurationHistory(str(tmp_path / 'yobr' / 'durations.sqlite3'))
+    yield history
+    history.close()
+
+
+# recorded `(version, done_time, duration)` rows of the package `name`,
+# latest first
+def _rows(history, name):
+    if not os.path.exists(history.path):
+        return []
+
+    conn = sqlite3.connect(history.path)
+
+    try:
+        return conn.execute('SELECT version, done_time, duration FROM durations WHERE name = ? ORDER BY done_time DESC',
+                            (name,)).fetchall()
+    finally:
+        conn.close()
+
+
+_T0 = 1500000000
+
+
+def test_default_path(monkeypatch, tmp_path):
+    monkeypatch.setenv('XDG_DATA_HOME', str(tmp_path))
+    path = yobr.history.default_history_path()
+    assert path == str(tmp_path / 'yobr' / 'durations.sqlite3')
+
+
+def test_empty(history, pkg_builds):
+    pkg_infos = [pkg_build.info for pkg_build in pkg_builds.values()]
+    assert history.expected_durations(pkg_infos) == {}
+    assert history.is_available
+
+
+def test_median_of_last_builds(history, pkg_builds):
+    zlib = pkg_builds['zlib'].info
+    durations = [100, 1, 2, 3, 4, 5]
+
+    for i, duration in enumerate(durations):
+        history.record('zlib', '1.2.11', _T0 + i * 1000, duration)
+
+    # oldest build (100) ignored
+    assert history.expected_durations([zlib]) == {zlib: statistics.median(durations[1:])}
+
+
+def test_build_count_cap(history):
+    count = yobr.history._MAX_BUILD_COUNT + 5
+    history.record_many(('zlib', '1.2.11', _T0 + i * 1000, float(i))
+                        for i in range(count))
+    rows = _rows(history, 'zlib')
+    assert len(rows) == yobr.history._MAX_BUILD_COUNT
+    assert [row[2] for row in rows] == [float(i) for i in reversed(range(5, count))]
+
+    # other versions have their own builds
+    history.record('zlib', '1.2.12', _T0, 1.)
+    assert len(_rows(history, 'zlib')) == yobr.history._MAX_BUILD_COUNT + 1
+
+
+def test_version_fallback(history, pkg_builds):
+    zlib = pkg_builds['zlib'].info
+    m4 = pkg_builds['host-m4'].info
+    headers = pkg_builds['foo-headers'].info
+
+    # other versions only
+    history.record('zlib', '1.2.8', _T0, 10.)
+    history.record('zlib', '1.2.10', _T0 + 1000, 20.)
+    history.record('zlib', '1.2.10', _T0 + 2000, 60.)
+    history.record('host-m4', '1.4.18', _T0, 7.)
+    history.record('host-m4', '1.4.17', _T0 + 1000, 1000.)
+
+    # no version
+    history.record('foo-headers', None, _T0, 3.)
+    expected_durations = history.expected_durations([zlib, m4, headers])
+    assert expected_durations == {zlib: 20., m4: 7., headers: 3.}
+    assert _rows(history, 'foo-headers') == [('', _T0, 3.)]
+
+
+@pytest.mark.parametrize('delta', [0., 0.25, -0.9, 4.])
+def test_same_build_recorded_once(history, delta):
+    # step event time, and then stamp file time
+    history.record('zlib', '1.2.11', _T0 + 1000, 12.)
+    history.record('zlib', '1.2.11', _T0 + 1000 + delta, 12.5)
+    assert _rows(history, 'zlib') == [('1.2.11', _T0 + 1000, 12.)]
+
+    # another build
+    history.record('zlib', '1.2.11', _T0 + 1200, 14.)
+    assert len(_rows(history, 'zlib')) == 2
+
+
+def test_unavailable(tmp_path, pkg_builds):
+    # parent directory is a regular file
+    (tmp_path / 'file').write_text('')
+    history = yobr.history.PkgBuildDurationHistory(str(tmp_path / 'file' / 'durations.sqlite3'))
+    history.record('zlib', '1.2.11', _T0, 12.)
+    assert not history.is_available
+    assert history.expected_durations([pkg_builds['zlib'].info]) == {}
+    history.close()
+
+
+def test_recorder(history, pkg_builds, touch_stamps):
+    monitor = yobr.br.PkgBuildMonitor(pkg_builds)
+    recorder = yobr.history.PkgBuildDurationRecorder(monitor, history)
+    zlib = pkg_builds['zlib']
+    stamp_times = [('downloaded', 0), ('extracted', 1), ('patched', 2),
+                   ('configured', 5), ('built', 15)]
+
+    for stamp, rel_time in stamp_times:
+        touch_stamps(zlib, stamp, mtime=_T0 + rel_time)
+
+    # not done yet
+    recorder.update(monitor.update())
+    assert _rows(history, 'zlib') == []
+    touch_stamps(zlib, 'staging_installed', mtime=_T0 + 17)
+    recorder.update(monitor.update())
+    assert _rows(history, 'zlib') == [('1.2.11', _T0 + 17, 17.)]
+
+    # recording again has no effect
+    recorder.update(set(pkg_builds.values()))
+    assert len(_rows(history, 'zlib')) == 1
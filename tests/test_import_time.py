@@ -0,0 +1,73 @@
+# Copyright (c) 2020 Philippe Proulx <eepp.ca>
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+# startup import-time budget of `yobr --version`: the entry point must
+# not import Qt (or anything slow) before parsing the arguments
+
+import os.path
+import sys
+import subprocess
+
+
+# budget (microseconds) of the sum of the import times
+_BUDGET = 100000
+
+# modules which `yobr --version` must not import
+_FORBIDDEN_MODULES = ('PyQt5', 'pkg_resources', 'yobr.br', 'yobr.gui')
+
+
+# dictionary of imported module names to their own import times
+# (microseconds) when running `python -X importtime -m yobr.ui --version`
+def _import_times():
+    root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-m', 'yobr.ui',
+                           '--version'], cwd=root_dir, stdout=subprocess.PIPE,
+                          stderr=subprocess.PIPE, universal_newlines=True,
+                          check=True)
+    times = {}
+
+    for line in proc.stderr.splitlines():
+        # `import time: SELF | CUMULATIVE | NAME`
+        if not line.startswith('import time:'):
+            continue
+
+        parts = line[len('import time:'):].split('|')
+
+        try:
+            times[parts[2].strip()] = int(parts[0])
+        except ValueError:
+            # header
+            continue
+
+    return times
+
+
+def test_no_forbidden_module():
+    for name in _import_times():
+        assert name.split('.')[0] != 'PyQt5'
+        assert name not in _FORBIDDEN_MODULES
+
+
+def test_budget():
+    total = sum(_import_times().values())
+    assert total <= _BUDGET, 'Import time: {} µs (budget: {} µs)'.format(total,
+                                                                         _BUDGET)
@@ -0,0 +1,299 @@
+# Copyright (c) 2020 Philippe Proulx <eepp.ca>
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# `yobr-make`: banner parsing, output ring buffers, and events
+
+import os
+import sys
+import shutil
+import subprocess
+import pytest
+import yobr.br
+import yobr.make
+
+
+_ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.parametrize('line, banner', [
+    ('>>> zlib 1.2.11 Extracting', ('zlib', 'extract')),
+    ('>>> host-m4 1.4.18 Configuring', ('host-m4', 'configure')),
+    ('>>> zlib 1.2.11 Installing to staging directory',
+     ('zlib', 'install-staging')),
+    ('>>> zlib 1.2.11 Installing to target', ('zlib', 'install-target')),
+    ('>>> linux custom Building', ('linux', 'build')),
+    ('>>> foo local Syncing from source dir /src/foo', ('foo', 'rsync')),
+    ('>>> zlib 1.2.11 Downloading', ('zlib', 'download')),
+
+    # empty version
+    ('>>> foo-headers  Installing to target', ('foo-headers',
+                                              'install-target')),
+
+    # not a step
+    ('>>> zlib 1.2.11 Updating config.sub and config.guess', ('zlib', None)),
+    ('>>> zlib 1.2.11', ('zlib', None)),
+
+    # no package
+    ('>>>   Finalizing target directory', (None, None)),
+    ('>>>   Generating root filesystems common tables', (None, None)),
+    ('>>> zlib', (None, None)),
+    ('>>> ', (None, None)),
+
+    # not a banner
+    ('', None),
+    ('>>>', None),
+    ('>> zlib 1.2.11 Building', None),
+    (' >>> zlib 1.2.11 Building', None),
+    ('checking for gcc... gcc', None),
+])
+def test_parse_banner(line, banner):
+    assert yobr.make._parse_banner(line) == banner
+
+
+@pytest.mark.parametrize('line, clean_line', [
+    ('plain', 'plain'),
+    ('with CR\r', 'with CR'),
+    ('\x1b[7m>>> zlib 1.2.11 Building\x1b[27m', '>>> zlib 1.2.11 Building'),
+    ('\x1b[01;31m\x1b[Kerror:\x1b[m\x1b[K oops', 'error: oops'),
+    ('progress 10%\rprogress 50%\rprogress 100%', 'progress 100%'),
+    ('\x1b(Bsome\x1b[0m text\r', 'some text'),
+    ('', ''),
+])
+def test_clean_line(line, clean_line):
+    assert yobr.make._clean_line(line) == clean_line
+
+
+@pytest.mark.parametrize('args, env, is_parallel', [
+    ([], {}, False),
+    (['-j'], {}, True),
+    (['-j', '1'], {}, False),
+    (['-j', '4'], {}, True),
+    (['-j1'], {}, False),
+    (['-j8', 'zlib'], {}, True),
+    (['--jobs=1'], {}, False),
+    (['--jobs=3'], {}, True),
+    (['--jobs', '2'], {}, True),
+    ([], {'MAKEFLAGS': 's -j4 --jobserver-auth=3,4'}, True),
+    ([], {'MAKEFLAGS': '-j1'}, False),
+])
+def test_is_parallel(args, env, is_parallel):
+    assert yobr.make._is_parallel(args, env) == is_parallel
+
+
+@pytest.mark.parametrize('args, env, path', [
+    ([], {'YOBR_SOCKET': '/tmp/s'}, '/tmp/s'),
+    ([], {}, 'CWD/output/.yobr.sock'),
+    (['O=out/rpi4'], {}, 'CWD/out/rpi4/.yobr.sock'),
+    (['O=a', 'O=/abs/out'], {}, '/abs/out/.yobr.sock'),
+    ([], {'O': 'out'}, 'CWD/out/.yobr.sock'),
+    (['-C', 'buildroot'], {}, 'CWD/buildroot/output/.yobr.sock'),
+    (['-Cbuildroot', 'O=out'], {}, 'CWD/buildroot/out/.yobr.sock'),
+    (['--directory=/br'], {}, '/br/output/.yobr.sock'),
+    (['-C'], {}, 'CWD/output/.yobr.sock'),
+])
+def test_socket_path(args, env, path):
+    path = path.replace('CWD', os.getcwd())
+    assert os.path.normpath(yobr.make._socket_path(args, env)) == path
+
+
+def test_format_output_event():
+    data = yobr.make._format_output_event(1.5, 'zlib', ['a', 'b', 'c'])
+    assert data == b'1.500000 output zlib\na\nb\nc'
+    event = yobr.br._pkg_build_event_from_datagram(data)
+    assert event.lines == ('a', 'b', 'c')
+
+
+def test_format_output_event_too_big():
+    lines = ['{:05} '.format(i) + 'x' * 2000 for i in range(100)]
+    data = yobr.make._format_output_event(1.5, 'zlib', lines)
+    assert len(data) <= yobr.make._MAX_DATAGRAM_SIZE
+    event = yobr.br._pkg_build_event_from_datagram(data)
+
+    # the newest lines, truncated
+    assert len(event.lines) > 0
+    assert event.lines[-1] == lines[-1][:yobr.make._MAX_OUTPUT_LINE_LEN]
+    assert event.lines == tuple(line[:yobr.make._MAX_OUTPUT_LINE_LEN]
+                                for line in lines[-len(event.lines):])
+
+
+@pytest.fixture
+def receiver(tmp_path):
+    receiver = yobr.br.PkgBuildStepEventReceiver(str(tmp_path / '.yobr.sock'))
+    yield receiver
+    receiver.close()
+
+
+# summary of the events `events`
+def _summary(events):
+    summary = []
+
+    for event in events:
+        if type(event) is yobr.br.PkgBuildStepEvent:
+            summary.append(('start' if event.is_start else 'end', event.step,
+                            event.pkg_name))
+        elif type(event) is yobr.br.PkgBuildOutputEvent:
+            summary.append(('output', event.pkg_name, event.lines))
+        else:
+            summary.append(('fail', event.pkg_name))
+
+    return summary
+
+
+_OUTPUT = b'''make[1]: Entering directory
+>>> zlib 1.2.11 Extracting
+tar xf zlib.tar.gz
+>>> zlib 1.2.11 Patching
+\x1b[7m>>> host-m4 1.4.18 Configuring\x1b[27m
+checking for gcc... gcc\r
+>>> host-m4 1.4.18 Updating config.sub and config.guess
+cp config.sub
+>>>   Finalizing target directory
+done
+'''
+
+
+@pytest.mark.parametrize('chunk_size', [1, 5, len(_OUTPUT)])
+def test_parser_serial(receiver, chunk_size):
+    parser = yobr.make._MakeOutputParser(receiver.path, False)
+
+    for i in range(0, len(_OUTPUT), chunk_size):
+        parser.feed(_OUTPUT[i:i + chunk_size])
+
+    parser.finish(0)
+    assert _summary(receiver.read_events()) == [
+        ('start', 'extract', 'zlib'),
+        ('output', 'zlib', ('>>> zlib 1.2.11 Extracting', 'tar xf zlib.tar.gz')),
+        ('end', 'extract', 'zlib'),
+        ('start', 'patch', 'zlib'),
+        ('output', 'zlib', ('>>> zlib 1.2.11 Patching',)),
+        ('end', 'patch', 'zlib'),
+        ('start', 'configure', 'host-m4'),
+        ('output', 'host-m4', ('>>> host-m4 1.4.18 Configuring',
+                               'checking for gcc... gcc',
+                               '>>> host-m4 1.4.18 Updating config.sub and config.guess',
+                               'cp config.sub')),
+        ('end', 'configure', 'host-m4'),
+    ]
+
+
+def test_parser_parallel(receiver):
+    parser = yobr.make._MakeOutputParser(receiver.path, True)
+    parser.feed(b'>>> zlib 1.2.11 Building\n>>> host-m4 1.4.18 Building\n'
+                b'>>> zlib 1.2.11 Installing to staging directory\n')
+    parser.finish(0)
+    summary = [s for s in _summary(receiver.read_events()) if s[0] != 'output']
+
+    # a banner only ends the previous step of the same package
+    assert summary == [
+        ('start', 'build', 'zlib'),
+        ('start', 'build', 'host-m4'),
+        ('end', 'build', 'zlib'),
+        ('start', 'install-staging', 'zlib'),
+        ('end', 'build', 'host-m4'),
+        ('end', 'install-staging', 'zlib'),
+    ]
+
+
+def test_parser_failure(receiver):
+    parser = yobr.make._MakeOutputParser(receiver.path, False)
+
+    # last line without a newline
+    parser.feed(b'>>> zlib 1.2.11 Building\nerror: oops')
+    parser.finish(2)
+    assert _summary(receiver.read_events()) == [
+        ('start', 'build', 'zlib'),
+        ('output', 'zlib', ('>>> zlib 1.2.11 Building', 'error: oops')),
+        ('fail', 'zlib'),
+    ]
+
+
+def test_parser_ring_buffer(receiver):
+    parser = yobr.make._MakeOutputParser(receiver.path, False)
+    count = yobr.make._OUTPUT_LINE_COUNT
+    parser.feed(b'>>> zlib 1.2.11 Building\n')
+    parser.feed(b''.join(b'line %d\n' % i for i in range(count * 3)))
+    parser.flush()
+    events = receiver.read_events()
+    assert len(events) == 2
+    assert events[1].lines == tuple('line {}'.format(i)
+                                    for i in range(count * 2, count * 3))
+
+    # flushed: nothing pending
+    parser.flush()
+    assert receiver.read_events() == []
+    parser.finish(0)
+
+
+@pytest.mark.parametrize('data', [
+    b'\xff\xfe\x00garbage\n\x1b[\n',
+    b'>>> \xc3\x28 1.0 Building\n\xe9t\xe9\n',
+    b'>>>\n>>> \n>>>   \n\r\r\n',
+    b'x' * 100000 + b'\n',
+    bytes(range(256)) * 4,
+])
+def test_parser_malformed_output(receiver, data):
+    # never raises; whatever is sent can be parsed back
+    parser = yobr.make._MakeOutputParser(receiver.path, False)
+    parser.feed(b'>>> zlib 1.2.11 Building\n')
+    parser.feed(data)
+    parser.finish(2)
+    events = receiver.read_events()
+    assert type(events[0]) is yobr.br.PkgBuildStepEvent
+
+    for event in events:
+        if type(event) is yobr.br.PkgBuildOutputEvent:
+            for line in event.lines:
+                assert len(line) <= yobr.make._MAX_OUTPUT_LINE_LEN
+
+
+def test_parser_no_listener(tmp_path):
+    # never raises
+    parser = yobr.make._MakeOutputParser(str(tmp_path / 'nope.sock'), False)
+    parser.feed(_OUTPUT)
+    parser.finish(2)
+
+
+def test_main(tmp_path, receiver):
+    if shutil.which('make') is None:
+        pytest.skip('`make` is not available')
+
+    (tmp_path / 'Makefile').write_text('all:\n'
+                                       '\t@echo ">>> zlib 1.2.11 Building"\n'
+                                       '\t@echo "cc -c adler32.c"\n'
+                                       '\t@echo "error: oops" >&2\n'
+                                       '\t@false\n')
+    env = dict(os.environ, YOBR_SOCKET=receiver.path,
+               PYTHONPATH=_ROOT_DIR)
+    proc = subprocess.run([sys.executable, '-m', 'yobr.make', '-s'],
+                          cwd=str(tmp_path), env=env, stdout=subprocess.PIPE,
+                          stderr=subprocess.PIPE, timeout=60)
+
+    # output as is (standard error included), and `make`'s exit status
+    assert proc.returncode == 2
+    lines = proc.stdout.decode().splitlines()
+    assert lines[:3] == ['>>> zlib 1.2.11 Building', 'cc -c adler32.c',
+                         'error: oops']
+    assert 'Error 1' in lines[3]
+    assert _summary(receiver.read_events()) == [
+        ('start', 'build', 'zlib'),
+        ('output', 'zlib', tuple(lines)),
+        ('fail', 'zlib'),
+    ]
@@ -0,0 +1,235 @@
+# Copyright (c) 2020 Philippe Proulx <eepp.ca>
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# OpenMetrics exporter
+
+import re
+import socket
+import urllib.error
+import urllib.request
+import pytest
+import yobr.br
+import yobr.analysis
+import yobr.metrics
+
+
+_T0 = 1500000000
+
+# `NAME{LABELS} VALUE` sample line
+_SAMPLE_RE = re.compile(r'^([a-z_]+)(?:\{(.*)\})? (\S+)$')
+_LABEL_RE = re.compile(r'([a-z_]+)="((?:[^"\\]|\\.)*)"')
+
+
+@pytest.fixture
+def monitor(pkg_builds, touch_stamps):
+    # `zlib`: extracted in 1 s, patched in 1 s, configured in 3 s,
+    # built in 10 s, and installed in 2 s
+    for stamp, rel_time in [('downloaded', 0), ('extracted', 1),
+                            ('patched', 2), ('configured', 5),
+                            ('built', 15), ('staging_installed', 17)]:
+        touch_stamps(pkg_builds['zlib'], stamp, mtime=_T0 + rel_time)
+
+    # `host-m4`: extracted in 7 s
+    touch_stamps(pkg_builds['host-m4'], 'downloaded', mtime=_T0)
+    touch_stamps(pkg_builds['host-m4'], 'extracted', mtime=_T0 + 7)
+    monitor = yobr.br.PkgBuildMonitor(pkg_builds)
+    monitor.update()
+    return monitor
+
+
+# samples of the OpenMetrics text `text`: list of `(name, labels,
+# value)` tuples where `labels` is a dictionary
+def _samples(text):
+    samples = []
+
+    for line in text.splitlines():
+        if line.startswith('#'):
+            continue
+
+        m = _SAMPLE_RE.match(line)
+        assert m is not None, line
+        labels = dict(_LABEL_RE.findall(m.group(2) or ''))
+        samples.append((m.group(1), labels, float(m.group(3))))
+
+    return samples
+
+
+def _values(samples, name, **labels):
+    return [value for sample_name, sample_labels, value in samples
+            if sample_name == name and all(sample_labels.get(k) == v for k, v in labels.items())]
+
+
+def test_eof(monitor):
+    text = yobr.metrics.render_metrics(monitor)
+    assert text.endswith('\n# EOF\n')
+    assert text.count('# EOF') == 1
+
+    # each family: `TYPE`, optional `UNIT`, and then `HELP`
+    lines = text.splitlines()
+
+    for i, line in enumerate(lines):
+        if line.startswith('# TYPE '):
+            name = line.split()[2]
+            next_lines = lines[i + 1:i + 3]
+
+            if next_lines[0].startswith('# UNIT '):
+                assert next_lines[0].split()[2] == name
+                assert next_lines[1].startswith('# HELP {} '.format(name))
+            else:
+                assert next_lines[0].startswith('# HELP {} '.format(name))
+
+
+def test_package_counts(monitor):
+    samples = _samples(yobr.metrics.render_metrics(monitor))
+    assert _values(samples, 'yobr_packages', stage='installed', type='target') == [1.]
+    assert _values(samples, 'yobr_packages', stage='extracted', type='host') == [1.]
+    assert _values(samples, 'yobr_packages', stage='unknown', type='target') == [2.]
+    assert sum(_values(samples, 'yobr_packages')) == 5.
+    assert _values(samples, 'yobr_packages_in_progress') == [1.]
+
+
+def test_stateset(monitor, pkg_builds):
+    samples = _samples(yobr.metrics.render_metrics(monitor))
+
+    for name, pkg_build in pkg_builds.items():
+        values = {labels['yobr_package_stage']: value
+                  for sample_name, labels, value in samples
+                  if sample_name == 'yobr_package_stage' and labels['package'] == name}
+
+        # one sample per stage, only the current one is 1
+        assert set(values) == {stage.value for stage in yobr.br.PkgBuildStage}
+        assert [stage for stage, value in values.items() if value == 1.] == [monitor.stage(pkg_build).value]
+        assert sum(values.values()) == 1.
+
+
+@pytest.mark.parametrize('stage, durations', [
+    ('extracted', [1., 7.]),
+    ('patched', [1.]),
+    ('configured', [3.]),
+    ('built', [10.]),
+    ('installed', [2.]),
+])
+def test_histogram(monitor, stage, durations):
+    samples = _samples(yobr.metrics.render_metrics(monitor))
+    name = 'yobr_package_step_duration_seconds'
+    buckets = [(labels['le'], value) for sample_name, labels, value in samples
+               if sample_name == name + '_bucket' and labels['stage'] == stage]
+    assert [le for le, _ in buckets] == [repr(float(b)) for b in yobr.metrics._DURATION_BUCKETS] + ['+Inf']
+
+    for le, value in buckets:
+        assert value == sum(1 for d in durations if d <= float(le))
+
+    # cumulative
+    counts = [value for _, value in buckets]
+    assert counts == sorted(counts)
+    assert _values(samples, name + '_count', stage=stage) == [len(durations)]
+    assert _values(samples, name + '_sum', stage=stage) == [sum(durations)]
+
+
+def test_optional_families(monitor):
+    text = yobr.metrics.render_metrics(monitor)
+    assert 'yobr_critical_path_seconds' not in text
+    assert 'yobr_build_expected_end_timestamp_seconds' not in text
+    critical_path = yobr.analysis.PkgBuildCriticalPath(monitor)
+    critical_path.update(monitor.pkg_builds.values())
+    estimate = yobr.analysis.BuildEstimate(_T0 + 100, 1., 0., [])
+    samples = _samples(yobr.metrics.render_metrics(monitor, estimate,
+                                                   critical_path))
+    assert _values(samples, 'yobr_critical_path_seconds') == [critical_path.length]
+    assert _values(samples, 'yobr_critical_path_packages') == [1.]
+    assert _values(samples, 'yobr_build_expected_end_timestamp_seconds') == [_T0 + 100]
+
+
+def test_label_escape():
+    assert yobr.metrics._escape_label_value('a"b\\c\nd') == 'a\\"b\\\\c\\nd'
+
+
+@pytest.mark.parametrize('addr, host, port', [
+    ('9866', '127.0.0.1', 9866),
+    ('0.0.0.0:9866', '0.0.0.0', 9866),
+    ('localhost:80', 'localhost', 80),
+    ('[::1]:9866', '::1', 9866),
+    ('[::]:9866', '::', 9866),
+])
+def test_parse_address(addr, host, port):
+    assert yobr.metrics.parse_address(addr) == (host, port)
+
+
+@pytest.mark.parametrize('addr', ['', 'http', 'localhost:', '[::1]'])
+def test_parse_address_invalid(addr):
+    with pytest.raises(ValueError):
+        yobr.metrics.parse_address(addr)
+
+
+def _get(exporter, path):
+    host, port = exporter.address
+
+    if ':' in host:
+        host = '[{}]'.format(host)
+
+    with urllib.request.urlopen('http://{}:{}{}'.format(host, port, path),
+                                timeout=10) as resp:
+        return resp.headers['Content-Type'], resp.read().decode()
+
+
+def _has_ipv6_loopback():
+    if not socket.has_ipv6:
+        return False
+
+    try:
+        with socket.socket(socket.AF_INET6, socket.SOCK_STREAM) as sock:
+            sock.bind(('::1', 0))
+    except OSError:
+        return False
+
+    return True
+
+
+@pytest.mark.parametrize('host', [
+    '127.0.0.1',
+    pytest.param('::1', marks=pytest.mark.skipif(not _has_ipv6_loopback(),
+                                                 reason='no IPv6 loopback')),
+])
+def test_exporter(monitor, pkg_builds, host):
+    exporter = yobr.metrics.MetricsExporter(monitor, host, 0)
+
+    try:
+        exporter.start()
+        assert exporter.address[0] == host
+        content_type, text = _get(exporter, '/metrics')
+        assert content_type.startswith('application/openmetrics-text')
+        assert text.endswith('# EOF\n')
+        assert _values(_samples(text), 'yobr_packages_in_progress') == [1.]
+
+        with pytest.raises(urllib.error.HTTPError):
+            _get(exporter, '/nope')
+
+        # no change: same text
+        exporter.update(set())
+        assert _get(exporter, '/')[1] == text
+
+        # rendered again
+        monitor.apply_stages({pkg_builds['host-m4']: yobr.br.PkgBuildStage.UNKNOWN})
+        exporter.update({pkg_builds['host-m4']})
+        text = _get(exporter, '/metrics')[1]
+        assert _values(_samples(text), 'yobr_packages_in_progress') == [0.]
+    finally:
+        exporter.close()
@@ -0,0 +1,231 @@
+# Copyright (c) 2020 Philippe Proulx <eepp.ca>
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# package graph, build stages, and package build monitor
+
+import shutil
+import pytest
+import yobr.br
+
+
+_S = yobr.br.PkgBuildStage
+
+
+@pytest.fixture
+def graph(pkg_builds):
+    return next(iter(pkg_builds.values())).info.graph
+
+
+@pytest.fixture
+def monitor(pkg_builds):
+    return yobr.br.PkgBuildMonitor(pkg_builds)
+
+
+def _names(pkg_infos):
+    return [pkg_info.name for pkg_info in pkg_infos]
+
+
+# checks that the cached stage counts of `monitor` match its stages
+def _check_stage_counts(monitor):
+    stages = monitor.stages
+    counts = monitor.stage_counts
+    assert sum(counts.values()) == len(monitor.pkg_builds)
+
+    for stage in _S:
+        assert counts[stage] == stages.count(stage)
+        assert monitor.stage_count(stage) == counts[stage]
+
+    for pkg_build in monitor.pkg_builds.values():
+        assert monitor.stage(pkg_build) is stages.stage(pkg_build.info)
+
+
+def test_graph_ids(graph):
+    assert len(graph) == 5
+    assert _names(graph.pkg_infos) == ['foo-headers', 'host-bison',
+                                       'host-m4', 'libfoo', 'zlib']
+
+    for pkg_id, pkg_info in enumerate(graph.pkg_infos):
+        assert pkg_info.id == pkg_id
+        assert graph.pkg_info(pkg_id) is pkg_info
+        assert pkg_info.graph is graph
+
+
+@pytest.mark.parametrize('name, dep_names, dependant_names', [
+    ('foo-headers', [], []),
+    ('host-bison', ['host-m4'], ['libfoo']),
+    ('host-m4', [], ['host-bison']),
+
+    # `skeleton` isn't monitored
+    ('libfoo', ['host-bison', 'zlib'], []),
+    ('zlib', [], ['libfoo']),
+])
+def test_graph_deps(pkg_builds, graph, name, dep_names, dependant_names):
+    pkg_info = pkg_builds[name].info
+    assert _names(graph.dependencies(pkg_info.id)) == dep_names
+    assert _names(graph.dependants(pkg_info.id)) == dependant_names
+    assert _names(pkg_info.dependencies) == dep_names
+    assert list(graph.dependency_ids(pkg_info.id)) == [pkg_builds[n].info.id
+                                                       for n in dep_names]
+    assert list(graph.dependant_ids(pkg_info.id)) == [pkg_builds[n].info.id
+                                                      for n in dependant_names]
+
+
+def test_graph_unknown_dep_names():
+    pkg_infos = yobr.br.pkg_infos_from_br_info({
+        'a': {'type': 'host', 'version': '1', 'dependencies': ['b', 'nope']},
+        'b': {'type': 'host', 'version': '1', 'dependencies': ['b']},
+    })
+    graph = pkg_infos['a'].graph
+    assert _names(graph.dependencies(pkg_infos['a'].id)) == ['b']
+    assert _names(graph.dependants(pkg_infos['b'].id)) == ['a', 'b']
+
+
+def test_stages_copy(pkg_builds, graph):
+    zlib = pkg_builds['zlib'].info
+    stages = yobr.br.PkgBuildStages(graph)
+    assert stages.count(_S.UNKNOWN) == len(graph)
+    assert stages.set_stage(zlib, _S.BUILT) is _S.UNKNOWN
+    copy = stages.copy()
+    assert copy.set_stage(zlib, _S.UNKNOWN) is _S.BUILT
+    assert stages.stage(zlib) is _S.BUILT
+    assert copy.stage(zlib) is _S.UNKNOWN
+
+
+def test_stages_deps_built(pkg_builds, graph):
+    libfoo = pkg_builds['libfoo'].info
+    stages = yobr.br.PkgBuildStages(graph)
+    assert stages.built_dependency_count(libfoo) == 0
+    assert not stages.are_dependencies_built(libfoo)
+    stages.set_stage(pkg_builds['zlib'].info, _S.INSTALLED)
+    stages.set_stage(pkg_builds['host-bison'].info, _S.CONFIGURED)
+    assert stages.built_dependency_count(libfoo) == 1
+    assert not stages.are_dependencies_built(libfoo)
+    stages.set_stage(pkg_builds['host-bison'].info, _S.BUILT)
+    assert stages.built_dependency_count(libfoo) == 2
+    assert stages.are_dependencies_built(libfoo)
+    assert _names(stages.pkg_infos_at_stages([_S.BUILT, _S.INSTALLED])) == ['host-bison',
+                                                                            'zlib']
+
+
+def test_monitor_initial(monitor):
+    assert monitor.stage_count(_S.UNKNOWN) == 5
+    assert monitor.built_count == 0
+    assert monitor.installed_count == 0
+    assert monitor.in_progress_pkg_builds == []
+    assert monitor.update() == set()
+    _check_stage_counts(monitor)
+
+
+def test_monitor_stages_applied(monitor, pkg_builds, touch_stamps):
+    zlib = pkg_builds['zlib']
+    libfoo = pkg_builds['libfoo']
+    headers = pkg_builds['foo-headers']
+    touch_stamps(zlib, 'downloaded', 'extracted', 'patched', 'configured')
+    touch_stamps(libfoo, 'downloaded')
+    touch_stamps(headers, 'downloaded', 'extracted', 'patched',
+                 'configured', 'built')
+    assert monitor.update() == {zlib, libfoo, headers}
+    assert monitor.stage(zlib) is _S.CONFIGURED
+    assert monitor.stage(libfoo) is _S.DOWNLOADED
+
+    # not installable: built is done
+    assert monitor.stage(headers) is _S.BUILT
+    assert monitor.in_progress_pkg_builds == [zlib]
+    assert monitor.built_count == 1
+    assert monitor.installed_count == 0
+    _check_stage_counts(monitor)
+
+    # no change
+    assert monitor.update() == set()
+    _check_stage_counts(monitor)
+
+    touch_stamps(zlib, 'built', 'staging_installed')
+    assert monitor.update() == {zlib}
+    assert monitor.stage(zlib) is _S.INSTALLED
+    assert monitor.built_count == 2
+    assert monitor.installed_count == 1
+    assert monitor.in_progress_pkg_builds == []
+    assert monitor.built_dependency_count(libfoo) == 1
+    _check_stage_counts(monitor)
+
+
+def test_monitor_stage_regression(monitor, pkg_builds, touch_stamps,
+                                  remove_stamps):
+    zlib = pkg_builds['zlib']
+    m4 = pkg_builds['host-m4']
+    touch_stamps(zlib, 'downloaded', 'extracted', 'patched', 'configured',
+                 'built', 'staging_installed')
+    touch_stamps(m4, 'downloaded', 'extracted', 'patched', 'configured',
+                 'built', 'host_installed')
+    monitor.update()
+    assert monitor.installed_count == 2
+
+    # `make zlib-rebuild`
+    remove_stamps(zlib, 'built', 'staging_installed')
+    assert monitor.update() == {zlib}
+    assert monitor.stage(zlib) is _S.CONFIGURED
+    assert monitor.installed_count == 1
+    assert monitor.built_count == 1
+    assert monitor.in_progress_pkg_builds == [zlib]
+    _check_stage_counts(monitor)
+
+    # `make host-m4-dirclean`: back to unknown
+    shutil.rmtree(m4.build_dir)
+    assert monitor.update() == {m4}
+    assert monitor.stage(m4) is _S.UNKNOWN
+    assert monitor.installed_count == 0
+    assert monitor.built_count == 0
+    assert monitor.stage_count(_S.UNKNOWN) == 4
+    assert m4.stamps == set()
+    _check_stage_counts(monitor)
+
+
+def test_monitor_apply_stages(monitor, pkg_builds):
+    zlib = pkg_builds['zlib']
+    m4 = pkg_builds['host-m4']
+    changed = monitor.apply_stages({zlib: _S.BUILT, m4: _S.UNKNOWN})
+    assert changed == {zlib}
+    assert monitor.stage_count(_S.BUILT) == 1
+    _check_stage_counts(monitor)
+
+    # same stage again
+    assert monitor.apply_stages({zlib: _S.BUILT}) == set()
+    assert monitor.apply_stages({zlib: _S.EXTRACTED, m4: _S.INSTALLED}) == {zlib, m4}
+    assert monitor.stage_count(_S.BUILT) == 0
+    assert monitor.stage_count(_S.EXTRACTED) == 1
+    assert monitor.installed_count == 1
+    _check_stage_counts(monitor)
+
+    # `stages` is a copy
+    monitor.stages.set_stage(zlib.info, _S.UNKNOWN)
+    assert monitor.stage(zlib) is _S.EXTRACTED
+
+
+def test_monitor_resolve_stages(monitor, pkg_builds, touch_stamps):
+    zlib = pkg_builds['zlib']
+    touch_stamps(zlib, 'downloaded', 'extracted')
+    stages = monitor.resolve_stages()
+    assert stages[zlib] is _S.EXTRACTED
+    assert stages[pkg_builds['libfoo']] is _S.UNKNOWN
+    assert monitor.resolve_stages([zlib]) == {zlib: _S.EXTRACTED}
+
+    # not applied
+    assert monitor.stage(zlib) is _S.UNKNOWN
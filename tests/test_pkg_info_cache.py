@@ -0,0 +1,235 @@
+# Copyright (c) 2020 Philippe Proulx <eepp.ca>
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Buildroot configuration fingerprint and package information cache
+
+import os
+import os.path
+import json
+import shutil
+import pytest
+import yobr.br
+
+
+# `make show-info` of the fake Buildroot tree: counts its runs
+_MAKEFILE = '''show-info:
+\t@echo run >> runs
+\t@cat show-info.json
+'''
+
+
+# fake Buildroot tree of which `make show-info` prints `br_info`
+@pytest.fixture
+def br_root_dir(tmp_path, br_info):
+    if shutil.which('make') is None:
+        pytest.skip('`make` is not available')
+
+    root_dir = tmp_path / 'buildroot'
+    (root_dir / 'package' / 'zlib').mkdir(parents=True)
+    (root_dir / 'Makefile').write_text(_MAKEFILE)
+    (root_dir / '.config').write_text('BR2_PACKAGE_ZLIB=y\n')
+    (root_dir / 'package' / 'zlib' / 'zlib.mk').write_text('ZLIB_VERSION = 1.2.11\n')
+    (root_dir / 'show-info.json').write_text(json.dumps(br_info))
+    return str(root_dir)
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    return str(tmp_path / 'cache' / 'yobr')
+
+
+def _make_run_count(br_root_dir):
+    try:
+        with open(os.path.join(br_root_dir, 'runs')) as f:
+            return len(f.readlines())
+    except FileNotFoundError:
+        return 0
+
+
+# comparable summary of the package information objects `pkg_infos`
+def _summary(pkg_infos):
+    return {
+        name: (pkg_info.type_name, pkg_info.version, pkg_info.is_virtual,
+               pkg_info.is_installable,
+               tuple(dep.name for dep in pkg_info.dependencies))
+        for name, pkg_info in pkg_infos.items()
+    }
+
+
+def _cache_files(cache_dir):
+    return sorted(name for name in os.listdir(cache_dir)
+                  if name.endswith('.json'))
+
+
+def test_fingerprint_stable(br_root_dir):
+    assert yobr.br.br_config_fingerprint(br_root_dir) == yobr.br.br_config_fingerprint(br_root_dir)
+
+
+@pytest.mark.parametrize('rel_path', ['.config', 'Makefile',
+                                      'package/zlib/zlib.mk'])
+def test_fingerprint_changes(br_root_dir, rel_path):
+    fingerprint = yobr.br.br_config_fingerprint(br_root_dir)
+
+    with open(os.path.join(br_root_dir, rel_path), 'a') as f:
+        f.write('# changed\n')
+
+    assert yobr.br.br_config_fingerprint(br_root_dir) != fingerprint
+
+
+def test_fingerprint_new_mk_file(br_root_dir):
+    fingerprint = yobr.br.br_config_fingerprint(br_root_dir)
+    os.makedirs(os.path.join(br_root_dir, 'package', 'libfoo'))
+
+    with open(os.path.join(br_root_dir, 'package', 'libfoo', 'libfoo.mk'), 'w') as f:
+        f.write('LIBFOO_VERSION = 2.0\n')
+
+    assert yobr.br.br_config_fingerprint(br_root_dir) != fingerprint
+
+
+def test_fingerprint_ignores_other_files(br_root_dir):
+    fingerprint = yobr.br.br_config_fingerprint(br_root_dir)
+
+    with open(os.path.join(br_root_dir, 'package', 'zlib', 'Config.in'), 'w') as f:
+        f.write('config BR2_PACKAGE_ZLIB\n')
+
+    assert yobr.br.br_config_fingerprint(br_root_dir) == fingerprint
+
+
+def test_fingerprint_external_tree(tmp_path, br_root_dir):
+    ext_dir = tmp_path / 'external'
+    (ext_dir / 'package' / 'bar').mkdir(parents=True)
+    (ext_dir / 'package' / 'bar' / 'bar.mk').write_text('BAR_VERSION = 1\n')
+    output_dir = os.path.join(br_root_dir, 'output')
+    os.makedirs(output_dir)
+    fingerprint = yobr.br.br_config_fingerprint(br_root_dir)
+
+    with open(os.path.join(output_dir, '.br2-external.mk'), 'w') as f:
+        f.write('BR2_EXTERNAL_DIRS = {}\n'.format(ext_dir))
+
+    ext_fingerprint = yobr.br.br_config_fingerprint(br_root_dir)
+    assert ext_fingerprint != fingerprint
+    (ext_dir / 'package' / 'bar' / 'bar.mk').write_text('BAR_VERSION = 2\n')
+    assert yobr.br.br_config_fingerprint(br_root_dir) != ext_fingerprint
+
+
+def test_fingerprint_output_dir_config(tmp_path, br_root_dir):
+    output_dir = tmp_path / 'output-arm'
+    output_dir.mkdir()
+    (output_dir / '.config').write_text('BR2_arm=y\n')
+    fingerprint = yobr.br.br_config_fingerprint(br_root_dir, str(output_dir))
+    assert fingerprint != yobr.br.br_config_fingerprint(br_root_dir)
+    (output_dir / '.config').write_text('BR2_aarch64=y\n')
+    assert yobr.br.br_config_fingerprint(br_root_dir, str(output_dir)) != fingerprint
+
+
+def test_cache_saved_and_used(br_root_dir, cache_dir):
+    pkg_infos = yobr.br.pkg_infos_from_make(br_root_dir)
+    assert _make_run_count(br_root_dir) == 1
+    assert len(_cache_files(cache_dir)) == 1
+    cached_pkg_infos = yobr.br.pkg_infos_from_make(br_root_dir)
+    assert _make_run_count(br_root_dir) == 1
+    assert _summary(cached_pkg_infos) == _summary(pkg_infos)
+    assert set(pkg_infos) == {'host-m4', 'host-bison', 'zlib', 'libfoo',
+                              'foo-headers'}
+
+
+def test_cache_refresh(br_root_dir, cache_dir):
+    yobr.br.pkg_infos_from_make(br_root_dir)
+    yobr.br.pkg_infos_from_make(br_root_dir, refresh_cache=True)
+    assert _make_run_count(br_root_dir) == 2
+
+
+def test_cache_not_used(br_root_dir, cache_dir):
+    yobr.br.pkg_infos_from_make(br_root_dir, use_cache=False)
+    yobr.br.pkg_infos_from_make(br_root_dir, use_cache=False)
+    assert _make_run_count(br_root_dir) == 2
+    assert not os.path.exists(cache_dir)
+
+
+def test_outdated_cache_removed(br_root_dir, cache_dir):
+    yobr.br.pkg_infos_from_make(br_root_dir)
+    old_files = _cache_files(cache_dir)
+
+    with open(os.path.join(br_root_dir, '.config'), 'a') as f:
+        f.write('BR2_PACKAGE_LIBFOO=y\n')
+
+    yobr.br.pkg_infos_from_make(br_root_dir)
+    assert _make_run_count(br_root_dir) == 2
+    new_files = _cache_files(cache_dir)
+    assert len(new_files) == 1
+    assert new_files != old_files
+
+
+def test_other_tree_cache_kept(tmp_path, br_root_dir, cache_dir):
+    other_root_dir = str(tmp_path / 'other-buildroot')
+    shutil.copytree(br_root_dir, other_root_dir)
+    yobr.br.pkg_infos_from_make(br_root_dir)
+    yobr.br.pkg_infos_from_make(other_root_dir)
+    assert len(_cache_files(cache_dir)) == 2
+
+
+@pytest.mark.parametrize('content', [
+    '',
+    '{"version": 1, "br-info": {',
+    'garbage',
+    '[]',
+    '{"version": 0, "br-info": {}}',
+    '{"version": 1, "br-info": {"zlib": {"type": 23}}}',
+    '{"version": 1, "br-info": {"zlib": {"type": "bogus"}}}',
+])
+def test_bad_cache_ignored(br_root_dir, cache_dir, br_info, content):
+    fingerprint = yobr.br.br_config_fingerprint(br_root_dir)
+    path = yobr.br._pkg_info_cache_path(br_root_dir, None, fingerprint)
+    os.makedirs(cache_dir)
+
+    with open(path, 'w') as f:
+        f.write(content)
+
+    pkg_infos = yobr.br.pkg_infos_from_make(br_root_dir)
+    assert _make_run_count(br_root_dir) == 1
+    assert _summary(pkg_infos) == _summary(yobr.br.pkg_infos_from_br_info(br_info))
+
+    # rewritten
+    yobr.br.pkg_infos_from_make(br_root_dir)
+    assert _make_run_count(br_root_dir) == 1
+
+
+def test_unwritable_cache_dir(tmp_path, monkeypatch, br_root_dir):
+    # `XDG_CACHE_HOME` is a regular file
+    path = tmp_path / 'not-a-dir'
+    path.write_text('')
+    monkeypatch.setenv('XDG_CACHE_HOME', str(path))
+    pkg_infos = yobr.br.pkg_infos_from_make(br_root_dir)
+    assert 'zlib' in pkg_infos
+    yobr.br.pkg_infos_from_make(br_root_dir)
+    assert _make_run_count(br_root_dir) == 2
+
+
+def test_save_cached_pkg_infos_atomic(br_root_dir, cache_dir, br_info):
+    pkg_infos = yobr.br.pkg_infos_from_br_info(br_info)
+    path = os.path.join(cache_dir, 'abc.json')
+    yobr.br._save_cached_pkg_infos(path, pkg_infos, br_root_dir)
+
+    # no temporary file left
+    assert os.listdir(cache_dir) == ['abc.json']
+    br_info = yobr.br._load_cached_br_info(path)
+    assert _summary(yobr.br.pkg_infos_from_br_info(br_info)) == _summary(pkg_infos)
@@ -0,0 +1,257 @@
+# Copyright (c) 2020 Philippe Proulx <eepp.ca>
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# build stages shared through a state file
+
+import os
+import copy
+import array
+import shutil
+import pytest
+import yobr.br
+import yobr.shared
+
+
+_S = yobr.br.PkgBuildStage
+_T0 = 1500000000
+
+
+@pytest.fixture
+def state_path(tmp_path):
+    return str(tmp_path / 'output' / '.yobr-state')
+
+
+# function which creates a package build monitor sharing its stages
+# through `state_path`, with its own package builds (like another yobr
+# instance)
+@pytest.fixture
+def create_monitor(br_info, br_build_dir, state_path):
+    states = []
+
+    def create(br_info=br_info):
+        pkg_infos = yobr.br.pkg_infos_from_br_info(br_info)
+        pkg_builds = yobr.br.pkg_builds_from_pkg_infos(pkg_infos, br_build_dir)
+        graph = next(iter(pkg_builds.values())).info.graph
+        state = yobr.shared.SharedPkgBuildState(state_path, graph)
+        states.append(state)
+        return yobr.br.PkgBuildMonitor(pkg_builds, shared_state=state)
+
+    yield create
+
+    for state in states:
+        state.close()
+
+
+def _touch_zlib(monitor, touch_stamps):
+    for stamp, rel_time in [('downloaded', 0), ('extracted', 1),
+                            ('patched', 2), ('configured', 5),
+                            ('built', 15), ('staging_installed', 17)]:
+        touch_stamps(monitor.pkg_builds['zlib'], stamp, mtime=_T0 + rel_time)
+
+
+def test_default_state_path():
+    assert yobr.shared.default_state_path('/br/output/build') == '/br/output/.yobr-state'
+
+
+def test_file_format(create_monitor, state_path, touch_stamps):
+    monitor = create_monitor()
+    _touch_zlib(monitor, touch_stamps)
+    monitor.update()
+    state = monitor.shared_state
+    assert state.is_publisher
+
+    with open(state_path, 'rb') as f:
+        data = f.read()
+
+    count = len(monitor.graph)
+    assert len(data) == yobr.shared._file_size(count)
+    magic, version, file_count, key, seq, pid, _ = yobr.shared._HEADER.unpack_from(data)
+    assert magic == b'YOBRSHM\0'
+    assert version == 1
+    assert file_count == count
+    assert key == yobr.shared._graph_key(monitor.graph)
+    assert seq > 0 and seq % 2 == 0
+    assert pid == os.getpid()
+    assert yobr.shared._SEQ.unpack_from(data, yobr.shared._SEQ_OFFSET)[0] == seq
+
+    # stage indexes, and then stage times
+    zlib = monitor.pkg_builds['zlib'].info
+    header_size = yobr.shared._HEADER.size
+    assert data[header_size:header_size + count] == monitor.stages.indexes.tobytes()
+    assert data[header_size + zlib.id] == list(_S).index(_S.INSTALLED)
+    offset = yobr.shared._stage_times_offset(count)
+    assert offset % 8 == 0
+    times = array.array('d')
+    times.frombytes(data[offset:])
+    zlib_times = times[zlib.id * 7:zlib.id * 7 + 7]
+    assert zlib_times[list(_S).index(_S.BUILT)] == _T0 + 15
+    assert zlib_times[list(_S).index(_S.UNKNOWN)] != zlib_times[list(_S).index(_S.UNKNOWN)]
+
+
+def test_reader(create_monitor, touch_stamps):
+    publisher = create_monitor()
+    reader = create_monitor()
+    publisher.update()
+    assert reader.update() == set()
+    assert not reader.shared_state.is_publisher
+    _touch_zlib(publisher, touch_stamps)
+    publisher.update()
+
+    # the reader doesn't read the stamp files
+    shutil.rmtree(publisher.pkg_builds['zlib'].build_dir)
+    zlib = reader.pkg_builds['zlib']
+    assert reader.update() == {zlib}
+    assert reader.stage(zlib) is _S.INSTALLED
+    assert zlib.stage_time(_S.BUILT) == _T0 + 15
+    assert zlib.stage_duration(_S.BUILT) == 10
+    assert reader.stage_counts == publisher.stage_counts
+
+    # nothing new
+    assert reader.update() == set()
+
+
+def test_reader_odd_seq(create_monitor, touch_stamps):
+    publisher = create_monitor()
+    reader = create_monitor()
+    publisher.update()
+    reader.update()
+    _touch_zlib(publisher, touch_stamps)
+    publisher.update()
+
+    # publisher is writing (or died while writing)
+    mm = publisher.shared_state._mm
+    seq = yobr.shared._SEQ.unpack_from(mm, yobr.shared._SEQ_OFFSET)[0]
+    yobr.shared._SEQ.pack_into(mm, yobr.shared._SEQ_OFFSET, seq + 1)
+    assert reader.update() == set()
+    assert reader.stage(reader.pkg_builds['zlib']) is _S.UNKNOWN
+
+    # done
+    yobr.shared._SEQ.pack_into(mm, yobr.shared._SEQ_OFFSET, seq + 2)
+    assert reader.update() == {reader.pkg_builds['zlib']}
+
+
+# `struct.Struct` of which unpack_from() calls `hook` before its
+# `n`th call
+class _HookedStruct:
+    def __init__(self, struct, n, hook):
+        self._struct = struct
+        self._n = n
+        self._hook = hook
+        self.call_count = 0
+
+    def unpack_from(self, *args):
+        self.call_count += 1
+
+        if self.call_count == self._n:
+            self._hook()
+
+        return self._struct.unpack_from(*args)
+
+    def pack_into(self, *args):
+        return self._struct.pack_into(*args)
+
+
+def test_reader_torn_read(monkeypatch, create_monitor, touch_stamps):
+    publisher = create_monitor()
+    reader = create_monitor()
+    publisher.update()
+    reader.update()
+    _touch_zlib(publisher, touch_stamps)
+    publisher.update()
+
+    # the publisher publishes again while the reader copies the data
+    def publish():
+        touch_stamps(publisher.pkg_builds['host-m4'], 'downloaded',
+                     mtime=_T0)
+        publisher.update()
+
+    seq_struct = _HookedStruct(yobr.shared._SEQ, 2, publish)
+    monkeypatch.setattr(yobr.shared, '_SEQ', seq_struct)
+    changed = reader.update()
+
+    # second attempt: both changes
+    assert seq_struct.call_count == 4
+    assert changed == {reader.pkg_builds['zlib'], reader.pkg_builds['host-m4']}
+    assert reader.stage(reader.pkg_builds['host-m4']) is _S.DOWNLOADED
+
+
+def test_reader_busy_publisher(monkeypatch, create_monitor, touch_stamps):
+    publisher = create_monitor()
+    reader = create_monitor()
+    publisher.update()
+    reader.update()
+    _touch_zlib(publisher, touch_stamps)
+    publisher.update()
+
+    # the sequence number changes during each read
+    seq = yobr.shared._SEQ.unpack_from(publisher.shared_state._mm,
+                                       yobr.shared._SEQ_OFFSET)[0]
+    seqs = iter(range(seq, seq + 1000, 2))
+
+    class ChangingSeq:
+        def unpack_from(self, *args):
+            return (next(seqs),)
+
+    monkeypatch.setattr(yobr.shared, '_SEQ', ChangingSeq())
+
+    # try again next time
+    assert reader.update() == set()
+    assert reader.stage(reader.pkg_builds['zlib']) is _S.UNKNOWN
+    monkeypatch.undo()
+    assert reader.update() == {reader.pkg_builds['zlib']}
+
+
+def test_takeover(create_monitor, touch_stamps):
+    publisher = create_monitor()
+    reader = create_monitor()
+    publisher.update()
+    reader.update()
+    assert not reader.shared_state.acquire()
+
+    # publisher exits
+    publisher.shared_state.close()
+    _touch_zlib(publisher, touch_stamps)
+
+    # reads the stamp files itself
+    zlib = reader.pkg_builds['zlib']
+    assert reader.update() == {zlib}
+    assert reader.shared_state.is_publisher
+    assert reader.stage(zlib) is _S.INSTALLED
+
+    # and publishes them for a new reader
+    new_reader = create_monitor()
+    assert new_reader.update() == {new_reader.pkg_builds['zlib']}
+    assert not new_reader.shared_state.is_publisher
+
+
+def test_other_graph(create_monitor, br_info, touch_stamps):
+    publisher = create_monitor()
+    publisher.update()
+
+    # one more package: reads the stamp files itself
+    other_br_info = copy.deepcopy(br_info)
+    other_br_info['bar'] = {'type': 'host', 'version': '1',
+                            'dependencies': []}
+    other = create_monitor(other_br_info)
+    _touch_zlib(other, touch_stamps)
+    assert other.shared_state.read(other) is None
+    assert other.update() == {other.pkg_builds['zlib']}
+    assert not other.shared_state.is_publisher
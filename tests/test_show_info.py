@@ -0,0 +1,198 @@
+# Copyright (c) 2020 Philippe Proulx <eepp.ca>
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# running and parsing `make show-info`
+
+import json
+import time
+import shutil
+import itertools
+import threading
+import pytest
+import yobr.br
+
+
+# function which creates a fake Buildroot tree of which the `show-info`
+# recipe is `recipe` (list of lines), returning its path
+@pytest.fixture
+def make_br_root_dir(tmp_path):
+    if shutil.which('make') is None:
+        pytest.skip('`make` is not available')
+
+    def make(recipe):
+        root_dir = tmp_path / 'buildroot'
+        root_dir.mkdir()
+        lines = ['show-info:'] + ['\t' + line for line in recipe]
+        (root_dir / 'Makefile').write_text('\n'.join(lines) + '\n')
+        return str(root_dir)
+
+    return make
+
+
+# text stream which reads its content by chunks of 1 to 3 characters,
+# whatever the requested size
+class _ChunkedStream:
+    def __init__(self, text, chunk_sizes=(1, 2, 3)):
+        self._text = text
+        self._pos = 0
+        self._chunk_sizes = itertools.cycle(chunk_sizes)
+
+    def read(self, size=-1):
+        chunk = self._text[self._pos:self._pos + next(self._chunk_sizes)]
+        self._pos += len(chunk)
+        return chunk
+
+
+def _br_info_items(text, chunk_sizes=(1, 2, 3)):
+    return list(yobr.br._iter_br_info_items(_ChunkedStream(text,
+                                                           chunk_sizes)))
+
+
+@pytest.mark.parametrize('chunk_sizes', [(1,), (2,), (3,), (1, 2, 3),
+                                         (3, 1, 2)])
+def test_br_info_items_chunked(br_info, chunk_sizes):
+    text = json.dumps(br_info, indent=2)
+    assert _br_info_items(text, chunk_sizes) == list(br_info.items())
+
+
+@pytest.mark.parametrize('text', ['{}', '  {\n}', '{ }\n\n', '\t{}  '])
+def test_br_info_items_empty(text):
+    assert _br_info_items(text) == []
+
+
+@pytest.mark.parametrize('text, items', [
+    ('{"zlib": {}}  \n', [('zlib', {})]),
+    (' { "zlib" : { } , "m4" :{"a":[1, 2]}\n}\n', [('zlib', {}),
+                                                    ('m4', {'a': [1, 2]})]),
+
+    # values which end with a chunk, but could continue
+    ('{"a": 1234, "b": true, "c": -5.25e3}',
+     [('a', 1234), ('b', True), ('c', -5.25e3)]),
+    ('{"\\u00e9t\\u00e9": "caf\u00e9"}', [('\u00e9t\u00e9', 'caf\u00e9')]),
+])
+def test_br_info_items_whitespace(text, items):
+    for chunk_sizes in [(1,), (2,), (3,), (1, 2, 3)]:
+        assert _br_info_items(text, chunk_sizes) == items
+
+
+@pytest.mark.parametrize('text', [
+    '',
+    '   ',
+    '[]',
+    '{"zlib": {},}',
+    '{"zlib": {}, }',
+    '{,}',
+    '{"zlib" {}}',
+    '{"zlib": {}} ',
+])
+def test_br_info_items_malformed(text):
+    if text.endswith('} '):
+        # anything after the object is not read
+        assert _br_info_items(text) == [('zlib', {})]
+        return
+
+    with pytest.raises(ValueError):
+        _br_info_items(text)
+
+
+def test_br_info_items_truncated(br_info):
+    text = json.dumps(br_info)
+
+    for length in range(len(text)):
+        with pytest.raises(ValueError):
+            _br_info_items(text[:length])
+
+
+def test_make_error_reported(make_br_root_dir):
+    br_root_dir = make_br_root_dir(['@echo "{\\"zlib\\": " ',
+                                    '@echo "Makefile:42: oops" >&2',
+                                    '@false'])
+
+    with pytest.raises(RuntimeError, match='oops'):
+        yobr.br.pkg_infos_from_make(br_root_dir, use_cache=False)
+
+
+@pytest.mark.parametrize('first_item, exc_type', [
+    ('"zlib": []', TypeError),
+    ('"zlib": {}', KeyError),
+    ('"zlib": {"type": "host", "version": 23}', TypeError),
+    ('"zlib": {"type": "bogus"}', ValueError),
+    ('"zlib" {}', ValueError),
+])
+def test_unexpected_json(make_br_root_dir, first_item, exc_type):
+    # the rest of the output (2 MiB) doesn't fit in a pipe buffer: `make`
+    # only exits once it's read
+    br_root_dir = make_br_root_dir([
+        "@printf '%s' '{{{}, '".format(first_item),
+        "@head -c 2097152 /dev/zero | tr '\\0' ' '",
+        "@echo '}'",
+    ])
+
+    with pytest.raises(exc_type):
+        yobr.br.pkg_infos_from_make(br_root_dir, use_cache=False)
+
+
+def test_unexpected_json_make_error(make_br_root_dir):
+    br_root_dir = make_br_root_dir(['@echo \'{"zlib": []}\'',
+                                    '@echo "Makefile:42: oops" >&2',
+                                    '@false'])
+
+    # `make`'s error first
+    with pytest.raises(RuntimeError, match='oops'):
+        yobr.br.pkg_infos_from_make(br_root_dir, use_cache=False)
+
+
+def test_cancel(make_br_root_dir):
+    br_root_dir = make_br_root_dir(["@printf '{'", '@sleep 60', "@echo '}'"])
+    canceller = yobr.br.MakeCanceller()
+    excs = []
+
+    def run():
+        try:
+            yobr.br.pkg_infos_from_make(br_root_dir, use_cache=False,
+                                        canceller=canceller)
+        except Exception as exc:
+            excs.append(exc)
+
+    thread = threading.Thread(target=run)
+    start_time = time.monotonic()
+    thread.start()
+    time.sleep(.5)
+    canceller.cancel()
+    thread.join(10)
+    assert not thread.is_alive()
+    assert time.monotonic() - start_time < 10
+    assert len(excs) == 1
+    assert type(excs[0]) is RuntimeError
+    assert 'cancelled' in str(excs[0])
+
+
+def test_cancel_before_start(make_br_root_dir):
+    br_root_dir = make_br_root_dir(["@printf '{'", '@sleep 60', "@echo '}'"])
+    canceller = yobr.br.MakeCanceller()
+    canceller.cancel()
+    start_time = time.monotonic()
+
+    with pytest.raises(RuntimeError, match='cancelled'):
+        yobr.br.pkg_infos_from_make(br_root_dir, use_cache=False,
+                                    canceller=canceller)
+
+    assert time.monotonic() - start_time < 10
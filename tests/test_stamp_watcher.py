@@ -0,0 +1,159 @@
+# Copyright (c) 2020 Philippe Proulx <eepp.ca>
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# package build stamp watcher (Linux inotify)
+
+import os
+import shutil
+import select
+import pytest
+import yobr.br
+import yobr.inotify
+
+
+@pytest.fixture
+def watcher(pkg_builds, br_build_dir):
+    try:
+        watcher = yobr.br.PkgBuildStampWatcher(pkg_builds, br_build_dir)
+    except OSError as exc:
+        pytest.skip('inotify is not available: {}'.format(exc))
+
+    yield watcher
+    watcher.close()
+
+
+def _is_readable(watcher):
+    readable, _, _ = select.select([watcher], [], [], 0)
+    return len(readable) > 0
+
+
+# checks that the watch descriptor dictionaries are each other's
+# reverse
+def _check_wds(watcher):
+    assert len(watcher._wd_pkg_builds) == len(watcher._pkg_build_wds)
+
+    for wd, pkg_build in watcher._wd_pkg_builds.items():
+        assert watcher._pkg_build_wds[pkg_build] == wd
+
+
+def test_initially_all_pending(watcher, pkg_builds):
+    assert watcher.pending_pkg_builds() == set(pkg_builds.values())
+    assert watcher.pending_pkg_builds() == set()
+
+
+def test_stamp_created(watcher, pkg_builds, touch_stamps):
+    zlib = pkg_builds['zlib']
+    touch_stamps(zlib, 'downloaded')
+    watcher.pending_pkg_builds()
+
+    # the package build directory is now watched
+    assert zlib in watcher._pkg_build_wds
+    _check_wds(watcher)
+    touch_stamps(zlib, 'extracted')
+    assert _is_readable(watcher)
+    assert watcher.pending_pkg_builds() == {zlib}
+    assert not _is_readable(watcher)
+
+
+def test_non_stamp_file_ignored(watcher, pkg_builds, touch_stamps):
+    zlib = pkg_builds['zlib']
+    touch_stamps(zlib, 'downloaded')
+    watcher.pending_pkg_builds()
+
+    with open(os.path.join(zlib.build_dir, 'config.log'), 'w'):
+        pass
+
+    assert watcher.pending_pkg_builds() == set()
+
+
+def test_pkg_build_dir_created_after_watch(watcher, pkg_builds,
+                                           touch_stamps):
+    watcher.pending_pkg_builds()
+    libfoo = pkg_builds['libfoo']
+    assert libfoo not in watcher._pkg_build_wds
+
+    # stamp created before the watcher processes the directory creation
+    touch_stamps(libfoo, 'downloaded')
+    assert watcher.pending_pkg_builds() == {libfoo}
+    assert libfoo in watcher._pkg_build_wds
+    touch_stamps(libfoo, 'extracted')
+    assert watcher.pending_pkg_builds() == {libfoo}
+
+
+def test_pkg_build_dir_removed(watcher, pkg_builds, touch_stamps):
+    zlib = pkg_builds['zlib']
+    touch_stamps(zlib, 'downloaded')
+    watcher.pending_pkg_builds()
+    wd = watcher._pkg_build_wds[zlib]
+
+    # `make zlib-dirclean`
+    shutil.rmtree(zlib.build_dir)
+    assert watcher.pending_pkg_builds() == {zlib}
+    assert zlib not in watcher._pkg_build_wds
+    assert wd not in watcher._wd_pkg_builds
+    _check_wds(watcher)
+
+    # created again
+    touch_stamps(zlib, 'downloaded')
+    assert watcher.pending_pkg_builds() == {zlib}
+    assert zlib in watcher._pkg_build_wds
+    _check_wds(watcher)
+
+
+def test_queue_overflow(watcher, pkg_builds):
+    watcher.pending_pkg_builds()
+    overflow = yobr.inotify.InotifyEvent(-1, yobr.inotify.IN_Q_OVERFLOW, 0,
+                                         None)
+    watcher._process_event(overflow)
+    assert watcher.pending_pkg_builds() == set(pkg_builds.values())
+
+
+def test_br_build_dir_created_later(pkg_builds, br_build_dir, touch_stamps):
+    shutil.rmtree(br_build_dir)
+
+    try:
+        watcher = yobr.br.PkgBuildStampWatcher(pkg_builds, br_build_dir)
+    except OSError as exc:
+        pytest.skip('inotify is not available: {}'.format(exc))
+
+    try:
+        # polls everything until the build directory exists
+        assert watcher.pending_pkg_builds() == set(pkg_builds.values())
+        assert watcher.pending_pkg_builds() == set(pkg_builds.values())
+        os.makedirs(br_build_dir)
+        assert watcher.pending_pkg_builds() == set(pkg_builds.values())
+        assert watcher.pending_pkg_builds() == set()
+        zlib = pkg_builds['zlib']
+        touch_stamps(zlib, 'downloaded')
+        assert watcher.pending_pkg_builds() == {zlib}
+    finally:
+        watcher.close()
+
+
+def test_monitor_with_watcher(watcher, pkg_builds, touch_stamps):
+    monitor = yobr.br.PkgBuildMonitor(pkg_builds, watcher)
+    assert monitor.update() == set()
+    assert monitor.waitables == [watcher]
+    zlib = pkg_builds['zlib']
+    touch_stamps(zlib, 'downloaded', 'extracted')
+    assert monitor.update() == {zlib}
+    assert monitor.stage(zlib) is yobr.br.PkgBuildStage.EXTRACTED
+    assert not _is_readable(watcher)
@@ -0,0 +1,327 @@
+# Copyright (c) 2020 Philippe Proulx <eepp.ca>
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# package build step event sources: Buildroot's `build-time.log` and
+# the datagrams of `yobr-br-hook` and `yobr-make`
+
+import os
+import sys
+import socket
+import pytest
+import yobr.br
+import yobr.hook
+
+
+@pytest.mark.parametrize('line, event', [
+    # as Buildroot writes them
+    ('1581023645.123456789:start:configure           : host-m4',
+     (1581023645.123456789, True, 'configure', 'host-m4')),
+    ('1581023645.5:end  :install-staging     : zlib',
+     (1581023645.5, False, 'install-staging', 'zlib')),
+    ('1581023645:start:build               : linux-headers\n',
+     (1581023645., True, 'build', 'linux-headers')),
+
+    # not padded
+    ('12.5:end:build:libfoo', (12.5, False, 'build', 'libfoo')),
+
+    # malformed
+    ('', None),
+    ('\n', None),
+    ('garbage', None),
+    ('1581023645.5:start:build', None),
+    ('1581023645.5:begin:build               : zlib', None),
+    ('now:start:build               : zlib', None),
+    (':start:build               : zlib', None),
+    ('nan:start:build               : zlib', None),
+    ('inf:end  :build               : zlib', None),
+    ('1581023645.5:start:                    : zlib', None),
+    ('1581023645.5:start:build               : ', None),
+    ('1581023645.5:start:build               :', None),
+    ('��:start:build : zlib', None),
+])
+def test_build_time_log_line(line, event):
+    parsed = yobr.br.pkg_build_step_event_from_build_time_log_line(line)
+
+    if event is None:
+        assert parsed is None
+    else:
+        assert (parsed.time, parsed.is_start, parsed.step, parsed.pkg_name) == event
+
+
+def _summary(events):
+    return [(e.is_start, e.step, e.pkg_name) for e in events]
+
+
+@pytest.fixture
+def tailer(tmp_path):
+    tailer = yobr.br.BuildTimeLogTailer(str(tmp_path / 'build-time.log'))
+    yield tailer
+    tailer.close()
+
+
+def _append(tailer, data):
+    with open(tailer.path, 'ab') as f:
+        f.write(data)
+
+
+def test_tailer_no_file(tailer):
+    assert tailer.read_events() == []
+    assert tailer.read_events() == []
+
+
+def test_tailer(tailer):
+    _append(tailer, b'1.0:start:extract             : zlib\n')
+    assert _summary(tailer.read_events()) == [(True, 'extract', 'zlib')]
+    assert tailer.read_events() == []
+
+    # malformed lines are ignored
+    _append(tailer, b'oops\n\xff\xfe\n2.0:end  :extract             : zlib\n\n')
+    assert _summary(tailer.read_events()) == [(False, 'extract', 'zlib')]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 7, 40])
+def test_tailer_partial_lines(tailer, chunk_size):
+    data = b''.join(b'1.0:start:build               : pkg-%d\n' % i
+                    for i in range(5))
+    events = []
+
+    for i in range(0, len(data), chunk_size):
+        _append(tailer, data[i:i + chunk_size])
+        events += tailer.read_events()
+
+    assert _summary(events) == [(True, 'build', 'pkg-{}'.format(i))
+                                for i in range(5)]
+
+
+def test_tailer_truncated(tailer):
+    _append(tailer, b'1.0:start:extract             : zlib\n')
+    tailer.read_events()
+
+    # new build
+    with open(tailer.path, 'wb') as f:
+        f.write(b'2.0:st')
+
+    assert tailer.read_events() is None
+    _append(tailer, b'art:extract             : m4\n')
+    assert _summary(tailer.read_events()) == [(True, 'extract', 'm4')]
+
+
+def test_tailer_removed_and_replaced(tailer):
+    _append(tailer, b'1.0:start:extract             : zlib\n')
+    tailer.read_events()
+    os.remove(tailer.path)
+    assert tailer.read_events() is None
+    assert tailer.read_events() == []
+
+    # replaced by a bigger file
+    _append(tailer, b'1.0:start:extract             : zlib\n')
+    tailer.read_events()
+    new_path = tailer.path + '.new'
+
+    with open(new_path, 'wb') as f:
+        f.write(b'2.0:start:extract             : m4\n' * 3)
+
+    os.replace(new_path, tailer.path)
+    assert tailer.read_events() is None
+    assert _summary(tailer.read_events()) == [(True, 'extract', 'm4')] * 3
+
+
+def test_tailer_monitor(tailer, pkg_builds, touch_stamps):
+    zlib = pkg_builds['zlib']
+    monitor = yobr.br.PkgBuildMonitor(pkg_builds, step_event_source=tailer)
+    monitor.update()
+    touch_stamps(zlib, 'downloaded', mtime=1.)
+    _append(tailer, b'2.0:start:extract             : zlib\n'
+                    b'3.0:end  :extract             : zlib\n'
+                    b'3.0:start:patch               : zlib\n')
+
+    # from the events only
+    assert monitor.update() == {zlib}
+    assert monitor.stage(zlib) is yobr.br.PkgBuildStage.EXTRACTED
+    assert monitor.active_step(zlib).name == 'patch'
+    assert zlib.stage_time(yobr.br.PkgBuildStage.EXTRACTED) == 3.
+
+
+_Step = yobr.br.PkgBuildStepEvent
+_Output = yobr.br.PkgBuildOutputEvent
+_Failure = yobr.br.PkgBuildFailureEvent
+
+
+@pytest.mark.parametrize('data, event_type, attrs', [
+    (b'1.5 start configure host-m4', _Step,
+     dict(time=1.5, is_start=True, step='configure', pkg_name='host-m4')),
+    (b'1.5 end install-target zlib\n', _Step,
+     dict(time=1.5, is_start=False, step='install-target', pkg_name='zlib')),
+    (b'1.5 output zlib\nchecking for gcc... gcc\n\xff done', _Output,
+     dict(time=1.5, pkg_name='zlib',
+          lines=('checking for gcc... gcc', '\ufffd done'))),
+    (b'1.5 output zlib', _Output, dict(pkg_name='zlib', lines=('',))),
+    (b'1.5 fail libfoo', _Failure, dict(time=1.5, pkg_name='libfoo')),
+
+    # malformed
+    (b'', None, None),
+    (b'\n\n', None, None),
+    (b'garbage', None, None),
+    (b'1.5 start', None, None),
+    (b'1.5 start build', None, None),
+    (b'1.5 start build ', None, None),
+    (b'1.5  start build zlib', None, None),
+    (b'1.5 begin build zlib', None, None),
+    (b'now start build zlib', None, None),
+    (b'nan start build zlib', None, None),
+    (b'-inf end build zlib', None, None),
+    (b'1.5 output', None, None),
+    (b'1.5 output zlib extra\nline', None, None),
+    (b'1.5 fail', None, None),
+    (b'1.5 fail ', None, None),
+    (b'1.5 fail libfoo extra', None, None),
+    (b'\xff\xfe start build zlib', None, None),
+])
+def test_datagram(data, event_type, attrs):
+    event = yobr.br._pkg_build_event_from_datagram(data)
+
+    if event_type is None:
+        assert event is None
+        return
+
+    assert type(event) is event_type
+
+    for name, value in attrs.items():
+        assert getattr(event, name) == value
+
+
+@pytest.mark.parametrize('env, path', [
+    ({}, None),
+    ({'YOBR_SOCKET': '/tmp/yobr.sock', 'O': '/br/output'}, '/tmp/yobr.sock'),
+    ({'O': '/br/output'}, '/br/output/.yobr.sock'),
+    ({'BUILD_DIR': '/br/out/build/'}, '/br/out/.yobr.sock'),
+    ({'O': '', 'BUILD_DIR': '/br/out/build'}, '/br/out/.yobr.sock'),
+    ({'YOBR_SOCKET': ''}, None),
+])
+def test_hook_socket_path(env, path):
+    assert yobr.hook._socket_path(env) == path
+
+
+def test_hook_format_step_event():
+    data = yobr.hook._format_step_event(1581023645.123456789, 'start',
+                                        'install-staging', 'zlib')
+    assert data == b'1581023645.123457 start install-staging zlib'
+    event = yobr.br._pkg_build_event_from_datagram(data)
+    assert (event.is_start, event.step, event.pkg_name) == (True, 'install-staging', 'zlib')
+
+
+@pytest.fixture
+def receiver(tmp_path):
+    receiver = yobr.br.PkgBuildStepEventReceiver(str(tmp_path / '.yobr.sock'))
+    yield receiver
+    receiver.close()
+
+
+def _send(path, *datagrams):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+        for data in datagrams:
+            sock.sendto(data, path)
+
+
+@pytest.mark.parametrize('argv', [
+    [],
+    ['start'],
+    ['start', 'build'],
+    ['start', 'build', 'zlib', 'extra'],
+])
+def test_hook_bad_argv(monkeypatch, receiver, argv):
+    monkeypatch.setenv('YOBR_SOCKET', receiver.path)
+    monkeypatch.setattr(sys, 'argv', ['yobr-br-hook'] + argv)
+    yobr.hook.main()
+    assert receiver.read_events() == []
+
+
+def test_hook_no_listener(monkeypatch, tmp_path):
+    # never raises
+    monkeypatch.setenv('YOBR_SOCKET', str(tmp_path / 'nope' / '.yobr.sock'))
+    monkeypatch.setattr(sys, 'argv', ['yobr-br-hook', 'start', 'build', 'zlib'])
+    yobr.hook.main()
+    monkeypatch.delenv('YOBR_SOCKET')
+    monkeypatch.delenv('O', raising=False)
+    monkeypatch.delenv('BUILD_DIR', raising=False)
+    yobr.hook.main()
+
+
+def test_hook_sends(monkeypatch, receiver):
+    monkeypatch.setenv('YOBR_SOCKET', receiver.path)
+
+    for kind in ('start', 'end'):
+        monkeypatch.setattr(sys, 'argv', ['yobr-br-hook', kind, 'build', 'zlib'])
+        yobr.hook.main()
+
+    assert _summary(receiver.read_events()) == [(True, 'build', 'zlib'),
+                                                (False, 'build', 'zlib')]
+
+
+def test_receiver_malformed_ignored(receiver):
+    _send(receiver.path, b'1.0 start build zlib', b'garbage', b'',
+          b'nan end build zlib', b'2.0 fail zlib', b'\xff' * 100)
+    events = receiver.read_events()
+    assert [type(e) for e in events] == [_Step, _Failure]
+    assert receiver.read_events() == []
+
+
+def test_receiver_bound_later(tmp_path):
+    path = tmp_path / 'output' / '.yobr.sock'
+    receiver = yobr.br.PkgBuildStepEventReceiver(str(path))
+
+    try:
+        assert receiver.read_events() == []
+        path.parent.mkdir()
+
+        # just bound: events could have been lost
+        assert receiver.read_events() is None
+        _send(str(path), b'1.0 start build zlib')
+        assert _summary(receiver.read_events()) == [(True, 'build', 'zlib')]
+
+        # `make distclean`
+        os.remove(str(path))
+        assert receiver.read_events() is None
+        _send(str(path), b'1.0 end build zlib')
+        assert _summary(receiver.read_events()) == [(False, 'build', 'zlib')]
+    finally:
+        receiver.close()
+
+    assert not path.exists()
+
+
+def test_receiver_stale_and_busy(tmp_path):
+    path = str(tmp_path / '.yobr.sock')
+
+    # stale socket file of a killed process
+    with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+        sock.bind(path)
+
+    receiver = yobr.br.PkgBuildStepEventReceiver(path)
+
+    try:
+        # another process listens
+        with pytest.raises(OSError):
+            yobr.br.PkgBuildStepEventReceiver(path)
+
+        assert yobr.br.create_pkg_build_step_event_receiver(path) is None
+    finally:
+        receiver.close()
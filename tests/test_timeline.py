@@ -0,0 +1,158 @@
+# Copyright (c) 2020 Philippe Proulx <eepp.ca>
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# build timeline: transition log, bars, and concurrency
+
+import os
+import pytest
+import yobr.br
+import yobr.timeline
+
+
+_S = yobr.br.PkgBuildStage
+
+
+def _bar(start_time, end_time, is_done=True):
+    return yobr.timeline.PkgBuildTimelineBar(None, [(_S.BUILT, start_time,
+                                                     end_time)], is_done)
+
+
+@pytest.mark.parametrize('intervals, steps', [
+    ([], []),
+    ([(0, 10)], [(0, 1), (10, 0)]),
+    ([(0, 10), (5, 15)], [(0, 1), (5, 2), (10, 1), (15, 0)]),
+
+    # one ends when the other starts: never 2 at a time
+    ([(0, 10), (10, 20)], [(0, 1), (10, 1), (20, 0)]),
+
+    # same start times
+    ([(0, 10), (0, 5), (0, 20)], [(0, 3), (5, 2), (10, 1), (20, 0)]),
+
+    # empty bar
+    ([(0, 10), (4, 4)], [(0, 1), (4, 1), (10, 0)]),
+])
+def test_concurrency(intervals, steps):
+    bars = [_bar(start_time, end_time) for start_time, end_time in intervals]
+    assert yobr.timeline.timeline_concurrency(bars) == steps
+
+
+@pytest.mark.parametrize('steps, max_count, average_count, durations', [
+    ([], 0, 0., {}),
+    ([(0, 1), (10, 0)], 1, 1., {1: 10.}),
+    ([(0, 1), (5, 2), (10, 1), (15, 0)], 2, 20. / 15., {1: 10., 2: 5.}),
+    ([(0, 1), (10, 0), (20, 1), (30, 0)], 1, 2. / 3., {1: 20., 0: 10.}),
+])
+def test_concurrency_stats(steps, max_count, average_count, durations):
+    stats = yobr.timeline.timeline_concurrency_stats(steps)
+    assert stats == (max_count, pytest.approx(average_count), durations)
+
+
+_T0 = 1500000000
+
+
+def test_bars(pkg_builds, touch_stamps):
+    zlib = pkg_builds['zlib']
+    m4 = pkg_builds['host-m4']
+
+    for stamp, rel_time in [('downloaded', 0), ('extracted', 1),
+                            ('patched', 2), ('configured', 5),
+                            ('built', 15), ('staging_installed', 17)]:
+        touch_stamps(zlib, stamp, mtime=_T0 + rel_time)
+
+    for stamp, rel_time in [('downloaded', 0), ('extracted', 10),
+                            ('patched', 11)]:
+        touch_stamps(m4, stamp, mtime=_T0 + rel_time)
+
+    # not extracted
+    touch_stamps(pkg_builds['libfoo'], 'downloaded', mtime=_T0)
+
+    for pkg_build in pkg_builds.values():
+        pkg_build.stamps
+
+    bars = yobr.timeline.pkg_build_timeline_bars(pkg_builds.values(), _T0 + 30)
+    assert [bar.pkg_build for bar in bars] == [zlib, m4]
+    assert bars[0].is_done
+    assert bars[0].segments == ((_S.PATCHED, _T0 + 1, _T0 + 2),
+                                (_S.CONFIGURED, _T0 + 2, _T0 + 5),
+                                (_S.BUILT, _T0 + 5, _T0 + 15),
+                                (_S.INSTALLED, _T0 + 15, _T0 + 17))
+
+    # in progress: the last segment extends to now
+    assert not bars[1].is_done
+    assert bars[1].segments[-1] == (_S.CONFIGURED, _T0 + 11, _T0 + 30)
+    later_bars = yobr.timeline.pkg_build_timeline_bars(pkg_builds.values(),
+                                                       _T0 + 60)
+    assert later_bars[1].end_time == _T0 + 60
+    assert later_bars[0].end_time == _T0 + 17
+
+
+def _write(log, pkg_build, observed_time):
+    transition = yobr.br.PkgBuildStageTransition(pkg_build, _S.PATCHED,
+                                                 _S.CONFIGURED, _T0,
+                                                 observed_time)
+    log.write([transition])
+
+
+def test_log_read_back(tmp_path, pkg_builds):
+    path = str(tmp_path / 'transitions.ndjson')
+    log = yobr.timeline.PkgBuildStageTransitionLog(path)
+    _write(log, pkg_builds['zlib'], _T0 + 1.23456)
+    log.close()
+
+    # line which yobr was writing when it was killed
+    with open(path, 'a') as f:
+        f.write('{"time": 1500000002, "pkg": "zl')
+
+    transitions = list(yobr.timeline.read_pkg_build_stage_transitions(path))
+    assert len(transitions) == 1
+    assert transitions[0].pkg_name == 'zlib'
+    assert transitions[0].old_stage is _S.PATCHED
+    assert transitions[0].new_stage is _S.CONFIGURED
+    assert transitions[0].stamp_mtime == _T0
+    assert transitions[0].observed_time == _T0 + 1.235
+
+
+@pytest.mark.parametrize('backup_count', [0, 1, 2])
+def test_log_rotation(tmp_path, pkg_builds, backup_count):
+    log_dir = tmp_path / 'log'
+    log_dir.mkdir()
+    path = str(log_dir / 'transitions.ndjson')
+
+    # 2 lines per file (the last one has a single line)
+    log = yobr.timeline.PkgBuildStageTransitionLog(path, 200, backup_count)
+    count = 21
+
+    for i in range(count):
+        _write(log, pkg_builds['zlib'], _T0 + i)
+
+        # rotated once full
+        if os.path.exists(path):
+            assert os.path.getsize(path) < 200
+
+    log.close()
+    names = sorted(os.listdir(str(log_dir)))
+    assert names == ['transitions.ndjson'] + ['transitions.ndjson.{}'.format(i)
+                                              for i in range(1, backup_count + 1)]
+
+    # the newest transitions, in order
+    times = [t.observed_time - _T0 for t in yobr.timeline.read_pkg_build_stage_transitions(path)]
+    assert len(times) == 1 + 2 * backup_count
+    assert times == list(range(count - len(times), count))
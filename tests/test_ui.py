@@ -0,0 +1,122 @@
+# Copyright (c) 2020 Philippe Proulx <eepp.ca>
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# command-line arguments of the user interfaces
+
+import os.path
+import sys
+import subprocess
+import pytest
+import yobr
+import yobr.br
+import yobr.colors
+import yobr.ui
+
+
+_ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _run(module, *args):
+    return subprocess.run([sys.executable, '-m', module] + list(args),
+                          cwd=_ROOT_DIR, stdout=subprocess.PIPE,
+                          stderr=subprocess.PIPE, universal_newlines=True)
+
+
+@pytest.mark.parametrize('module, prog', [('yobr.ui', 'yobr'),
+                                          ('yobr.cli', 'yobr-cli')])
+@pytest.mark.parametrize('opt', ['-v', '-V', '--version'])
+def test_version(module, prog, opt):
+    proc = _run(module, opt)
+    assert proc.returncode == 0
+    assert proc.stdout == '{} {}\n'.format(prog, yobr.__version__)
+
+
+def test_colors_without_qt():
+    code = 'import sys, yobr.colors; print(any(m.startswith("PyQt5") for m in sys.modules))'
+    proc = subprocess.run([sys.executable, '-c', code], cwd=_ROOT_DIR,
+                          stdout=subprocess.PIPE, universal_newlines=True,
+                          check=True)
+    assert proc.stdout == 'False\n'
+
+
+def test_colors_all_stages():
+    for colours in (yobr.colors.BUILD_STAGE_COLORS_BG,
+                    yobr.colors.BUILD_STAGE_COLORS_FG):
+        assert set(colours) == set(yobr.br.PkgBuildStage)
+
+
+@pytest.mark.parametrize('argv, qt_args, other_args', [
+    (['/br'], [], ['/br']),
+    (['-platform', 'offscreen', '/br'], ['-platform', 'offscreen'], ['/br']),
+    (['/br', '-style=fusion', '-j', '4'], ['-style=fusion'], ['/br', '-j', '4']),
+    (['--style', 'fusion', '/br', '/br/output/build'], ['--style', 'fusion'],
+     ['/br', '/br/output/build']),
+    (['/br', '-qwindowgeometry', '640x480+0+0', '-reverse'],
+     ['-qwindowgeometry', '640x480+0+0'], ['/br', '-reverse']),
+
+    # missing value: Qt's business
+    (['/br', '-style'], ['-style'], ['/br']),
+    (['/br', '--', '-style', 'fusion'], [], ['/br', '--', '-style', 'fusion']),
+])
+def test_split_qt_args(argv, qt_args, other_args):
+    assert yobr.ui._split_qt_args(argv) == (qt_args, other_args)
+
+
+@pytest.mark.parametrize('argv, br_root_dir, br_build_dir, qt_args', [
+    (['/br'], '/br', '/br/output/build', []),
+    (['-platform', 'offscreen', '/br', '/build'], '/br', '/build',
+     ['-platform', 'offscreen']),
+    (['/br', '-reverse', '--jobs', '4', '-style', 'fusion'], '/br',
+     '/br/output/build', ['-style', 'fusion', '-reverse']),
+])
+def test_parse_args_qt(monkeypatch, argv, br_root_dir, br_build_dir,
+                       qt_args):
+    monkeypatch.setattr(sys, 'argv', ['yobr'] + argv)
+    args = yobr.ui._parse_args()
+    assert args.br_root_dir == br_root_dir
+    assert args.br_build_dir == br_build_dir
+    assert args.qt_args == qt_args
+
+
+@pytest.mark.parametrize('argv', [
+    ['/br', '/build', 'extra'],
+    ['/br', '--bogus'],
+])
+def test_parse_args_unknown(monkeypatch, argv):
+    monkeypatch.setattr(sys, 'argv', ['yobr'] + argv)
+
+    with pytest.raises(SystemExit):
+        yobr.ui._parse_args()
+
+
+def test_missing_br_root_dir(tmp_path):
+    # fails before importing Qt
+    path = str(tmp_path / 'nope')
+    proc = _run('yobr.ui', path)
+    assert proc.returncode == 1
+    assert '`{}` is not a directory'.format(path) in proc.stderr
+    code = 'import sys, yobr.ui; sys.argv = ["yobr", {!r}]\n'.format(path)
+    code += 'try:\n    yobr.ui.main()\nexcept SystemExit:\n    pass\n'
+    code += 'print(any(m.startswith("PyQt5") for m in sys.modules))'
+    proc = subprocess.run([sys.executable, '-c', code], cwd=_ROOT_DIR,
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          universal_newlines=True, check=True)
+    assert proc.stdout == 'False\n'
@@ -0,0 +1,472 @@
+# Copyright (c) 2020 Philippe Proulx <eepp.ca>
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# build analyses over the package dependency graph
+
+import time
+import array
+import heapq
+import statistics
+import yobr.br
+
+
+# `True` if the package build `pkg_build` of the package build monitor
+# `pkg_build_monitor` is done: installed or, if not installable, built
+def is_pkg_build_done(pkg_build_monitor, pkg_build):
+    stage = pkg_build_monitor.stage(pkg_build)
+
+    if stage is yobr.br.PkgBuildStage.INSTALLED:
+        return True
+
+    return stage is yobr.br.PkgBuildStage.BUILT and not pkg_build.info.is_installable
+
+
+# time (seconds since the Epoch) when the package build `pkg_build`
+# was done (installed or, if not installable, built), or `None`
+#
+# This is the time of a stamp file or, with a step event source, of the
+# step end event, which can be a little earlier than the stamp file for
+# the same build (see `yobr.history`).
+def pkg_build_done_time(pkg_build):
+    done_time = pkg_build.stage_time(yobr.br.PkgBuildStage.INSTALLED)
+
+    if done_time is None:
+        done_time = pkg_build.stage_time(yobr.br.PkgBuildStage.BUILT)
+
+    return done_time
+
+
+# time (seconds) which the package build `pkg_build` spent on its own
+# completed steps, considering that its direct dependencies are the
+# package builds `dep_pkg_builds`
+#
+# Buildroot builds the dependencies of a package between patching and
+# configuring it: the configuration step only starts once the last
+# direct dependency is done.
+def pkg_build_work_duration(pkg_build, dep_pkg_builds):
+    duration = 0
+
+    for stage in (yobr.br.PkgBuildStage.EXTRACTED,
+                  yobr.br.PkgBuildStage.PATCHED,
+                  yobr.br.PkgBuildStage.BUILT,
+                  yobr.br.PkgBuildStage.INSTALLED):
+        stage_duration = pkg_build.stage_duration(stage)
+
+        if stage_duration is not None:
+            duration += stage_duration
+
+    configured_time = pkg_build.stage_time(yobr.br.PkgBuildStage.CONFIGURED)
+
+    if configured_time is None:
+        return duration
+
+    start_time = pkg_build.stage_time(yobr.br.PkgBuildStage.PATCHED)
+
+    for dep_pkg_build in dep_pkg_builds:
+        dep_done_time = pkg_build_done_time(dep_pkg_build)
+
+        if dep_done_time is not None and (start_time is None or dep_done_time > start_time):
+            start_time = dep_done_time
+
+    if start_time is not None and configured_time > start_time:
+        duration += configured_time - start_time
+
+    return duration
+
+
+# longest weighted path through a package graph (`yobr.br.PkgGraph`),
+# a path going from a package to one of its dependants
+#
+# Each package has a weight (0 initially). set_weight() only marks the
+# package as changed: update() then recomputes, in topological order,
+# the longest path ending at each changed package and, only if it
+# changed, at its dependants.
+class CriticalPath:
+    def __init__(self, graph):
+        self._graph = graph
+        count = len(graph)
+        self._weights = array.array('d', [0.]) * count
+
+        # length of the longest path ending at each package (including
+        # its own weight) and previous package on this path (-1: none)
+        self._lengths = array.array('d', [0.]) * count
+        self._prev_ids = array.array('i', [-1]) * count
+
+        # topological index of each package (dependencies first)
+        self._topo_indexes = self._create_topo_indexes()
+
+        # IDs of the packages of which the weight changed since the
+        # last update
+        self._changed_ids = set()
+
+        # current critical path (package IDs, first to last)
+        self._pkg_ids = ()
+
+    # topological indexes (Kahn's algorithm)
+    def _create_topo_indexes(self):
+        graph = self._graph
+        count = len(graph)
+        dep_counts = array.array('I', (len(graph.dependency_ids(i)) for i in range(count)))
+        ready_ids = [i for i in range(count) if dep_counts[i] == 0]
+        topo_indexes = array.array('I', [count]) * count
+        next_index = 0
+
+        while len(ready_ids) > 0:
+            pkg_id = ready_ids.pop()
+            topo_indexes[pkg_id] = next_index
+            next_index += 1
+
+            for dependant_id in graph.dependant_ids(pkg_id):
+                dep_counts[dependant_id] -= 1
+
+                if dep_counts[dependant_id] == 0:
+                    ready_ids.append(dependant_id)
+
+        # packages within a cycle (shouldn't happen) keep the index
+        # `count`: still correct, only slower to settle
+        return topo_indexes
+
+    @property
+    def graph(self):
+        return self._graph
+
+    def weight(self, pkg_id):
+        return self._weights[pkg_id]
+
+    def set_weight(self, pkg_id, weight):
+        if weight != self._weights[pkg_id]:
+            self._weights[pkg_id] = weight
+            self._changed_ids.add(pkg_id)
+
+    # updates the critical path after weight changes, returning `True`
+    # if the critical path (packages or length) changed
+    def update(self):
+        if len(self._changed_ids) == 0:
+            return False
+
+        graph = self._graph
+        lengths = self._lengths
+        prev_ids = self._prev_ids
+        topo_indexes = self._topo_indexes
+        heap = [(topo_indexes[i], i) for i in self._changed_ids]
+        heapq.heapify(heap)
+        queued_ids = set(self._changed_ids)
+        self._changed_ids.clear()
+        old_length = self.length
+
+        while len(heap) > 0:
+            _, pkg_id = heapq.heappop(heap)
+            queued_ids.discard(pkg_id)
+
+            # longest path ending at one of the dependencies
+            prev_length = 0.
+            prev_id = -1
+
+            for dep_id in graph.dependency_ids(pkg_id):
+                if lengths[dep_id] > prev_length:
+                    prev_length = lengths[dep_id]
+                    prev_id = dep_id
+
+            prev_ids[pkg_id] = prev_id
+            length = self._weights[pkg_id] + prev_length
+
+            if length == lengths[pkg_id]:
+                # dependants aren't affected
+                continue
+
+            lengths[pkg_id] = length
+
+            for dependant_id in graph.dependant_ids(pkg_id):
+                if dependant_id not in queued_ids:
+                    queued_ids.add(dependant_id)
+                    heapq.heappush(heap, (topo_indexes[dependant_id],
+                                          dependant_id))
+
+        # critical path ends at the package with the longest path
+        last_id = max(range(len(lengths)), key=lengths.__getitem__,
+                      default=-1)
+        pkg_ids = []
+
+        if last_id >= 0 and lengths[last_id] > 0:
+            pkg_id = last_id
+
+            # skip the last packages which didn't do anything yet
+            while self._weights[pkg_id] == 0:
+                pkg_id = prev_ids[pkg_id]
+
+            while pkg_id >= 0:
+                pkg_ids.append(pkg_id)
+                pkg_id = prev_ids[pkg_id]
+
+        pkg_ids.reverse()
+        pkg_ids = tuple(pkg_ids)
+        changed = pkg_ids != self._pkg_ids or self.length != old_length
+        self._pkg_ids = pkg_ids
+        return changed
+
+    # IDs of the packages of the critical path, from the first to the
+    # last (tuple, empty if all the weights are 0)
+    @property
+    def pkg_ids(self):
+        return self._pkg_ids
+
+    # total weight of the critical path
+    @property
+    def length(self):
+        if len(self._pkg_ids) == 0:
+            return 0.
+
+        return self._lengths[self._pkg_ids[-1]]
+
+
+# critical path of the package builds of a package build monitor
+# (`yobr.br.PkgBuildMonitor`), where the weight of a package build is
+# the duration of its completed steps (see pkg_build_work_duration())
+#
+# Call update() with the package builds of which the stage changed
+# after each monitor update.
+class PkgBuildCriticalPath:
+    def __init__(self, pkg_build_monitor):
+        self._pkg_build_monitor = pkg_build_monitor
+        self._critical_path = CriticalPath(pkg_build_monitor.graph)
+
+    # updates the critical path considering that the stages of the
+    # package builds `changed_pkg_builds` changed, returning `True` if
+    # the critical path changed
+    def update(self, changed_pkg_builds):
+        monitor = self._pkg_build_monitor
+        graph = monitor.graph
+        pkg_ids = set()
+
+        # the work duration of a package build also depends on when its
+        # dependencies were done
+        for pkg_build in changed_pkg_builds:
+            pkg_id = pkg_build.info.id
+            pkg_ids.add(pkg_id)
+            pkg_ids.update(graph.dependant_ids(pkg_id))
+
+        for pkg_id in pkg_ids:
+            dep_pkg_builds = [monitor.pkg_build(i) for i in graph.dependency_ids(pkg_id)]
+            duration = pkg_build_work_duration(monitor.pkg_build(pkg_id),
+                                               dep_pkg_builds)
+            self._critical_path.set_weight(pkg_id, duration)
+
+        return self._critical_path.update()
+
+    # package builds of the critical path, from the first to the last
+    # (tuple)
+    @property
+    def pkg_builds(self):
+        monitor = self._pkg_build_monitor
+        return tuple(monitor.pkg_build(i) for i in self._critical_path.pkg_ids)
+
+    # duration (seconds) of the critical path
+    @property
+    def length(self):
+        return self._critical_path.length
+
+
+# estimate of the rest of a build (see `PkgBuildEta`)
+#
+# An estimate object is immutable: it's safe to share between threads.
+class BuildEstimate:
+    # `end_time` is the expected end time (seconds since the Epoch) of
+    # the build, or `None` if unknown
+    #
+    # `running` is a sequence of `(since_time, work_duration,
+    # expected_duration)` tuples for the package builds in progress:
+    # each one is expected to work until `expected_duration`, and it
+    # did `work_duration` before `since_time`.
+    def __init__(self, end_time, total_weight, done_weight, running):
+        self._end_time = end_time
+        self._total_weight = total_weight
+        self._done_weight = done_weight
+        self._running = tuple(running)
+
+    @property
+    def end_time(self):
+        return self._end_time
+
+    # remaining time (seconds) at `now` (seconds since the Epoch;
+    # current time if `None`), or `None` if unknown
+    def remaining(self, now=None):
+        if self._end_time is None:
+            return
+
+        if now is None:
+            now = time.time()
+
+        return max(self._end_time - now, 0.)
+
+    # progress (0 to 1) at `now` (see remaining()), weighted by the
+    # expected durations of the package builds
+    def progress(self, now=None):
+        if self._total_weight <= 0:
+            return 0.
+
+        if now is None:
+            now = time.time()
+
+        weight = self._done_weight
+
+        for since_time, work_duration, expected_duration in self._running:
+            weight += min(work_duration + max(now - since_time, 0.),
+                          expected_duration)
+
+        return min(weight / self._total_weight, 1.)
+
+
+# estimator of the rest of the build of the package builds of a package
+# build monitor (`yobr.br.PkgBuildMonitor`)
+#
+# `expected_durations` is a dictionary of package information objects
+# to expected work durations (see `yobr.history`); the package builds
+# which it doesn't have are expected to take the median of its
+# durations. Without any expected duration, the end time is unknown and
+# the progress is the ratio of done package builds.
+#
+# The estimator simulates the remaining build: Buildroot builds at
+# most `jobs` packages at a time (1 without a top-level parallel build),
+# each one as soon as its dependencies are done.
+#
+# Call update() with the changed package builds after each monitor
+# update: it only simulates again when something changed.
+class PkgBuildEta:
+    def __init__(self, pkg_build_monitor, expected_durations, jobs=1):
+        self._pkg_build_monitor = pkg_build_monitor
+        self._jobs = max(jobs, 1)
+        graph = pkg_build_monitor.graph
+        self._has_durations = len(expected_durations) > 0
+
+        if self._has_durations:
+            default_duration = statistics.median(expected_durations.values())
+        else:
+            default_duration = 1.
+
+        self._expected_durations = array.array('d', [default_duration]) * len(graph)
+
+        for pkg_info, duration in expected_durations.items():
+            if pkg_info.graph is graph:
+                self._expected_durations[pkg_info.id] = duration
+
+        self._estimate = None
+
+    # current estimate (`BuildEstimate`), or `None` before the first
+    # update
+    @property
+    def estimate(self):
+        return self._estimate
+
+    # updates the estimate considering that the stages of the package
+    # builds `changed_pkg_builds` changed, returning it
+    def update(self, changed_pkg_builds, now=None):
+        if self._estimate is not None and len(changed_pkg_builds) == 0:
+            return self._estimate
+
+        if now is None:
+            now = time.time()
+
+        monitor = self._pkg_build_monitor
+        graph = monitor.graph
+        count = len(graph)
+        expected_durations = self._expected_durations
+        is_done = [is_pkg_build_done(monitor, monitor.pkg_build(i)) for i in range(count)]
+        total_weight = sum(expected_durations)
+        done_weight = 0.
+        running = []
+
+        # remaining durations and numbers of dependencies which aren't
+        # done
+        remaining_durations = array.array('d', [0.]) * count
+        dep_counts = array.array('I', [0]) * count
+        in_progress_ids = []
+
+        for pkg_id in range(count):
+            expected_duration = expected_durations[pkg_id]
+
+            if is_done[pkg_id]:
+                done_weight += expected_duration
+                continue
+
+            dep_ids = graph.dependency_ids(pkg_id)
+            dep_counts[pkg_id] = sum(1 for i in dep_ids if not is_done[i])
+            pkg_build = monitor.pkg_build(pkg_id)
+            stage = monitor.stage(pkg_build)
+            work_duration = 0.
+
+            if stage not in (yobr.br.PkgBuildStage.UNKNOWN,
+                             yobr.br.PkgBuildStage.DOWNLOADED):
+                dep_pkg_builds = [monitor.pkg_build(i) for i in dep_ids]
+                work_duration = pkg_build_work_duration(pkg_build,
+                                                        dep_pkg_builds)
+                stage_time = pkg_build.stage_time(stage)
+
+                if dep_counts[pkg_id] == 0 and stage_time is not None:
+                    # working on its current step since `stage_time`
+                    running.append((stage_time, work_duration,
+                                    expected_duration))
+                    work_duration += max(now - stage_time, 0.)
+                    in_progress_ids.append(pkg_id)
+                else:
+                    done_weight += min(work_duration, expected_duration)
+
+            remaining_durations[pkg_id] = max(expected_duration - work_duration, 0.)
+
+        end_time = None
+
+        if self._has_durations:
+            end_time = now + self._simulate(remaining_durations, dep_counts,
+                                            is_done, in_progress_ids)
+
+        self._estimate = BuildEstimate(end_time, total_weight, done_weight,
+                                       running)
+        return self._estimate
+
+    # simulates the remaining build, returning its duration
+    def _simulate(self, remaining_durations, dep_counts, is_done,
+                  in_progress_ids):
+        graph = self._pkg_build_monitor.graph
+        in_progress_id_set = set(in_progress_ids)
+        ready_ids = [i for i in range(len(graph))
+                     if not is_done[i] and dep_counts[i] == 0 and i not in in_progress_id_set]
+        ready_ids.reverse()
+
+        # the package builds in progress continue, whatever the number
+        # of jobs
+        running = [(remaining_durations[i], i) for i in in_progress_ids]
+        heapq.heapify(running)
+        cur_time = 0.
+
+        while len(running) > 0 or len(ready_ids) > 0:
+            while len(ready_ids) > 0 and len(running) < self._jobs:
+                pkg_id = ready_ids.pop()
+                heapq.heappush(running, (cur_time + remaining_durations[pkg_id],
+                                         pkg_id))
+
+            cur_time, pkg_id = heapq.heappop(running)
+
+            for dependant_id in graph.dependant_ids(pkg_id):
+                dep_counts[dependant_id] -= 1
+
+                if dep_counts[dependant_id] == 0:
+                    ready_ids.append(dependant_id)
+
+        return cur_time
@@ -19,28 +19,47 @@
 # TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
 # SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
+import sys
 import enum
+import array
 import json
 import os
 import os.path
+import errno
+import time
+import math
+import hashlib
+import shlex
+import socket
+import tempfile
+import threading
 import subprocess
 import logging
+import yobr.inotify
 import yobr.utils
+import yobr.hook
 
 
 _logger = logging.getLogger(__name__)
 
 
 # package information base (no build information in this)
+#
+# A package information object belongs to a package graph (`PkgGraph`)
+# which holds its dependencies and dependants; within this graph, its
+# ID is `id`.
 class PkgInfo:
-    def __init__(self, name, is_virtual, version, licenses,
-                 dl_dir, dependencies):
+    __slots__ = ('_name', '_is_virtual', '_version', '_licenses', '_dl_dir',
+                 '_graph', '_id')
+
+    def __init__(self, name, is_virtual, version, licenses, dl_dir):
         self._name = name
         self._is_virtual = is_virtual
         self._version = version
         self._licenses = licenses
         self._dl_dir = dl_dir
-        self._dependencies = dependencies
+        self._graph = None
+        self._id = None
 
     @property
     def name(self):
@@ -62,9 +81,33 @@ class PkgInfo:
     def dl_dir(self):
         return self._dl_dir
 
+    # package graph which contains this package information object
+    @property
+    def graph(self):
+        return self._graph
+
+    # ID of this package information object within its graph
+    @property
+    def id(self):
+        return self._id
+
+    # package information objects on which this one directly depends
+    # (tuple)
     @property
     def dependencies(self):
-        return self._dependencies
+        if self._graph is None:
+            return ()
+
+        return self._graph.dependencies(self._id)
+
+    # package information objects which directly depend on this one
+    # (reverse of `dependencies`; tuple)
+    @property
+    def dependants(self):
+        if self._graph is None:
+            return ()
+
+        return self._graph.dependants(self._id)
 
     def __hash__(self):
         return hash(self._name)
@@ -78,10 +121,11 @@ class PkgInfo:
 
 # target package information
 class TargetPkgInfo(PkgInfo):
+    __slots__ = ('_install_target', '_install_staging', '_install_images')
+
     def __init__(self, name, is_virtual, version, licenses, dl_dir,
-                 install_target, install_staging, install_images, dependencies):
-        super().__init__(name, is_virtual, version, licenses,
-                         dl_dir, dependencies)
+                 install_target, install_staging, install_images):
+        super().__init__(name, is_virtual, version, licenses, dl_dir)
         self._install_target = install_target
         self._install_staging = install_staging
         self._install_images = install_images
@@ -109,6 +153,8 @@ class TargetPkgInfo(PkgInfo):
 
 # host package information
 class HostPkgInfo(PkgInfo):
+    __slots__ = ()
+
     @property
     def type_name(self):
         return 'host'
@@ -118,6 +164,88 @@ class HostPkgInfo(PkgInfo):
         return True
 
 
+# compact package dependency graph
+#
+# The graph assigns an ID to each of its package information objects:
+# its index within `pkg_infos` (sorted by name). Dependencies and
+# dependants are CSR-style adjacency arrays: the dependency IDs of the
+# package having the ID `i` are
+# `dep_ids[dep_offsets[i]:dep_offsets[i + 1]]`, and the same goes for
+# dependants.
+class PkgGraph:
+    __slots__ = ('_pkg_infos', '_dep_offsets', '_dep_ids',
+                 '_dependant_offsets', '_dependant_ids')
+
+    # `pkg_infos` is an iterable of package information objects which
+    # don't belong to a graph yet and `dep_names` is a dictionary of
+    # package names to the names of their direct dependencies (unknown
+    # names are ignored)
+    def __init__(self, pkg_infos, dep_names):
+        self._pkg_infos = tuple(sorted(pkg_infos, key=lambda pi: pi.name))
+        ids = {}
+
+        for pkg_id, pkg_info in enumerate(self._pkg_infos):
+            pkg_info._graph = self
+            pkg_info._id = pkg_id
+            ids[pkg_info.name] = pkg_id
+
+        # dependencies
+        self._dep_offsets = array.array('I', [0])
+        self._dep_ids = array.array('I')
+        dependant_counts = array.array('I', [0]) * len(self._pkg_infos)
+
+        for pkg_info in self._pkg_infos:
+            pkg_dep_ids = sorted({ids[name] for name in dep_names.get(pkg_info.name, ())
+                                  if name in ids})
+            self._dep_ids.extend(pkg_dep_ids)
+            self._dep_offsets.append(len(self._dep_ids))
+
+            for dep_id in pkg_dep_ids:
+                dependant_counts[dep_id] += 1
+
+        # dependants (reverse of dependencies)
+        self._dependant_offsets = array.array('I', [0])
+
+        for count in dependant_counts:
+            self._dependant_offsets.append(self._dependant_offsets[-1] + count)
+
+        self._dependant_ids = array.array('I', [0]) * len(self._dep_ids)
+        next_pos = self._dependant_offsets[:-1]
+
+        for pkg_id in range(len(self._pkg_infos)):
+            for dep_id in self.dependency_ids(pkg_id):
+                self._dependant_ids[next_pos[dep_id]] = pkg_id
+                next_pos[dep_id] += 1
+
+    def __len__(self):
+        return len(self._pkg_infos)
+
+    # package information objects, indexed by ID (tuple)
+    @property
+    def pkg_infos(self):
+        return self._pkg_infos
+
+    # package information object having the ID `pkg_id`
+    def pkg_info(self, pkg_id):
+        return self._pkg_infos[pkg_id]
+
+    # IDs of the direct dependencies of the package having the ID
+    # `pkg_id` (array)
+    def dependency_ids(self, pkg_id):
+        return self._dep_ids[self._dep_offsets[pkg_id]:self._dep_offsets[pkg_id + 1]]
+
+    # IDs of the direct dependants of the package having the ID `pkg_id`
+    # (array)
+    def dependant_ids(self, pkg_id):
+        return self._dependant_ids[self._dependant_offsets[pkg_id]:self._dependant_offsets[pkg_id + 1]]
+
+    def dependencies(self, pkg_id):
+        return tuple(self._pkg_infos[i] for i in self.dependency_ids(pkg_id))
+
+    def dependants(self, pkg_id):
+        return tuple(self._pkg_infos[i] for i in self.dependant_ids(pkg_id))
+
+
 def _get_br_pkg_info_entry(br_pkg_info, name, pytype, is_opt=True,
                            default=None):
     if name not in br_pkg_info:
@@ -135,9 +263,21 @@ def _get_br_pkg_info_entry(br_pkg_info, name, pytype, is_opt=True,
     return entry
 
 
+# interned string `s`, or `None` if `s` is `None`
+#
+# The packages which several Buildroot configurations share then share
+# the same name, version, license, and download directory strings.
+def _intern(s):
+    if s is None:
+        return
+
+    return sys.intern(s)
+
+
 # creates a package information object from the Buildroot `show-info`
 # package info `br_pkg_info` for the package named `name`
 def pkg_info_from_br_pkg_info(br_pkg_info, name):
+    name = _intern(name)
     is_virtual = _get_br_pkg_info_entry(br_pkg_info, 'virtual', bool,
                                         default=False)
     version = _get_br_pkg_info_entry(br_pkg_info, 'version', str)
@@ -145,8 +285,9 @@ def pkg_info_from_br_pkg_info(br_pkg_info, name):
     if version == '':
         version = None
 
-    licenses = _get_br_pkg_info_entry(br_pkg_info, 'licenses', str)
-    dl_dir = _get_br_pkg_info_entry(br_pkg_info, 'dl_dir', str)
+    version = _intern(version)
+    licenses = _intern(_get_br_pkg_info_entry(br_pkg_info, 'licenses', str))
+    dl_dir = _intern(_get_br_pkg_info_entry(br_pkg_info, 'dl_dir', str))
     type_str = _get_br_pkg_info_entry(br_pkg_info, 'type', str, is_opt=False)
 
     if type_str == 'target':
@@ -157,60 +298,512 @@ def pkg_info_from_br_pkg_info(br_pkg_info, name):
         install_images = _get_br_pkg_info_entry(br_pkg_info, 'install_images',
                                                 bool, default=False)
         return TargetPkgInfo(name, is_virtual, version, licenses, dl_dir,
-                             install_target, install_staging, install_images,
-                             set())
+                             install_target, install_staging, install_images)
     elif type_str == 'host':
-        return HostPkgInfo(name, is_virtual, version, licenses, dl_dir, set())
+        return HostPkgInfo(name, is_virtual, version, licenses, dl_dir)
     else:
         raise ValueError('unknown `type` entry value: `{}`'.format(type_str))
 
 
+# `True` if the Buildroot `show-info` package info `br_pkg_info` of the
+# package named `name` is worth monitoring
+def _is_monitored_br_pkg_info(br_pkg_info, name):
+    # skip skeleton packages: they're boring to monitor
+    if name.startswith('skeleton') or name.startswith('host-skeleton'):
+        return False
+
+    # skip root FS packages: also boring to monitor
+    if br_pkg_info['type'] == 'rootfs':
+        return False
+
+    return True
+
+
 # creates a dictionary of package names to package information objects
-# from the whole Buildroot `show-info` output (as objects, not JSON)
-def pkg_infos_from_br_info(br_info):
+# from the `(name, br_pkg_info)` items `br_info_items` (iterable) of the
+# Buildroot `show-info` output
+#
+# This function creates each package information object as soon as it
+# gets its item, only keeping its dependency names afterwards: the
+# items can come from a stream (see _iter_br_info_items()).
+def pkg_infos_from_br_info_items(br_info_items):
     pkg_infos = {}
+    dep_names = {}
 
-    for name, br_pkg_info in br_info.items():
-        # skip skeleton packages: they're boring to monitor
-        if name.startswith('skeleton') or name.startswith('host-skeleton'):
-            continue
-
-        # skip root FS packages: also boring to monitor
-        if br_pkg_info['type'] == 'rootfs':
+    for name, br_pkg_info in br_info_items:
+        if not _is_monitored_br_pkg_info(br_pkg_info, name):
             continue
 
         try:
             pkg_infos[name] = pkg_info_from_br_pkg_info(br_pkg_info, name)
+            dep_names[name] = _get_br_pkg_info_entry(br_pkg_info,
+                                                     'dependencies', list,
+                                                     default=[])
         except Exception as exc:
             # append package name to exception's message
             raise type(exc)('`{}` package: {}'.format(name, exc)) from exc
 
-    # update dependencies: now that we have all the package information
-    # objects, use them as dependencies instead of just their name
-    for pkg_info in pkg_infos.values():
-        br_pkg_info = br_info[pkg_info.name]
-        dep_names = _get_br_pkg_info_entry(br_pkg_info, 'dependencies', list,
-                                           default=[])
+    # now that we have all the package information objects, create
+    # their graph: this assigns their IDs and indexes their dependencies
+    # and dependants (dependencies for which we don't have a package
+    # information are ignored)
+    PkgGraph(pkg_infos.values(), dep_names)
+    return pkg_infos
+
+
+# creates a dictionary of package names to package information objects
+# from the whole Buildroot `show-info` output (as objects, not JSON)
+def pkg_infos_from_br_info(br_info):
+    return pkg_infos_from_br_info_items(br_info.items())
+
+
+# size of the chunks to read from a `show-info` output stream
+_BR_INFO_STREAM_CHUNK_SIZE = 64 * 1024
+
+
+# iterates the `(name, br_pkg_info)` items of the Buildroot `show-info`
+# output (a JSON object) which the text stream `stream` contains
+#
+# This generator decodes one item at a time, only keeping the
+# undecoded part of what it reads.
+def _iter_br_info_items(stream):
+    decoder = json.JSONDecoder()
+    buf = ''
+    pos = 0
+
+    # appends more data to `buf`, dropping what's already decoded;
+    # returns `False` at the end of the stream
+    def read_more():
+        nonlocal buf, pos
+        data = stream.read(_BR_INFO_STREAM_CHUNK_SIZE)
+
+        if not data:
+            return False
+
+        buf = buf[pos:] + data
+        pos = 0
+        return True
+
+    # skips whitespaces, returning the next character (`None` at the
+    # end of the stream)
+    def peek():
+        nonlocal pos
+
+        while True:
+            while pos < len(buf) and buf[pos] in ' \t\n\r':
+                pos += 1
+
+            if pos < len(buf):
+                return buf[pos]
+
+            if not read_more():
+                return
+
+    def expect(c):
+        nonlocal pos
+
+        if peek() != c:
+            raise ValueError('Expecting `{}` in `show-info` output'.format(c))
+
+        pos += 1
+
+    # decodes the next JSON value, reading more data until it's complete
+    def decode():
+        nonlocal pos
+        peek()
 
-        for dep_name in dep_names:
-            if dep_name not in pkg_infos:
-                # we don't have a package information for this dependency
+        while True:
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+            except ValueError:
+                if not read_more():
+                    raise
+
+                continue
+
+            # a value which isn't followed by a delimiter (for example,
+            # `12` of `12.5e3`) could continue within the next data
+            if (end == len(buf) or buf[end] not in ' \t\n\r,:}') and read_more():
                 continue
 
-            pkg_info.dependencies.add(pkg_infos[dep_name])
+            pos = end
+            return value
 
-    return pkg_infos
+    expect('{')
+
+    if peek() == '}':
+        # no packages
+        return
+
+    while True:
+        name = decode()
+        expect(':')
+        yield name, decode()
+
+        if peek() != ',':
+            expect('}')
+            return
+
+        expect(',')
+
+
+# version of the package information cache file format
+_PKG_INFO_CACHE_VERSION = 1
+
+# directories of a Buildroot tree which contain package makefiles
+_BR_PKG_MK_DIRS = ('package', 'boot', 'linux', 'toolchain', 'fs')
+
+
+# directory of the package information cache files
+def _pkg_info_cache_dir():
+    base_dir = os.environ.get('XDG_CACHE_HOME')
+
+    if not base_dir:
+        base_dir = os.path.join(os.path.expanduser('~'), '.cache')
+
+    return os.path.join(base_dir, 'yobr')
+
+
+# Buildroot output directory (`O=`) of the Buildroot build directory
+# `br_build_dir`
+def br_output_dir(br_build_dir):
+    return os.path.dirname(os.path.normpath(br_build_dir))
+
+
+# `br_output_dir` (Buildroot output directory) to pass to `make`, or
+# `None` if it's the default output directory of `br_root_dir`
+def _explicit_br_output_dir(br_root_dir, br_output_dir):
+    if br_output_dir is None:
+        return
+
+    default_dir = os.path.join(br_root_dir, 'output')
+
+    if os.path.realpath(br_output_dir) == os.path.realpath(default_dir):
+        return
+
+    return br_output_dir
+
+
+# paths of the `BR2_EXTERNAL` trees which the Buildroot tree
+# `br_root_dir` uses, from its generated `.br2-external.mk` (within
+# `br_output_dir`, if set)
+def _br_external_dirs(br_root_dir, br_output_dir=None):
+    if br_output_dir is None:
+        br_output_dir = os.path.join(br_root_dir, 'output')
+
+    path = os.path.join(br_output_dir, '.br2-external.mk')
+    dirs = []
+
+    try:
+        with open(path) as f:
+            for line in f:
+                name, sep, value = line.partition('=')
+
+                if sep and name.strip(' :') == 'BR2_EXTERNAL_DIRS':
+                    dirs += value.split()
+    except FileNotFoundError:
+        pass
+
+    return dirs
+
+
+# updates the hash object `h` with the path, size, and modification
+# time of all the `.mk` files within `root_dir` (recursive)
+def _hash_mk_files(h, root_dir):
+    for dir_path, dir_names, file_names in os.walk(root_dir):
+        # deterministic order
+        dir_names.sort()
+
+        for name in sorted(file_names):
+            if not name.endswith('.mk'):
+                continue
+
+            path = os.path.join(dir_path, name)
+
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+
+            h.update('{}:{}:{}\n'.format(path, st.st_size,
+                                          st.st_mtime_ns).encode())
+
+
+# fingerprint (hexadecimal string) of the Buildroot configuration of
+# `br_root_dir`: changes when `.config`, the top-level `Makefile`, or
+# any package makefile (including in `BR2_EXTERNAL` trees) changes
+#
+# If `br_output_dir` is set (Buildroot output directory, `O=`), then
+# `.config` is the one of this output directory.
+def br_config_fingerprint(br_root_dir, br_output_dir=None):
+    br_output_dir = _explicit_br_output_dir(br_root_dir, br_output_dir)
+    h = hashlib.sha256()
+    h.update('{}\n'.format(_PKG_INFO_CACHE_VERSION).encode())
+
+    for name in ('.config', 'Makefile'):
+        if name == '.config' and br_output_dir is not None:
+            path = os.path.join(br_output_dir, name)
+        else:
+            path = os.path.join(br_root_dir, name)
+
+        try:
+            with open(path, 'rb') as f:
+                h.update(hashlib.sha256(f.read()).digest())
+        except FileNotFoundError:
+            h.update('no {}\n'.format(name).encode())
+
+    for name in _BR_PKG_MK_DIRS:
+        _hash_mk_files(h, os.path.join(br_root_dir, name))
+
+    for ext_dir in _br_external_dirs(br_root_dir, br_output_dir):
+        h.update('external: {}\n'.format(ext_dir).encode())
+        _hash_mk_files(h, ext_dir)
+
+    return h.hexdigest()
+
+
+# prefix of the cache file names for the Buildroot tree `br_root_dir`
+# and output directory `br_output_dir`
+def _pkg_info_cache_file_prefix(br_root_dir, br_output_dir=None):
+    real_path = os.path.realpath(br_root_dir)
+    br_output_dir = _explicit_br_output_dir(br_root_dir, br_output_dir)
+
+    if br_output_dir is not None:
+        real_path += '\n' + os.path.realpath(br_output_dir)
+
+    return hashlib.sha256(real_path.encode()).hexdigest()[:16] + '-'
+
+
+def _pkg_info_cache_path(br_root_dir, br_output_dir, fingerprint):
+    file_name = '{}{}.json'.format(_pkg_info_cache_file_prefix(br_root_dir,
+                                                               br_output_dir),
+                                   fingerprint)
+    return os.path.join(_pkg_info_cache_dir(), file_name)
+
+
+# reduced Buildroot `show-info` package info (only the entries which
+# yobr uses) of the package information object `pkg_info`
+def _br_pkg_info_from_pkg_info(pkg_info):
+    br_pkg_info = {
+        'type': pkg_info.type_name,
+        'virtual': pkg_info.is_virtual,
+        'version': pkg_info.version if pkg_info.version is not None else '',
+        'dependencies': sorted(dep.name for dep in pkg_info.dependencies),
+    }
+
+    if pkg_info.licenses is not None:
+        br_pkg_info['licenses'] = pkg_info.licenses
+
+    if pkg_info.dl_dir is not None:
+        br_pkg_info['dl_dir'] = pkg_info.dl_dir
+
+    if type(pkg_info) is TargetPkgInfo:
+        br_pkg_info['install_target'] = pkg_info.install_target
+        br_pkg_info['install_staging'] = pkg_info.install_staging
+        br_pkg_info['install_images'] = pkg_info.install_images
+
+    return br_pkg_info
+
+
+# reduced Buildroot `show-info` output to cache for the package
+# information objects `pkg_infos`
+def _br_info_from_pkg_infos(pkg_infos):
+    return {name: _br_pkg_info_from_pkg_info(pkg_info)
+            for name, pkg_info in pkg_infos.items()}
 
 
-def pkg_infos_from_make(br_root_dir):
-    cmd = 'make -s --no-print-directory show-info'
+# loads cached `show-info` output, returning `None` if not available
+def _load_cached_br_info(path):
+    try:
+        with open(path) as f:
+            cache = json.load(f)
+    except FileNotFoundError:
+        return
+    except (OSError, ValueError) as exc:
+        _logger.warning('Cannot read package information cache file `{}`: {}'.format(path,
+                                                                                     exc))
+        return
+
+    if type(cache) is not dict or cache.get('version') != _PKG_INFO_CACHE_VERSION:
+        _logger.warning('Ignoring package information cache file `{}`: unknown format.'.format(path))
+        return
+
+    return cache.get('br-info')
+
+
+# saves the package information objects `pkg_infos` to the cache file
+# `path`, removing the other cache files of the same Buildroot tree and
+# output directory
+def _save_cached_pkg_infos(path, pkg_infos, br_root_dir, br_output_dir=None):
+    cache_dir = os.path.dirname(path)
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+
+        # write to a temporary file, then rename, so that a concurrent
+        # reader never sees a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+
+        with os.fdopen(fd, 'w') as f:
+            json.dump({
+                'version': _PKG_INFO_CACHE_VERSION,
+                'br-info': _br_info_from_pkg_infos(pkg_infos),
+            }, f, separators=(',', ':'))
+
+        os.replace(tmp_path, path)
+    except OSError as exc:
+        _logger.warning('Cannot write package information cache file `{}`: {}'.format(path,
+                                                                                      exc))
+        return
+
+    # remove outdated cache files of this Buildroot tree
+    prefix = _pkg_info_cache_file_prefix(br_root_dir, br_output_dir)
+
+    for name in os.listdir(cache_dir):
+        other_path = os.path.join(cache_dir, name)
+
+        if name.startswith(prefix) and other_path != path:
+            try:
+                os.remove(other_path)
+            except OSError:
+                pass
+
+
+# canceller of the `make show-info` runs of pkg_infos_from_make(), from
+# another thread
+#
+# Once cancel() is called, the running `make` process, if any, and the
+# next ones are terminated: pkg_infos_from_make() then raises
+# `RuntimeError`.
+class MakeCanceller:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._proc = None
+        self._is_cancelled = False
+
+    @property
+    def is_cancelled(self):
+        return self._is_cancelled
+
+    def cancel(self):
+        with self._lock:
+            self._is_cancelled = True
+
+            if self._proc is not None:
+                self._proc.terminate()
+
+    # sets the running `make` process (`None` once it's done)
+    def _set_proc(self, proc):
+        with self._lock:
+            self._proc = proc
+
+            if proc is not None and self._is_cancelled:
+                proc.terminate()
+
+
+# runs `make show-info` within `br_root_dir` (with the output directory
+# `br_output_dir`, if set), creating package information objects while
+# parsing its output
+#
+# `canceller`: see pkg_infos_from_make().
+def _pkg_infos_from_make(br_root_dir, br_output_dir=None, canceller=None):
+    args = ['make', '-s', '--no-print-directory', 'show-info']
+    br_output_dir = _explicit_br_output_dir(br_root_dir, br_output_dir)
+
+    if br_output_dir is not None:
+        args.append('O={}'.format(os.path.abspath(br_output_dir)))
+
+    cmd = ' '.join(shlex.quote(arg) for arg in args)
     _logger.info('Running `{}` (in `{}`).'.format(cmd, br_root_dir))
 
     # make `show-info` prints information about all the configured
-    # packages as a JSON object
-    output = subprocess.check_output(cmd, shell=True, cwd=br_root_dir)
+    # packages as a JSON object: parse it as a stream to avoid having
+    # both the whole output and the resulting objects in memory
+    #
+    # standard error goes to a temporary file so that `make` never
+    # blocks on it while we read its standard output
+    #
+    # no shell: terminating the process terminates `make` itself
+    with tempfile.TemporaryFile() as stderr_file:
+        with subprocess.Popen(args, cwd=br_root_dir, stdout=subprocess.PIPE,
+                              stderr=stderr_file,
+                              universal_newlines=True) as proc:
+            if canceller is not None:
+                canceller._set_proc(proc)
+
+            try:
+                pkg_infos = pkg_infos_from_br_info_items(_iter_br_info_items(proc.stdout))
+                parse_exc = None
+            except (ValueError, TypeError, KeyError) as exc:
+                # malformed or unexpected JSON: report `make`'s error
+                # first, if any
+                parse_exc = exc
+
+                # drain so that `make` can terminate
+                while proc.stdout.read(_BR_INFO_STREAM_CHUNK_SIZE):
+                    pass
+
+        if canceller is not None:
+            canceller._set_proc(None)
+
+            if canceller.is_cancelled:
+                raise RuntimeError('`{}` was cancelled'.format(cmd))
+
+        if proc.returncode != 0:
+            # include what `make` says so that the caller can show it
+            msg = '`{}` failed (exit status {})'.format(cmd, proc.returncode)
+            stderr_file.seek(0)
+            stderr = stderr_file.read().decode(errors='replace').strip()
+
+            if stderr:
+                msg += ':\n\n' + stderr
+
+            raise RuntimeError(msg)
+
+    if parse_exc is not None:
+        raise parse_exc
+
     _logger.info('Ran `{}`.'.format(cmd))
-    return pkg_infos_from_br_info(json.loads(output))
+    return pkg_infos
+
+
+# creates a dictionary of package names to package information objects
+# for the Buildroot tree `br_root_dir` and output directory
+# `br_output_dir` (`BR-ROOT-DIR/output` if `None`)
+#
+# If `use_cache` is `True`, this function tries to load the package
+# information from a cache file keyed on the fingerprint of the
+# Buildroot configuration (see br_config_fingerprint(); `fingerprint`,
+# if already known) instead of running `make`, and saves it after
+# running `make`. If `refresh_cache` is `True`, it runs `make` anyway.
+#
+# If `canceller` is set (`MakeCanceller`), another thread can terminate
+# `make` with it.
+def pkg_infos_from_make(br_root_dir, use_cache=True, refresh_cache=False,
+                        br_output_dir=None, fingerprint=None, canceller=None):
+    if not use_cache:
+        return _pkg_infos_from_make(br_root_dir, br_output_dir, canceller)
+
+    if fingerprint is None:
+        fingerprint = br_config_fingerprint(br_root_dir, br_output_dir)
+
+    cache_path = _pkg_info_cache_path(br_root_dir, br_output_dir, fingerprint)
+
+    if not refresh_cache:
+        br_info = _load_cached_br_info(cache_path)
+
+        if br_info is not None:
+            _logger.info('Using cached package information `{}`.'.format(cache_path))
+
+            try:
+                return pkg_infos_from_br_info(br_info)
+            except Exception as exc:
+                _logger.warning('Ignoring package information cache file `{}`: {}'.format(cache_path,
+                                                                                          exc))
+
+    pkg_infos = _pkg_infos_from_make(br_root_dir, br_output_dir, canceller)
+    _save_cached_pkg_infos(cache_path, pkg_infos, br_root_dir, br_output_dir)
+    return pkg_infos
 
 
 # the stages of a package build process
@@ -225,20 +818,116 @@ class PkgBuildStage(enum.Enum):
     INSTALLED = 'installed'
 
 
+# all the package build stages, in build order, and their indexes
+# within this tuple (what `PkgBuildStages` stores)
+_PKG_BUILD_STAGES = tuple(PkgBuildStage)
+_PKG_BUILD_STAGE_INDEXES = {stage: i for i, stage in enumerate(_PKG_BUILD_STAGES)}
+_BUILT_STAGE_INDEX = _PKG_BUILD_STAGE_INDEXES[PkgBuildStage.BUILT]
+
+
+# build stages of all the packages of a package graph
+#
+# The stages are stage indexes within an `array('B')`, indexed by
+# package ID, so that copies are cheap and bulk queries are array scans.
+class PkgBuildStages:
+    __slots__ = ('_graph', '_indexes')
+
+    def __init__(self, graph, indexes=None):
+        self._graph = graph
+
+        if indexes is None:
+            # all unknown
+            indexes = array.array('B', bytes(len(graph)))
+
+        self._indexes = indexes
+
+    @property
+    def graph(self):
+        return self._graph
+
+    # independent copy
+    def copy(self):
+        return PkgBuildStages(self._graph, array.array('B', self._indexes))
+
+    # stage indexes (`array.array('B')`, one per package ID, in
+    # `PkgBuildStage` order): don't modify
+    @property
+    def indexes(self):
+        return self._indexes
+
+    # build stage of the package information object `pkg_info`
+    def stage(self, pkg_info):
+        return _PKG_BUILD_STAGES[self._indexes[pkg_info.id]]
+
+    # sets the build stage of `pkg_info` to `stage`, returning the
+    # previous one
+    def set_stage(self, pkg_info, stage):
+        old_stage = _PKG_BUILD_STAGES[self._indexes[pkg_info.id]]
+        self._indexes[pkg_info.id] = _PKG_BUILD_STAGE_INDEXES[stage]
+        return old_stage
+
+    # number of packages at the stage `stage`
+    def count(self, stage):
+        return self._indexes.count(_PKG_BUILD_STAGE_INDEXES[stage])
+
+    # `True` if the package `pkg_info` is built (or installed)
+    def is_built(self, pkg_info):
+        return self._indexes[pkg_info.id] >= _BUILT_STAGE_INDEX
+
+    # number of built (or installed) direct dependencies of `pkg_info`
+    def built_dependency_count(self, pkg_info):
+        indexes = self._indexes
+        count = 0
+
+        for dep_id in self._graph.dependency_ids(pkg_info.id):
+            if indexes[dep_id] >= _BUILT_STAGE_INDEX:
+                count += 1
+
+        return count
+
+    # `True` if all the direct dependencies of `pkg_info` are built (or
+    # installed)
+    def are_dependencies_built(self, pkg_info):
+        indexes = self._indexes
+
+        for dep_id in self._graph.dependency_ids(pkg_info.id):
+            if indexes[dep_id] < _BUILT_STAGE_INDEX:
+                return False
+
+        return True
+
+    # package information objects of which the build stage is one of
+    # `stages` (list, in ID order)
+    def pkg_infos_at_stages(self, stages):
+        wanted = {_PKG_BUILD_STAGE_INDEXES[stage] for stage in stages}
+        pkg_infos = self._graph.pkg_infos
+        return [pkg_infos[i] for i, index in enumerate(self._indexes) if index in wanted]
+
+
 # a package build
+#
+# Reading the stamps of a package build (`stamps` property) also caches
+# the modification times of its stamp files, which is where its stage
+# times and durations come from (see stage_time() and
+# stage_duration()).
 class PkgBuild:
+    __slots__ = ('_info', '_build_dir', '_stamp_mtimes')
     _STAMP_FILE_PREFIX = '.stamp_'
 
     def __init__(self, info, br_build_dir):
         self._info = info
         pkg_dir = info.name
-        self._logger = yobr.utils._get_obj_logger(self, info.name)
 
         if info.version is not None:
             pkg_dir += '-{}'.format(info.version)
 
         self._build_dir = os.path.join(br_build_dir, pkg_dir)
-        self._logger.debug('Created: build directory is `{}`.'.format(self._build_dir))
+
+        # stamp names (without the `.stamp_` prefix) to (inode number,
+        # modification time) pairs, as of the last stamp reading
+        self._stamp_mtimes = {}
+        _logger.debug('`{}` package build: build directory is `{}`.'.format(info.name,
+                                                                            self._build_dir))
 
     @property
     def info(self):
@@ -248,81 +937,225 @@ class PkgBuild:
     def build_dir(self):
         return self._build_dir
 
-    # set of current stamps (without the `.stamp_` prefix)
+    # set of current stamps (without the `.stamp_` prefix), reading
+    # the build directory once
+    #
+    # This also updates the cached stamp modification times. Reading
+    # the build directory gives the inode number of each stamp file:
+    # only the stamp files which are new since the previous reading
+    # (new name or new inode number) are stat'ed.
     @property
     def stamps(self):
-        stamps = set()
+        try:
+            entries = os.scandir(self._build_dir)
+        except (FileNotFoundError, NotADirectoryError):
+            self._forget_stamps()
+            return set()
+
+        prefix = PkgBuild._STAMP_FILE_PREFIX
+        prefix_len = len(prefix)
+        old_stamp_mtimes = self._stamp_mtimes
+        stamp_mtimes = {}
+
+        with entries:
+            for entry in entries:
+                if not entry.name.startswith(prefix):
+                    continue
+
+                name = entry.name[prefix_len:]
+                inode = entry.inode()
+                inode_mtime = old_stamp_mtimes.get(name)
+
+                if inode_mtime is None or inode_mtime[0] != inode:
+                    try:
+                        inode_mtime = (inode, entry.stat().st_mtime)
+                    except FileNotFoundError:
+                        # removed in the meantime
+                        continue
+
+                stamp_mtimes[name] = inode_mtime
+
+        # replace the whole dictionary: another thread can be reading
+        # the stage times
+        self._stamp_mtimes = stamp_mtimes
+        return set(stamp_mtimes)
+
+    # forgets the cached stamps (the build directory doesn't exist)
+    def _forget_stamps(self):
+        if len(self._stamp_mtimes) > 0:
+            self._stamp_mtimes = {}
+
+    # replaces the cached stamps with the ones which the stage times
+    # `stage_times` (dictionary of stages to times) imply, for when
+    # another source than the stamp files provides them
+    def _set_stage_times(self, stage_times):
+        stamp_mtimes = {}
+
+        for stage, mtime in stage_times.items():
+            for name in self._stage_stamps(stage):
+                # no inode number: the next stamp reading stats it
+                stamp_mtimes[name] = (0, mtime)
+
+        self._stamp_mtimes = stamp_mtimes
+
+    # adds the stamp named `name` (without the `.stamp_` prefix) with the
+    # modification time `mtime` to the cached stamps, for when another
+    # source than the stamp files reports it
+    def _add_stamp(self, name, mtime):
+        stamp_mtimes = dict(self._stamp_mtimes)
+        stamp_mtimes[name] = (0, mtime)
+        self._stamp_mtimes = stamp_mtimes
+
+    # removes the stamps named `names` from the cached stamps
+    def _remove_stamps(self, names):
+        if not any(name in self._stamp_mtimes for name in names):
+            return
+
+        self._stamp_mtimes = {name: inode_mtime
+                              for name, inode_mtime in self._stamp_mtimes.items()
+                              if name not in names}
+
+    # build stage of this package build considering its cached stamps
+    @property
+    def _cached_stage(self):
+        return self.stage_from_stamps(self._stamp_mtimes)
 
-        if os.path.isdir(self._build_dir):
-            for file in os.listdir(self._build_dir):
-                if file.startswith(PkgBuild._STAMP_FILE_PREFIX):
-                    stamps.add(file.replace(PkgBuild._STAMP_FILE_PREFIX, ''))
+    # `True` if the stamps `stamps` (set) mean that this package build
+    # is installed
+    def _is_installed(self, stamps):
+        if type(self._info) is TargetPkgInfo:
+            if self._info.install_target and 'target_installed' in stamps:
+                return True
 
-        return stamps
+            if self._info.install_staging and 'staging_installed' in stamps:
+                return True
 
-    # `True` if this package build has a stamp named `name` (without
-    # the `.stamp_` prefix)
-    def has_stamp(self, name):
-        stamp_file = PkgBuild._STAMP_FILE_PREFIX + name
-        path = os.path.join(self._build_dir, stamp_file)
-        self._logger.debug('Checking if  `{}` exists.'.format(path))
-        return os.path.exists(path)
+            if self._info.install_images and 'images_installed' in stamps:
+                return True
+        elif type(self._info) is HostPkgInfo:
+            if 'host_installed' in stamps:
+                return True
 
-    @property
-    def is_downloaded(self):
-        return self.has_stamp('downloaded')
+        return False
 
-    @property
-    def is_extracted(self):
-        return self.has_stamp('extracted')
+    # names of the stamps (without the `.stamp_` prefix) which mean
+    # that this package build reached the stage `stage` (tuple)
+    def _stage_stamps(self, stage):
+        if stage is PkgBuildStage.UNKNOWN:
+            return ()
+        elif stage is not PkgBuildStage.INSTALLED:
+            return (stage.value,)
 
-    @property
-    def is_patched(self):
-        return self.has_stamp('patched')
+        if type(self._info) is HostPkgInfo:
+            return ('host_installed',)
 
-    @property
-    def is_configured(self):
-        return self.has_stamp('configured')
+        stamps = []
 
-    @property
-    def is_built(self):
-        return self.has_stamp('built')
+        if self._info.install_target:
+            stamps.append('target_installed')
+
+        if self._info.install_staging:
+            stamps.append('staging_installed')
+
+        if self._info.install_images:
+            stamps.append('images_installed')
+
+        return tuple(stamps)
 
+    # time (seconds since the Epoch) when this package build reached
+    # the stage `stage`, that is, the modification time of the latest
+    # stamp file for this stage, as of the last stamp reading, or `None`
+    # if unknown
+    def stage_time(self, stage):
+        stamp_mtimes = self._stamp_mtimes
+        latest_mtime = None
+
+        for name in self._stage_stamps(stage):
+            inode_mtime = stamp_mtimes.get(name)
+
+            if inode_mtime is None:
+                continue
+
+            if latest_mtime is None or inode_mtime[1] > latest_mtime:
+                latest_mtime = inode_mtime[1]
+
+        return latest_mtime
+
+    # dictionary of build stages to the times (see stage_time()) when
+    # this package build reached them (only the known ones)
     @property
-    def is_installed(self):
-        if type(self._info) is TargetPkgInfo:
-            if self._info.install_target and self.has_stamp('target_installed'):
-                return True
+    def stage_times(self):
+        times = {}
 
-            if self._info.install_staging and self.has_stamp('staging_installed'):
-                return True
+        for stage in _PKG_BUILD_STAGES[1:]:
+            stage_time = self.stage_time(stage)
 
-            if self._info.install_images and self.has_stamp('images_installed'):
-                return True
-        elif type(self._info) is HostPkgInfo:
-            if self.has_stamp('host_installed'):
-                return True
+            if stage_time is not None:
+                times[stage] = stage_time
 
-        return False
+        return times
 
-    # current (latest) build stage for this package build
+    # time (seconds) this package build took to go from the stage
+    # preceding `stage` to `stage` (for example, the build step for
+    # `PkgBuildStage.BUILT`), or `None` if unknown
+    #
+    # There's no duration for `PkgBuildStage.DOWNLOADED`: there's no
+    # stamp file when a download starts.
+    def stage_duration(self, stage):
+        index = _PKG_BUILD_STAGE_INDEXES[stage]
+
+        if index < 2:
+            return
+
+        end_time = self.stage_time(stage)
+
+        if end_time is None:
+            return
+
+        start_time = self.stage_time(_PKG_BUILD_STAGES[index - 1])
+
+        if start_time is None or start_time > end_time:
+            return
+
+        return end_time - start_time
+
+    # dictionary of build stages to durations (see stage_duration())
+    # (only the known ones)
     @property
-    def stage(self):
-        if self.is_installed:
+    def stage_durations(self):
+        durations = {}
+
+        for stage in _PKG_BUILD_STAGES[2:]:
+            duration = self.stage_duration(stage)
+
+            if duration is not None:
+                durations[stage] = duration
+
+        return durations
+
+    # build stage of this package build considering its current stamps
+    # are `stamps` (set, as returned by the `stamps` property)
+    def stage_from_stamps(self, stamps):
+        if self._is_installed(stamps):
             return PkgBuildStage.INSTALLED
-        elif self.is_built:
+        elif 'built' in stamps:
             return PkgBuildStage.BUILT
-        elif self.is_configured:
+        elif 'configured' in stamps:
             return PkgBuildStage.CONFIGURED
-        elif self.is_patched:
+        elif 'patched' in stamps:
             return PkgBuildStage.PATCHED
-        elif self.is_extracted:
+        elif 'extracted' in stamps:
             return PkgBuildStage.EXTRACTED
-        elif self.is_downloaded:
+        elif 'downloaded' in stamps:
             return PkgBuildStage.DOWNLOADED
 
         return PkgBuildStage.UNKNOWN
 
+    # current (latest) build stage for this package build
+    @property
+    def stage(self):
+        return self.stage_from_stamps(self.stamps)
+
     def __hash__(self):
         return hash(self._info)
 
@@ -333,10 +1166,10 @@ class PkgBuild:
         return self._info == other._info
 
 
-# creates a dictionary of package names to package build objects,
-# running `make` to get the configured package information
-def pkg_builds_from_make(br_root_dir, br_build_dir):
-    pkg_infos = pkg_infos_from_make(br_root_dir)
+# creates a dictionary of package names to package build objects for
+# the package information objects `pkg_infos` (dictionary) within
+# `br_build_dir`
+def pkg_builds_from_pkg_infos(pkg_infos, br_build_dir):
     pkg_builds = {}
 
     for pkg_info in pkg_infos.values():
@@ -345,53 +1178,1139 @@ def pkg_builds_from_make(br_root_dir, br_build_dir):
     return pkg_builds
 
 
+# creates a dictionary of package names to package build objects,
+# running `make` (see pkg_infos_from_make()) to get the configured
+# package information
+#
+# The Buildroot output directory is the parent of `br_build_dir`.
+#
+# `canceller`: see pkg_infos_from_make().
+def pkg_builds_from_make(br_root_dir, br_build_dir, use_cache=True,
+                         refresh_cache=False, canceller=None):
+    pkg_infos = pkg_infos_from_make(br_root_dir, use_cache, refresh_cache,
+                                    br_output_dir(br_build_dir),
+                                    canceller=canceller)
+    return pkg_builds_from_pkg_infos(pkg_infos, br_build_dir)
+
+
+# a package build stage transition which a package build monitor
+# observed
+class PkgBuildStageTransition:
+    __slots__ = ('_pkg_build', '_old_stage', '_new_stage', '_stamp_mtime',
+                 '_observed_time')
+
+    def __init__(self, pkg_build, old_stage, new_stage, stamp_mtime,
+                 observed_time):
+        self._pkg_build = pkg_build
+        self._old_stage = old_stage
+        self._new_stage = new_stage
+        self._stamp_mtime = stamp_mtime
+        self._observed_time = observed_time
+
+    @property
+    def pkg_build(self):
+        return self._pkg_build
+
+    @property
+    def old_stage(self):
+        return self._old_stage
+
+    @property
+    def new_stage(self):
+        return self._new_stage
+
+    # modification time (seconds since the Epoch) of the stamp file of
+    # the new stage, or `None` if unknown (see `PkgBuild.stage_time()`)
+    @property
+    def stamp_mtime(self):
+        return self._stamp_mtime
+
+    # time (seconds since the Epoch) when the monitor observed this
+    # transition
+    @property
+    def observed_time(self):
+        return self._observed_time
+
+
+# a package build step which started and didn't end yet
+class PkgBuildStep:
+    __slots__ = ('_name', '_start_time')
+
+    def __init__(self, name, start_time):
+        self._name = name
+        self._start_time = start_time
+
+    # Buildroot step name (for example, `configure` or `install-target`)
+    @property
+    def name(self):
+        return self._name
+
+    # time (seconds since the Epoch) when the step started
+    @property
+    def start_time(self):
+        return self._start_time
+
+
+# a package build step start or end event
+class PkgBuildStepEvent:
+    __slots__ = ('_time', '_is_start', '_step', '_pkg_name')
+
+    def __init__(self, time, is_start, step, pkg_name):
+        self._time = time
+        self._is_start = is_start
+        self._step = step
+        self._pkg_name = pkg_name
+
+    # time (seconds since the Epoch)
+    @property
+    def time(self):
+        return self._time
+
+    # `True` for a step start, `False` for a step end
+    @property
+    def is_start(self):
+        return self._is_start
+
+    # Buildroot step name
+    @property
+    def step(self):
+        return self._step
+
+    @property
+    def pkg_name(self):
+        return self._pkg_name
+
+
+# last output lines of a package build which `yobr-make` read (see
+# `yobr.make`)
+class PkgBuildOutputEvent:
+    __slots__ = ('_time', '_pkg_name', '_lines')
+
+    def __init__(self, time, pkg_name, lines):
+        self._time = time
+        self._pkg_name = pkg_name
+        self._lines = lines
+
+    # time (seconds since the Epoch)
+    @property
+    def time(self):
+        return self._time
+
+    @property
+    def pkg_name(self):
+        return self._pkg_name
+
+    # output lines, without ANSI escape sequences (tuple of strings)
+    @property
+    def lines(self):
+        return self._lines
+
+
+# failure of `make` while building a package (see `yobr.make`)
+class PkgBuildFailureEvent:
+    __slots__ = ('_time', '_pkg_name')
+
+    def __init__(self, time, pkg_name):
+        self._time = time
+        self._pkg_name = pkg_name
+
+    # time (seconds since the Epoch)
+    @property
+    def time(self):
+        return self._time
+
+    @property
+    def pkg_name(self):
+        return self._pkg_name
+
+
+# Buildroot step names (in build order) to the names of the stamps
+# which they create (without the `.stamp_` prefix)
+_STEP_STAMPS = {
+    'download': 'downloaded',
+    'extract': 'extracted',
+    'patch': 'patched',
+    'configure': 'configured',
+    'build': 'built',
+    'install-host': 'host_installed',
+    'install-staging': 'staging_installed',
+    'install-target': 'target_installed',
+    'install-image': 'images_installed',
+}
+
+# Buildroot step names to the names of the stamps which a new start of
+# this step invalidates (the stamp of this step and of the next ones)
+_STEP_INVALIDATED_STAMPS = {}
+
+for _i, _step in enumerate(_STEP_STAMPS):
+    _STEP_INVALIDATED_STAMPS[_step] = set(list(_STEP_STAMPS.values())[_i:])
+
+del _i, _step
+
+
+# time (seconds since the Epoch) of the event time string `s`, or
+# `None` if it's not a finite number
+def _parse_event_time(s):
+    try:
+        event_time = float(s)
+    except ValueError:
+        return
+
+    if not math.isfinite(event_time):
+        return
+
+    return event_time
+
+
+# creates a package build step event from the line `line` of
+# Buildroot's `build-time.log`, returning `None` if it's malformed
+#
+# A line looks like:
+#
+#     1581023645.123456789:start:configure           : host-m4
+def pkg_build_step_event_from_build_time_log_line(line):
+    parts = line.split(':', 3)
+
+    if len(parts) != 4:
+        return
+
+    kind = parts[1].strip()
+
+    if kind not in ('start', 'end'):
+        return
+
+    event_time = _parse_event_time(parts[0])
+    step = parts[2].strip()
+    pkg_name = parts[3].strip()
+
+    if event_time is None or not step or not pkg_name:
+        return
+
+    return PkgBuildStepEvent(event_time, kind == 'start', step, pkg_name)
+
+
+# path of Buildroot's `build-time.log` within `br_build_dir`
+def build_time_log_path(br_build_dir):
+    return os.path.join(br_build_dir, 'build-time.log')
+
+
+# follower of Buildroot's `build-time.log` file `path` (usually
+# `BR-BUILD-DIR/build-time.log`) which Buildroot appends a line to when
+# it starts or ends a package build step
+#
+# read_events() only reads what Buildroot appended since the last call.
+class BuildTimeLogTailer:
+    def __init__(self, path):
+        self._logger = yobr.utils._get_obj_logger(self)
+        self._path = path
+        self._file = None
+        self._ino = None
+
+        # incomplete last line (bytes)
+        self._partial_line = b''
+
+    @property
+    def path(self):
+        return self._path
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._ino = None
+            self._partial_line = b''
+
+    # returns the new step events (list of `PkgBuildStepEvent`), or
+    # `None` if the file restarted (removed, replaced, or truncated):
+    # the events read until now don't describe the current build
+    # anymore, and the next call returns the events of the new file from
+    # its beginning
+    def read_events(self):
+        try:
+            st = os.stat(self._path)
+        except FileNotFoundError:
+            if self._file is not None:
+                self._logger.info('`{}` was removed.'.format(self._path))
+                self._close_file()
+                return
+
+            return []
+
+        if self._file is not None and (st.st_ino != self._ino or st.st_size < self._file.tell()):
+            self._logger.info('`{}` restarted.'.format(self._path))
+            self._close_file()
+            return
+
+        if self._file is None:
+            try:
+                self._file = open(self._path, 'rb')
+            except FileNotFoundError:
+                return []
+
+            self._ino = os.fstat(self._file.fileno()).st_ino
+
+        data = self._file.read()
+
+        if len(data) == 0:
+            return []
+
+        lines = (self._partial_line + data).split(b'\n')
+
+        # the last element is empty or incomplete
+        self._partial_line = lines.pop()
+        events = []
+
+        for line in lines:
+            event = pkg_build_step_event_from_build_time_log_line(line.decode(errors='replace'))
+
+            if event is None:
+                self._logger.debug('Ignoring malformed line `{}`.'.format(line))
+                continue
+
+            events.append(event)
+
+        return events
+
+    def close(self):
+        self._close_file()
+
+
+# default path of the step event socket (see `yobr.hook`) for the
+# Buildroot build directory `br_build_dir`: within its output directory
+def step_event_socket_path(br_build_dir):
+    return os.path.join(br_output_dir(br_build_dir),
+                        yobr.hook.SOCKET_FILE_NAME)
+
+
+# creates a package build event from the datagram `data` which
+# `yobr.hook` or `yobr.make` sends, returning `None` if it's malformed
+#
+# A datagram is one of:
+#
+#     TIME start STEP PKG
+#     TIME end STEP PKG
+#     TIME output PKG\nLINE\nLINE...
+#     TIME fail PKG
+def _pkg_build_event_from_datagram(data):
+    header, _, body = data.decode(errors='replace').partition('\n')
+    parts = header.split(' ', 3)
+
+    if len(parts) < 3 or '' in parts:
+        return
+
+    event_time = _parse_event_time(parts[0])
+
+    if event_time is None:
+        return
+
+    kind = parts[1]
+
+    if kind in ('start', 'end') and len(parts) == 4:
+        pkg_name = parts[3].strip()
+
+        if not pkg_name:
+            return
+
+        return PkgBuildStepEvent(event_time, kind == 'start', parts[2],
+                                 pkg_name)
+    elif kind == 'output' and len(parts) == 3:
+        return PkgBuildOutputEvent(event_time, parts[2],
+                                   tuple(body.split('\n')))
+    elif kind == 'fail' and len(parts) == 3:
+        return PkgBuildFailureEvent(event_time, parts[2])
+
+
+# receiver of the package build step events which the Buildroot
+# instrumentation script (see `yobr.hook`) and `yobr-make` (see
+# `yobr.make`) send to the UNIX domain datagram socket `path`
+#
+# The directory of `path` doesn't need to exist: read_events() binds the
+# socket once it does, and binds it again if someone removes the socket
+# file (for example, `make distclean`).
+#
+# Raises `OSError` on creation if another process listens on `path`.
+class PkgBuildStepEventReceiver:
+    # `yobr.make` sends output lines up to this size
+    _MAX_DATAGRAM_SIZE = 65536
+
+    def __init__(self, path):
+        self._logger = yobr.utils._get_obj_logger(self)
+        self._path = path
+        self._sock = self._create_socket()
+
+        # inode number of the bound socket file, or `None` if not bound
+        self._ino = None
+
+        try:
+            is_bound = self._bind()
+        except OSError:
+            self._sock.close()
+            raise
+
+        if not is_bound:
+            self._logger.info('Cannot bind `{}` yet.'.format(path))
+
+    @property
+    def path(self):
+        return self._path
+
+    # file descriptor to wait on (readable when there are events to
+    # read with read_events()); doesn't change
+    def fileno(self):
+        return self._sock.fileno()
+
+    @staticmethod
+    def _create_socket():
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.setblocking(False)
+        return sock
+
+    # `True` if no process listens on the existing socket file
+    def _is_stale(self):
+        with self._create_socket() as sock:
+            try:
+                sock.connect(self._path)
+            except ConnectionRefusedError:
+                return True
+            except OSError:
+                return False
+
+        return False
+
+    # tries to bind the socket, returning `True` on success
+    def _bind(self):
+        try:
+            self._sock.bind(self._path)
+        except FileNotFoundError:
+            # directory doesn't exist yet
+            return False
+        except OSError as exc:
+            if exc.errno != errno.EADDRINUSE or not self._is_stale():
+                raise
+
+            # left by a previous process
+            self._logger.debug('Removing stale socket `{}`.'.format(self._path))
+            os.unlink(self._path)
+            self._sock.bind(self._path)
+
+        self._ino = os.stat(self._path).st_ino
+        self._logger.debug('Listening on `{}`.'.format(self._path))
+        return True
+
+    # replaces the socket with a new unbound one having the same file
+    # descriptor
+    def _reset_socket(self):
+        with self._create_socket() as sock:
+            os.dup2(sock.fileno(), self._sock.fileno(), inheritable=False)
+
+        self._ino = None
+
+    # returns the received events (list of `PkgBuildStepEvent`,
+    # `PkgBuildOutputEvent`, and `PkgBuildFailureEvent`), or `None` if
+    # the socket was just bound (again): events could have been lost
+    # before
+    def read_events(self):
+        if self._ino is not None:
+            try:
+                is_bound = os.stat(self._path).st_ino == self._ino
+            except FileNotFoundError:
+                is_bound = False
+
+            if not is_bound:
+                self._logger.info('`{}` was removed: binding again.'.format(self._path))
+                self._reset_socket()
+
+        if self._ino is None:
+            try:
+                if not self._bind():
+                    return []
+            except OSError as exc:
+                self._logger.warning('Cannot bind `{}`: {}'.format(self._path, exc))
+                return []
+
+            return
+
+        events = []
+
+        while True:
+            try:
+                data = self._sock.recv(self._MAX_DATAGRAM_SIZE)
+            except BlockingIOError:
+                break
+
+            event = _pkg_build_event_from_datagram(data)
+
+            if event is None:
+                self._logger.debug('Ignoring malformed datagram {}.'.format(data))
+                continue
+
+            events.append(event)
+
+        return events
+
+    def close(self):
+        if self._ino is not None:
+            try:
+                if os.stat(self._path).st_ino == self._ino:
+                    os.unlink(self._path)
+            except OSError:
+                pass
+
+        self._sock.close()
+
+
+# creates a step event receiver listening on `path`, or returns `None`
+# if it's not possible (polling only)
+def create_pkg_build_step_event_receiver(path):
+    try:
+        return PkgBuildStepEventReceiver(path)
+    except OSError as exc:
+        _logger.warning('Cannot listen on `{}` ({}): polling.'.format(path, exc))
+
+
+# a watcher of package build stamp changes using Linux inotify
+#
+# The watcher watches the Buildroot build directory (to know when
+# package build directories are created or removed) as well as each
+# existing package build directory (to know when stamp files are created
+# or removed). It falls back to polling for any directory it cannot
+# watch.
+#
+# Raises `OSError` on creation if inotify is not available.
+class PkgBuildStampWatcher:
+    _BR_BUILD_DIR_MASK = (yobr.inotify.IN_CREATE | yobr.inotify.IN_MOVED_TO |
+                          yobr.inotify.IN_DELETE | yobr.inotify.IN_MOVED_FROM |
+                          yobr.inotify.IN_DELETE_SELF | yobr.inotify.IN_MOVE_SELF |
+                          yobr.inotify.IN_ONLYDIR)
+    _PKG_BUILD_DIR_MASK = _BR_BUILD_DIR_MASK
+
+    def __init__(self, pkg_builds, br_build_dir):
+        self._logger = yobr.utils._get_obj_logger(self)
+        self._inotify = yobr.inotify.Inotify()
+        self._br_build_dir = br_build_dir
+        self._br_build_dir_wd = None
+
+        # package build directory name to package build
+        self._pkg_builds = {}
+
+        for pkg_build in pkg_builds.values():
+            self._pkg_builds[os.path.basename(pkg_build.build_dir)] = pkg_build
+
+        # watch descriptor to package build, and vice versa
+        self._wd_pkg_builds = {}
+        self._pkg_build_wds = {}
+
+        # package builds to poll because we cannot watch them
+        self._polled_pkg_builds = set()
+
+        # package builds to check on the next call to
+        # pending_pkg_builds(): initially all of them
+        self._dirty_pkg_builds = set(self._pkg_builds.values())
+        self._watch_br_build_dir()
+
+    # file descriptor to wait on (readable when there are events to
+    # process with pending_pkg_builds())
+    def fileno(self):
+        return self._inotify.fileno()
+
+    def _watch_br_build_dir(self):
+        try:
+            self._br_build_dir_wd = self._inotify.add_watch(self._br_build_dir,
+                                                            self._BR_BUILD_DIR_MASK)
+        except OSError as exc:
+            self._logger.debug('Cannot watch `{}`: {}.'.format(self._br_build_dir,
+                                                               exc))
+            self._br_build_dir_wd = None
+
+            # poll what's not watched until we can watch the build
+            # directory
+            for pkg_build in self._pkg_builds.values():
+                if pkg_build not in self._pkg_build_wds:
+                    self._polled_pkg_builds.add(pkg_build)
+
+            return
+
+        self._logger.debug('Watching `{}`.'.format(self._br_build_dir))
+
+        # check the polled package builds one last time: they could
+        # have changed since the last poll
+        self._dirty_pkg_builds.update(self._polled_pkg_builds)
+
+        for pkg_build in self._pkg_builds.values():
+            if pkg_build not in self._pkg_build_wds:
+                self._watch_pkg_build(pkg_build)
+
+    def _watch_pkg_build(self, pkg_build):
+        try:
+            wd = self._inotify.add_watch(pkg_build.build_dir,
+                                         self._PKG_BUILD_DIR_MASK)
+        except OSError as exc:
+            if exc.errno in (errno.ENOENT, errno.ENOTDIR) and self._br_build_dir_wd is not None:
+                # not created yet: watching the build directory tells
+                # us when it is
+                self._polled_pkg_builds.discard(pkg_build)
+            else:
+                # cannot watch (watch limit, permission, and the rest)
+                self._logger.warning('Cannot watch `{}` ({}): polling it.'.format(pkg_build.build_dir,
+                                                                                 exc))
+                self._polled_pkg_builds.add(pkg_build)
+
+            return
+
+        self._wd_pkg_builds[wd] = pkg_build
+        self._pkg_build_wds[pkg_build] = wd
+        self._polled_pkg_builds.discard(pkg_build)
+
+        # stamps could have been created before the watch was added
+        self._dirty_pkg_builds.add(pkg_build)
+
+    def _unwatch_pkg_build(self, wd):
+        pkg_build = self._wd_pkg_builds.pop(wd)
+        del self._pkg_build_wds[pkg_build]
+        self._dirty_pkg_builds.add(pkg_build)
+
+        if self._br_build_dir_wd is None:
+            self._polled_pkg_builds.add(pkg_build)
+
+    def _process_br_build_dir_event(self, event):
+        if event.mask & yobr.inotify.IN_IGNORED:
+            # build directory is removed or moved: poll until it's back
+            self._logger.debug('Not watching `{}` anymore.'.format(self._br_build_dir))
+            self._br_build_dir_wd = None
+
+            for pkg_build in self._pkg_builds.values():
+                if pkg_build not in self._pkg_build_wds:
+                    self._polled_pkg_builds.add(pkg_build)
+
+            return
+
+        if event.name is None:
+            return
+
+        pkg_build = self._pkg_builds.get(event.name)
+
+        if pkg_build is None:
+            # not a monitored package build directory
+            return
+
+        if event.mask & (yobr.inotify.IN_CREATE | yobr.inotify.IN_MOVED_TO):
+            if pkg_build not in self._pkg_build_wds:
+                self._watch_pkg_build(pkg_build)
+
+        self._dirty_pkg_builds.add(pkg_build)
+
+    def _process_event(self, event):
+        if event.mask & yobr.inotify.IN_Q_OVERFLOW:
+            # lost events: check everything
+            self._logger.warning('Event queue overflow: checking all package builds.')
+            self._dirty_pkg_builds.update(self._pkg_builds.values())
+            return
+
+        if self._br_build_dir_wd is not None and event.wd == self._br_build_dir_wd:
+            self._process_br_build_dir_event(event)
+            return
+
+        if event.wd not in self._wd_pkg_builds:
+            return
+
+        if event.mask & yobr.inotify.IN_IGNORED:
+            # package build directory is removed or moved
+            self._unwatch_pkg_build(event.wd)
+            return
+
+        pkg_build = self._wd_pkg_builds[event.wd]
+
+        if event.name is None or event.name.startswith(PkgBuild._STAMP_FILE_PREFIX):
+            self._dirty_pkg_builds.add(pkg_build)
+
+    # set of package builds which might have a new stage since the
+    # last call, including the ones which this watcher polls
+    def pending_pkg_builds(self):
+        if self._br_build_dir_wd is None:
+            # the build directory might exist now
+            self._watch_br_build_dir()
+
+        for event in self._inotify.read_events():
+            self._process_event(event)
+
+        pkg_builds = self._dirty_pkg_builds | self._polled_pkg_builds
+        self._dirty_pkg_builds = set()
+        return pkg_builds
+
+    def close(self):
+        self._inotify.close()
+
+
+# creates a stamp watcher for the package builds `pkg_builds` within
+# `br_build_dir`, returning `None` if inotify is not available
+def create_pkg_build_stamp_watcher(pkg_builds, br_build_dir):
+    try:
+        return PkgBuildStampWatcher(pkg_builds, br_build_dir)
+    except OSError as exc:
+        _logger.warning('Cannot watch stamps ({}): polling.'.format(exc))
+
+
+# package graph of the package builds `pkg_builds` (dictionary),
+# checking that they make a whole graph
+def _pkg_builds_graph(pkg_builds):
+    if len(pkg_builds) == 0:
+        return PkgGraph((), {})
+
+    graph = next(iter(pkg_builds.values())).info.graph
+
+    if graph is None or len(graph) != len(pkg_builds):
+        raise ValueError('Package builds do not make a whole package graph')
+
+    return graph
+
+
 # a monitor of package builds which caches their stages
+#
+# If `stamp_watcher` is set (a `PkgBuildStampWatcher` object for the
+# same package builds), update() only checks the package builds it
+# reports.
+#
+# If `transition_log` is set (for example, a
+# `yobr.timeline.PkgBuildStageTransitionLog` object), update() calls its
+# write() method with the list of the stage transitions
+# (`PkgBuildStageTransition` objects) it observes, if any.
+#
+# If `shared_state` is set (a `yobr.shared.SharedPkgBuildState` object
+# for the same package graph), update() reads the stages which another
+# monitor publishes there instead of reading the stamp files, or
+# publishes its own stages there if there's no other publisher.
+#
+# If `step_event_source` is set (a `BuildTimeLogTailer` or
+# `PkgBuildStepEventReceiver` object, for example), update() applies its
+# events (see apply_step_events()) instead of reading the stamp files,
+# except on the first update, after the source restarts, and every
+# `_STEP_EVENT_RESYNC_INTERVAL` seconds to catch what the events don't
+# report (for example, a package build directory which a user removes).
 class PkgBuildMonitor:
-    def __init__(self, pkg_builds):
+    _STEP_EVENT_RESYNC_INTERVAL = 60
+
+    # maximum number of output lines to keep per package build
+    _OUTPUT_LINE_COUNT = 200
+
+    def __init__(self, pkg_builds, stamp_watcher=None, transition_log=None,
+                 shared_state=None, step_event_source=None):
         self.pkg_builds = pkg_builds
+        self._stamp_watcher = stamp_watcher
+        self._transition_log = transition_log
+        self._shared_state = shared_state
+        self._step_event_source = step_event_source
+
+        # package builds to active steps (`PkgBuildStep`)
+        self._active_steps = {}
+
+        # package builds to their last output lines (tuples), and
+        # package build which `make` failed to build (from `yobr-make`)
+        self._outputs = {}
+        self._failed_pkg_build = None
+
+        # last time (monotonic) update() read all the stamp files while
+        # using the step event source
+        self._step_event_sync_time = None
 
     @property
     def pkg_builds(self):
         return self._pkg_builds
 
+    # `pkg_builds` is a dictionary of package names to package builds
+    # of which the package information objects make a whole package
+    # graph
     @pkg_builds.setter
     def pkg_builds(self, pkg_builds):
         self._pkg_builds = pkg_builds
-        self._stages = {n: PkgBuildStage.UNKNOWN for n in pkg_builds}
+        self._graph = _pkg_builds_graph(pkg_builds)
+        self._stages = PkgBuildStages(self._graph)
+
+        # package builds indexed by package ID
+        self._pkg_builds_by_id = [None] * len(self._graph)
+
+        for pkg_build in pkg_builds.values():
+            self._pkg_builds_by_id[pkg_build.info.id] = pkg_build
+
+        # number of package builds per stage index, maintained on stage
+        # changes
+        self._stage_counts = array.array('I', [0]) * len(_PKG_BUILD_STAGES)
+        self._stage_counts[0] = len(pkg_builds)
+
+    # package graph of the monitored package builds
+    @property
+    def graph(self):
+        return self._graph
+
+    # monitored package build having the package ID `pkg_id`
+    def pkg_build(self, pkg_id):
+        return self._pkg_builds_by_id[pkg_id]
+
+    # copy of the cached build stages (`PkgBuildStages`)
+    @property
+    def stages(self):
+        return self._stages.copy()
+
+    # stamp watcher, if any
+    @property
+    def stamp_watcher(self):
+        return self._stamp_watcher
+
+    # stage transition log, if any
+    @property
+    def transition_log(self):
+        return self._transition_log
+
+    # shared state, if any
+    @property
+    def shared_state(self):
+        return self._shared_state
+
+    # step event source, if any
+    @property
+    def step_event_source(self):
+        return self._step_event_source
+
+    # objects having a fileno() method (stamp watcher and step event
+    # source) which become readable when update() has something new to
+    # read (list)
+    @property
+    def waitables(self):
+        waitables = []
+
+        for obj in (self._stamp_watcher, self._step_event_source):
+            if obj is not None and hasattr(obj, 'fileno'):
+                waitables.append(obj)
+
+        return waitables
+
+    # active step (`PkgBuildStep`) of the package build object
+    # `pkg_build`, or `None` if unknown (only with a step event source)
+    def active_step(self, pkg_build):
+        return self._active_steps.get(pkg_build)
+
+    # dictionary of package builds to active steps (copy)
+    @property
+    def active_steps(self):
+        return dict(self._active_steps)
+
+    # last output lines (tuple of strings) of the package build object
+    # `pkg_build` (only with `yobr-make`)
+    def output(self, pkg_build):
+        return self._outputs.get(pkg_build, ())
+
+    # dictionary of package builds to their last output lines (copy)
+    @property
+    def outputs(self):
+        return dict(self._outputs)
+
+    # package build which `make` was building when it failed, or `None`
+    # (only with `yobr-make`)
+    @property
+    def failed_pkg_build(self):
+        return self._failed_pkg_build
 
     # cached stage for the package build object `pkg_build`
     def stage(self, pkg_build):
-        return self._stages[pkg_build.info.name]
-
-    # update the cached build stages of all the monitored package builds
+        return self._stages.stage(pkg_build.info)
+
+    # cached number of built (or installed) direct dependencies of the
+    # package build object `pkg_build`
+    def built_dependency_count(self, pkg_build):
+        return self._stages.built_dependency_count(pkg_build.info)
+
+    # resolves the current build stages of the package builds
+    # `pkg_builds` (all the monitored package builds if `None`)
+    # together, returning a dictionary of package builds to stages
+    #
+    # This method reads each parent directory of the package build
+    # directories once to know which package build directories exist
+    # (unless there's a single package build to resolve), and then
+    # reads each existing package build directory once.
+    def resolve_stages(self, pkg_builds=None):
+        if pkg_builds is None:
+            pkg_builds = self._pkg_builds.values()
+
+        # group by parent directory (all the same, in practice)
+        parent_dirs = {}
+
+        for pkg_build in pkg_builds:
+            parent_dir, name = os.path.split(pkg_build.build_dir)
+            parent_dirs.setdefault(parent_dir, []).append((name, pkg_build))
+
+        stages = {}
+
+        for parent_dir, items in parent_dirs.items():
+            existing_names = None
+
+            if len(items) > 1:
+                try:
+                    existing_names = set(os.listdir(parent_dir))
+                except (FileNotFoundError, NotADirectoryError):
+                    existing_names = set()
+
+            for name, pkg_build in items:
+                if existing_names is None or name in existing_names:
+                    stamps = pkg_build.stamps
+                else:
+                    pkg_build._forget_stamps()
+                    stamps = set()
+
+                stages[pkg_build] = pkg_build.stage_from_stamps(stamps)
+
+        return stages
+
+    # update the cached build stages of the monitored package builds,
+    # returning the set of package builds of which the stage changed
     def update(self):
-        for pkg_build in self._pkg_builds.values():
-            self._stages[pkg_build.info.name] = pkg_build.stage
+        shared_state = self._shared_state
+        check_all = False
+
+        if shared_state is not None and not shared_state.is_publisher:
+            if shared_state.acquire():
+                # take over from the previous publisher
+                check_all = True
+            else:
+                stages = shared_state.read(self)
+
+                if stages is not None:
+                    if self._stamp_watcher is not None:
+                        # only drain its events
+                        self._stamp_watcher.pending_pkg_builds()
+
+                    if self._step_event_source is not None:
+                        # the stages come from the shared state, but
+                        # the active steps and outputs only from the
+                        # source (also drains it)
+                        self._read_step_events(False)
+
+                    return self.apply_stages(stages)
+
+        if self._step_event_source is not None:
+            changed_pkg_builds = self._update_from_step_events(check_all)
+        else:
+            pkg_builds = self._pkg_builds.values()
+
+            if self._stamp_watcher is not None:
+                # always drain its events: it's readable until then
+                pending_pkg_builds = self._stamp_watcher.pending_pkg_builds()
+
+                if not check_all:
+                    pkg_builds = pending_pkg_builds
+
+            changed_pkg_builds = self.apply_stages(self.resolve_stages(pkg_builds))
+
+        if shared_state is not None and shared_state.is_publisher:
+            shared_state.publish(self, changed_pkg_builds)
+
+        return changed_pkg_builds
+
+    # update() part with a step event source
+    def _update_from_step_events(self, check_all):
+        source = self._step_event_source
+        now = time.monotonic()
+        is_restarted = False
+
+        if self._stamp_watcher is not None:
+            # only drain its events
+            self._stamp_watcher.pending_pkg_builds()
+
+        if not check_all and self._step_event_sync_time is not None and now - self._step_event_sync_time < self._STEP_EVENT_RESYNC_INTERVAL:
+            events = source.read_events()
+
+            if events is not None:
+                return self.apply_step_events(events)
+
+            is_restarted = True
+
+        # read everything which the source has, and then all the stamp
+        # files: the stamps tell the stages, and the events only tell
+        # the active steps
+        self._step_event_sync_time = now
+        self._read_step_events(is_restarted)
+        return self.apply_stages(self.resolve_stages())
+
+    # reads all the events of the step event source, only applying
+    # them to the active steps and outputs (not to the stamps)
+    #
+    # `is_restarted` is `True` if the source already restarted.
+    def _read_step_events(self, is_restarted):
+        source = self._step_event_source
+        events = source.read_events()
+
+        if events is None:
+            is_restarted = True
+            events = source.read_events() or []
+
+        if is_restarted:
+            # the previous active steps are meaningless
+            active_steps = {}
+        else:
+            active_steps = dict(self._active_steps)
+
+        outputs = dict(self._outputs)
+
+        for event in events:
+            self._apply_event(active_steps, outputs, event)
+
+        self._active_steps = active_steps
+        self._outputs = outputs
+
+    # applies the event `event` to the active steps `active_steps` and
+    # to the outputs `outputs` (dictionaries), returning the package
+    # build of a step event (`None` if not monitored or not a step
+    # event)
+    def _apply_event(self, active_steps, outputs, event):
+        pkg_build = self._pkg_builds.get(event.pkg_name)
+
+        if type(event) is PkgBuildOutputEvent:
+            if pkg_build is not None:
+                lines = outputs.get(pkg_build, ()) + event.lines
+                outputs[pkg_build] = lines[-self._OUTPUT_LINE_COUNT:]
+
+            return
+        elif type(event) is PkgBuildFailureEvent:
+            # `make` stopped: no more active steps
+            self._failed_pkg_build = pkg_build
+            active_steps.clear()
+            return
+
+        if pkg_build is None:
+            return
+
+        if event.is_start:
+            # `make` runs again
+            self._failed_pkg_build = None
+            active_steps[pkg_build] = PkgBuildStep(event.step, event.time)
+        else:
+            active_step = active_steps.get(pkg_build)
+
+            if active_step is not None and active_step.name == event.step:
+                del active_steps[pkg_build]
+
+        return pkg_build
+
+    # applies the package build events `events` (iterable of
+    # `PkgBuildStepEvent`, `PkgBuildOutputEvent`, and
+    # `PkgBuildFailureEvent`, in order), returning the set of package
+    # builds of which the stage changed
+    #
+    # A step end adds the stamp which the step creates to the cached
+    # stamps of its package build (see `PkgBuild.stage_time()`), while a
+    # step start removes the stamps of this step and of the next ones
+    # (for example, when rebuilding a package).
+    def apply_step_events(self, events):
+        active_steps = dict(self._active_steps)
+        outputs = dict(self._outputs)
+        pkg_builds = set()
+
+        for event in events:
+            pkg_build = self._apply_event(active_steps, outputs, event)
+
+            if pkg_build is None:
+                continue
 
-    # cached count of built packages
+            if event.is_start:
+                stamps = _STEP_INVALIDATED_STAMPS.get(event.step)
+
+                if stamps is not None:
+                    pkg_build._remove_stamps(stamps)
+            else:
+                stamp = _STEP_STAMPS.get(event.step)
+
+                if stamp is not None:
+                    pkg_build._add_stamp(stamp, event.time)
+
+            pkg_builds.add(pkg_build)
+
+        # replace: another thread could be reading them
+        self._active_steps = active_steps
+        self._outputs = outputs
+        return self.apply_stages({pb: pb._cached_stage for pb in pkg_builds})
+
+    # sets the cached build stages of the package builds to the ones of
+    # `stages` (dictionary of package builds to stages), returning the
+    # set of package builds of which the stage changed
+    def apply_stages(self, stages):
+        changed_pkg_builds = set()
+        transitions = []
+        observed_time = time.time()
+
+        for pkg_build, stage in stages.items():
+            old_stage = self._stages.set_stage(pkg_build.info, stage)
+
+            if old_stage is not stage:
+                self._stage_counts[_PKG_BUILD_STAGE_INDEXES[old_stage]] -= 1
+                self._stage_counts[_PKG_BUILD_STAGE_INDEXES[stage]] += 1
+                changed_pkg_builds.add(pkg_build)
+
+                if self._transition_log is not None:
+                    transition = PkgBuildStageTransition(pkg_build, old_stage,
+                                                         stage,
+                                                         pkg_build.stage_time(stage),
+                                                         observed_time)
+                    transitions.append(transition)
+
+        if len(transitions) > 0:
+            try:
+                self._transition_log.write(transitions)
+            except OSError as exc:
+                # keep monitoring anyway
+                _logger.error('Cannot write stage transitions: {}'.format(exc))
+
+        return changed_pkg_builds
+
+    # cached package builds which are currently being built (list, in
+    # package ID order): extracted but not built yet, or built but not
+    # installed yet (for installable packages)
     @property
-    def built_count(self):
-        count = 0
+    def in_progress_pkg_builds(self):
+        stages = (PkgBuildStage.EXTRACTED, PkgBuildStage.PATCHED,
+                  PkgBuildStage.CONFIGURED, PkgBuildStage.BUILT)
+        pkg_builds = []
+
+        for pkg_info in self._stages.pkg_infos_at_stages(stages):
+            if self._stages.stage(pkg_info) is PkgBuildStage.BUILT and not pkg_info.is_installable:
+                # nothing more to do
+                continue
 
-        for pkg_build in self._pkg_builds.values():
-            if self.stage(pkg_build) in (PkgBuildStage.BUILT, PkgBuildStage.INSTALLED):
-                count += 1
+            pkg_builds.append(self._pkg_builds_by_id[pkg_info.id])
 
-        return count
+        return pkg_builds
 
-    # cached count of installed packages
+    # cached number of package builds which are at the stage `stage`
+    def stage_count(self, stage):
+        return self._stage_counts[_PKG_BUILD_STAGE_INDEXES[stage]]
+
+    # cached number of package builds per stage (new dictionary of
+    # stages to counts)
     @property
-    def installed_count(self):
-        count = 0
+    def stage_counts(self):
+        return dict(zip(_PKG_BUILD_STAGES, self._stage_counts))
 
-        for pkg_build in self._pkg_builds.values():
-            if self.stage(pkg_build) == PkgBuildStage.INSTALLED:
-                count += 1
+    # cached count of built packages
+    @property
+    def built_count(self):
+        return sum(self._stage_counts[_BUILT_STAGE_INDEX:])
 
-        return count
+    # cached count of installed packages
+    @property
+    def installed_count(self):
+        return self.stage_count(PkgBuildStage.INSTALLED)
 
 
 # creates a package build monitor, running `make` to get the configured
 # package information
-def pkg_build_monitor_from_make(br_root_dir, br_build_dir):
-    return PkgBuildMonitor(pkg_builds_from_make(br_root_dir, br_build_dir))
+#
+# If `watch_stamps` is `True`, the monitor uses a stamp watcher when
+# inotify is available.
+def pkg_build_monitor_from_make(br_root_dir, br_build_dir, watch_stamps=False,
+                                use_cache=True, refresh_cache=False,
+                                transition_log=None):
+    pkg_builds = pkg_builds_from_make(br_root_dir, br_build_dir, use_cache,
+                                      refresh_cache)
+    stamp_watcher = None
+
+    if watch_stamps:
+        stamp_watcher = create_pkg_build_stamp_watcher(pkg_builds, br_build_dir)
+
+    return PkgBuildMonitor(pkg_builds, stamp_watcher, transition_log)
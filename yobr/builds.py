@@ -0,0 +1,246 @@
+# Copyright (c) 2020 Philippe Proulx <eepp.ca>
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# monitoring of several Buildroot builds from a single process
+
+import os
+import os.path
+import time
+import select
+import logging
+import yobr.br
+
+
+_logger = logging.getLogger(__name__)
+
+
+# a Buildroot build to monitor: the Buildroot root directory
+# `br_root_dir` and the build directory `br_build_dir`
+# (`BR-ROOT-DIR/output/build` if `None`)
+class Build:
+    def __init__(self, br_root_dir, br_build_dir=None, name=None):
+        if br_build_dir is None:
+            br_build_dir = os.path.join(br_root_dir, 'output', 'build')
+
+        self._br_root_dir = br_root_dir
+        self._br_build_dir = br_build_dir
+
+        if name is None:
+            name = _default_build_name(br_root_dir, br_build_dir)
+
+        self._name = name
+
+    # Buildroot root directory
+    @property
+    def br_root_dir(self):
+        return self._br_root_dir
+
+    # Buildroot build directory
+    @property
+    def br_build_dir(self):
+        return self._br_build_dir
+
+    # Buildroot output directory (parent of the build directory)
+    @property
+    def br_output_dir(self):
+        return yobr.br.br_output_dir(self._br_build_dir)
+
+    # short name to show
+    @property
+    def name(self):
+        return self._name
+
+
+# default name of the build of which the Buildroot root directory is
+# `br_root_dir` and the build directory is `br_build_dir`: the name of
+# its output directory, unless it's the default one
+def _default_build_name(br_root_dir, br_build_dir):
+    output_dir = yobr.br.br_output_dir(br_build_dir)
+
+    if yobr.br._explicit_br_output_dir(br_root_dir, output_dir) is None:
+        return os.path.basename(os.path.realpath(br_root_dir))
+
+    return os.path.basename(output_dir)
+
+
+# creates a build from the specification `spec`
+# (`BR-ROOT-DIR[:BR-BUILD-DIR]`)
+def build_from_spec(spec):
+    br_root_dir, sep, br_build_dir = spec.partition(':')
+
+    if br_root_dir == '' or (sep and br_build_dir == ''):
+        raise ValueError('Invalid build specification: `{}`'.format(spec))
+
+    if br_build_dir == '':
+        br_build_dir = None
+
+    return Build(br_root_dir, br_build_dir)
+
+
+# gives distinct names to the builds `builds` (list), appending a number
+# to the duplicate names, returning a new list of builds
+def with_unique_names(builds):
+    counts = {}
+
+    for build in builds:
+        counts[build.name] = counts.get(build.name, 0) + 1
+
+    indexes = {}
+    new_builds = []
+
+    for build in builds:
+        name = build.name
+
+        if counts[name] > 1:
+            indexes[name] = indexes.get(name, 0) + 1
+            name = '{}#{}'.format(name, indexes[name])
+
+        new_builds.append(Build(build.br_root_dir, build.br_build_dir, name))
+
+    return new_builds
+
+
+# loader of the package builds of several builds
+#
+# Builds of which the Buildroot configurations have the same
+# fingerprint (see `yobr.br.br_config_fingerprint()`), for example the
+# same Buildroot tree and defconfig within two output directories,
+# share their package information objects: the loader only gets them
+# once (`make show-info` or cache file).
+#
+# This is all or nothing: a package information object belongs to the
+# package graph of its configuration, so builds of which the
+# configurations differ don't share any, even for the packages which
+# they have in common. Only their strings are shared (see
+# `yobr.br._intern()`).
+class PkgBuildsLoader:
+    def __init__(self, use_cache=True, refresh_cache=False):
+        self._use_cache = use_cache
+        self._refresh_cache = refresh_cache
+
+        # `(real Buildroot root directory, fingerprint)` to package
+        # information objects (dictionary)
+        self._pkg_infos = {}
+
+    # creates a dictionary of package names to package build objects
+    # for the build `build`
+    def pkg_builds(self, build):
+        fingerprint = yobr.br.br_config_fingerprint(build.br_root_dir,
+                                                    build.br_output_dir)
+        key = (os.path.realpath(build.br_root_dir), fingerprint)
+        pkg_infos = self._pkg_infos.get(key)
+
+        if pkg_infos is None:
+            pkg_infos = yobr.br.pkg_infos_from_make(build.br_root_dir,
+                                                    self._use_cache,
+                                                    self._refresh_cache,
+                                                    build.br_output_dir,
+                                                    fingerprint)
+            self._pkg_infos[key] = pkg_infos
+        else:
+            _logger.info('Sharing the package information of `{}` with a previous build.'.format(build.br_build_dir))
+
+        return yobr.br.pkg_builds_from_pkg_infos(pkg_infos, build.br_build_dir)
+
+
+# scheduler of the updates of several package build monitors
+# (`yobr.br.PkgBuildMonitor` objects) with a single thread
+#
+# Each monitor gets a full update (polling) once per `interval` seconds,
+# but the scheduler spreads those over the interval (one monitor every
+# `interval / len(pkg_build_monitors)` seconds) instead of reading all
+# the build directories at once. A monitor also gets an update as soon
+# as its stamp watcher or step event source has something to read (see
+# `yobr.br.PkgBuildMonitor.waitables`).
+#
+# Call wait() and then update() in a loop.
+class PkgBuildMonitorScheduler:
+    def __init__(self, pkg_build_monitors, interval):
+        self._pkg_build_monitors = list(pkg_build_monitors)
+        self._tick_interval = interval / max(len(self._pkg_build_monitors), 1)
+        self._next_index = 0
+        self._next_tick_time = time.monotonic()
+
+        # monitors to update on the next update(): initially all of them
+        self._due_pkg_build_monitors = set(self._pkg_build_monitors)
+
+    # scheduled package build monitors (list)
+    @property
+    def pkg_build_monitors(self):
+        return self._pkg_build_monitors
+
+    # time between two scheduled updates (seconds)
+    @property
+    def tick_interval(self):
+        return self._tick_interval
+
+    # waits until at least one monitor is due for an update or until
+    # one of the files `files` (objects having a fileno() method) is
+    # readable, returning the list of the readable files of `files`
+    def wait(self, files=()):
+        if len(self._due_pkg_build_monitors) > 0:
+            return []
+
+        timeout = max(self._next_tick_time - time.monotonic(), 0.)
+        monitor_waitables = [(m, m.waitables) for m in self._pkg_build_monitors]
+        fds = list(files)
+
+        for _, waitables in monitor_waitables:
+            fds += waitables
+
+        if len(fds) == 0:
+            time.sleep(timeout)
+            return []
+
+        readable, _, _ = select.select(fds, [], [], timeout)
+        due_pkg_build_monitors = [m for m, waitables in monitor_waitables
+                                  if any(w in readable for w in waitables)]
+
+        if len(due_pkg_build_monitors) > 0:
+            # let a burst of stamp changes settle
+            time.sleep(.05)
+            self._due_pkg_build_monitors.update(due_pkg_build_monitors)
+
+        return [f for f in files if f in readable]
+
+    # updates the due monitors, returning a dictionary of package build
+    # monitors to sets of package builds of which the stage changed
+    def update(self):
+        now = time.monotonic()
+
+        if now >= self._next_tick_time and len(self._pkg_build_monitors) > 0:
+            self._due_pkg_build_monitors.add(self._pkg_build_monitors[self._next_index])
+            self._next_index = (self._next_index + 1) % len(self._pkg_build_monitors)
+            self._next_tick_time += self._tick_interval
+
+            if self._next_tick_time < now:
+                # too late (slow update or suspended process): don't
+                # catch up
+                self._next_tick_time = now + self._tick_interval
+
+        changes = {}
+
+        for monitor in self._pkg_build_monitors:
+            if monitor in self._due_pkg_build_monitors:
+                changes[monitor] = monitor.update()
+
+        self._due_pkg_build_monitors = set()
+        return changes
@@ -0,0 +1,717 @@
+# Copyright (c) 2020 Philippe Proulx <eepp.ca>
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# terminal build monitor (no Qt)
+
+import yobr
+import yobr.br
+import yobr.utils
+import yobr.timeline
+import yobr.analysis
+import yobr.history
+import yobr.metrics
+import yobr.builds
+import yobr.shared
+import yobr.colors
+import sys
+import os
+import os.path
+import tty
+import time
+import shutil
+import termios
+import logging
+import argparse
+import datetime
+
+
+# maximum number of output lines to show for a package build which
+# `make` failed to build
+_FAILED_OUTPUT_LINE_COUNT = 10
+
+# ANSI escape sequences
+_ANSI_RESET = '\033[0m'
+_ANSI_BOLD = '\033[1m'
+_ANSI_DIM = '\033[2m'
+_ANSI_HOME_CLEAR = '\033[H\033[2J'
+_ANSI_HIDE_CURSOR = '\033[?25l'
+_ANSI_SHOW_CURSOR = '\033[?25h'
+
+
+# ANSI escape sequence to set the foreground colour to `colour`
+# (`#rrggbb`)
+def _ansi_fg(colour):
+    r, g, b = (int(colour[i:i + 2], 16) for i in (1, 3, 5))
+    return '\033[38;2;{};{};{}m'.format(r, g, b)
+
+
+# renders the state of a package build monitor as text, with its
+# critical path (`yobr.analysis.PkgBuildCriticalPath`)
+#
+# If `eta` is set (`yobr.analysis.PkgBuildEta`), the renderer also
+# shows the estimate of the rest of the build.
+class _Renderer:
+    def __init__(self, pkg_build_monitor, use_ansi, critical_path, eta=None):
+        self._pkg_build_monitor = pkg_build_monitor
+        self._use_ansi = use_ansi
+        self._critical_path = critical_path
+        self._eta = eta
+
+        # number of installable package builds
+        self._installable_count = 0
+
+        for pkg_build in pkg_build_monitor.pkg_builds.values():
+            if pkg_build.info.is_installable:
+                self._installable_count += 1
+
+    def _style(self, text, *codes):
+        if not self._use_ansi:
+            return text
+
+        return ''.join(codes) + text + _ANSI_RESET
+
+    def _stage_text(self, stage, text=None):
+        if text is None:
+            text = stage.value
+
+        return self._style(text, _ansi_fg(yobr.colors.BUILD_STAGE_COLORS_BG[stage]))
+
+    # textual progress bar line
+    def _pbar_line(self, value, max_value, what, width, count_text=None):
+        if count_text is None:
+            count_text = '{}/{} packages'.format(value, max_value)
+
+        label = ' {} {}'.format(count_text, what)
+        bar_width = max(10, width - len(label) - 2)
+
+        if max_value > 0:
+            filled = bar_width * value // max_value
+        else:
+            filled = bar_width
+
+        return '[{}{}]{}'.format('#' * filled, '-' * (bar_width - filled), label)
+
+    # header lines with the title `title`
+    def header_lines(self, title):
+        now = datetime.datetime.now()
+        return [
+            self._style(title, _ANSI_BOLD) +
+            self._style(now.strftime('  (last update: %H:%M:%S)'), _ANSI_DIM),
+            '',
+        ]
+
+    # compact summary line of the monitor's state, starting with the
+    # name `name` (left-justified to `name_width` characters)
+    def summary_line(self, name, name_width, width):
+        monitor = self._pkg_build_monitor
+        prefix = '{}  '.format(name.ljust(name_width))
+        details = [
+            '{} installed'.format(monitor.installed_count),
+            '{} in progress'.format(len(monitor.in_progress_pkg_builds)),
+        ]
+
+        if self._eta is not None:
+            estimate = self._eta.estimate
+
+            if estimate is not None and estimate.end_time is not None:
+                remaining = estimate.remaining(time.time())
+                details.append('ETA: {}'.format(yobr.utils._format_duration(remaining)))
+
+        if monitor.failed_pkg_build is not None:
+            details.append('failed: {}'.format(monitor.failed_pkg_build.info.name))
+
+        count_text = '{}/{} built'.format(monitor.built_count,
+                                          len(monitor.pkg_builds))
+        return prefix + self._pbar_line(monitor.built_count,
+                                        len(monitor.pkg_builds),
+                                        '({})'.format(', '.join(details)),
+                                        width - len(prefix), count_text)
+
+    # list of lines which show the monitor's state (with a header if
+    # `with_header` is `True`)
+    def lines(self, height=None, with_header=True):
+        monitor = self._pkg_build_monitor
+        width = shutil.get_terminal_size().columns
+        now = datetime.datetime.now()
+        lines = []
+
+        if with_header:
+            title = 'yobr-cli: {} packages'.format(len(monitor.pkg_builds))
+            lines += self.header_lines(title)
+
+        # global progress
+        lines.append(self._pbar_line(monitor.built_count,
+                                     len(monitor.pkg_builds), 'built', width))
+        lines.append(self._pbar_line(monitor.installed_count,
+                                     self._installable_count, 'installed',
+                                     width))
+        estimate = None
+
+        if self._eta is not None:
+            estimate = self._eta.estimate
+
+        if estimate is not None and estimate.end_time is not None:
+            timestamp = now.timestamp()
+            progress = int(estimate.progress(timestamp) * 100)
+            end = datetime.datetime.fromtimestamp(estimate.end_time)
+            what = 'of the expected build time, ETA: {} ({})'.format(yobr.utils._format_duration(estimate.remaining(timestamp)),
+                                                                     end.strftime('%H:%M:%S'))
+            lines.append(self._pbar_line(progress, 100, what, width,
+                                         '{}%'.format(progress)))
+        lines.append('')
+
+        # counts per stage
+        counts = monitor.stage_counts
+        parts = []
+
+        for stage in yobr.br.PkgBuildStage:
+            parts.append(self._stage_text(stage, '{}: {}'.format(stage.value,
+                                                                 counts[stage])))
+
+        lines.append('  '.join(parts))
+
+        # critical path
+        critical_path_pkg_builds = self._critical_path.pkg_builds
+
+        if len(critical_path_pkg_builds) > 0:
+            names = ' > '.join(pb.info.name for pb in critical_path_pkg_builds)
+            length = yobr.utils._format_duration(self._critical_path.length)
+            lines.append('Critical path ({}): {}'.format(length, names))
+
+        # package build which `make` failed to build, with its last
+        # output lines (known with `yobr-make`)
+        failed_pkg_build = monitor.failed_pkg_build
+
+        if failed_pkg_build is not None:
+            lines.append('')
+            lines.append(self._style('`make` failed while building {}:'.format(failed_pkg_build.info.name),
+                                     _ANSI_BOLD, _ansi_fg(yobr.colors.FAILED_COLOR)))
+
+            for line in monitor.output(failed_pkg_build)[-_FAILED_OUTPUT_LINE_COUNT:]:
+                lines.append(self._style('  ' + line[:width - 2], _ANSI_DIM))
+
+        lines.append('')
+
+        # in progress package builds, including the ones which only
+        # started a step (known with `build-time.log`)
+        active_steps = monitor.active_steps
+        pkg_builds = monitor.in_progress_pkg_builds
+
+        if len(active_steps) > 0:
+            pkg_builds = sorted(set(pkg_builds) | set(active_steps),
+                                key=lambda pb: pb.info.id)
+
+        lines.append(self._style('In progress ({}):'.format(len(pkg_builds)),
+                                 _ANSI_BOLD))
+
+        if height is not None:
+            # keep what fits, with at least the "more" line
+            avail = max(height - len(lines) - 1, 1)
+
+            if len(pkg_builds) > avail:
+                hidden_count = len(pkg_builds) - avail + 1
+                pkg_builds = pkg_builds[:avail - 1]
+            else:
+                hidden_count = 0
+        else:
+            hidden_count = 0
+
+        name_width = max([len(pb.info.name) for pb in pkg_builds] + [0])
+
+        for pkg_build in pkg_builds:
+            info = pkg_build.info
+            stage = monitor.stage(pkg_build)
+            dep_count = len(info.dependencies)
+            built_dep_count = monitor.built_dependency_count(pkg_build)
+            line = '  {}  {}  {}/{} dependencies built'.format(info.name.ljust(name_width),
+                                                               self._stage_text(stage, stage.value.ljust(10)),
+                                                               built_dep_count,
+                                                               dep_count)
+            step = active_steps.get(pkg_build)
+
+            if step is not None:
+                duration = yobr.utils._format_duration(now.timestamp() - step.start_time)
+                line += '  ({} for {})'.format(step.name, duration)
+
+            lines.append(line)
+
+        if hidden_count > 0:
+            lines.append(self._style('  ({} more)'.format(hidden_count),
+                                     _ANSI_DIM))
+
+        return lines
+
+
+# prints an error message to the standard error
+def _perror(msg):
+    print('Error:', msg, file=sys.stderr)
+
+
+# parses the command-line arguments
+def _parse_args():
+    parser = argparse.ArgumentParser(prog='yobr-cli',
+                                     description='Terminal Buildroot build monitor')
+    parser.add_argument('br_root_dir', metavar='BR-ROOT-DIR', nargs='?',
+                        help='Buildroot root directory')
+    parser.add_argument('br_build_dir', metavar='BR-BUILD-DIR', nargs='?',
+                        help='Buildroot build directory (default: `BR-ROOT-DIR/output/build`)')
+    parser.add_argument('-b', '--build', metavar='BR-ROOT-DIR[:BR-BUILD-DIR]',
+                        action='append', default=[],
+                        help='Also monitor this build (repeatable; only yobr-cli monitors several builds)')
+    parser.add_argument('--log-level', metavar='LVL', default='WARNING',
+                        help='Log level')
+    parser.add_argument('--interval', metavar='SEC', type=float, default=2,
+                        help='Refresh interval (seconds; default: 2)')
+    parser.add_argument('--once', action='store_true',
+                        help='Print the current state once and exit')
+    parser.add_argument('--refresh-pkg-info', action='store_true',
+                        help='Run `make show-info` even if the package information is cached')
+    parser.add_argument('--no-pkg-info-cache', action='store_true',
+                        help='Do not read or write the package information cache')
+    parser.add_argument('--transition-log', metavar='PATH',
+                        help='Append the package build stage transitions to PATH (NDJSON)')
+    parser.add_argument('--no-history', action='store_true',
+                        help='Do not read or write the package build duration history')
+    parser.add_argument('-j', '--jobs', metavar='N', type=int, default=1,
+                        help='Number of packages which Buildroot builds in parallel (default: 1)')
+    parser.add_argument('--metrics', metavar='[HOST:]PORT',
+                        help='Serve OpenMetrics on HOST:PORT (default host: 127.0.0.1)')
+    parser.add_argument('--share-state', action='store_true',
+                        help='Share the build stages with the other yobr instances which monitor the same builds')
+    parser.add_argument('--build-time-log', action='store_true',
+                        help="Follow Buildroot's `build-time.log` instead of reading the stamp files on each update")
+    parser.add_argument('--listen', action='store_true',
+                        help='Receive the package build step events of `yobr-br-hook` instead of reading the stamp files on each update')
+    parser.add_argument('-v', '-V', '--version', action='version',
+                        version='%(prog)s {}'.format(yobr.__version__))
+    args = parser.parse_args()
+    builds = []
+
+    if args.br_root_dir is not None:
+        builds.append(yobr.builds.Build(args.br_root_dir, args.br_build_dir))
+
+    for spec in args.build:
+        try:
+            builds.append(yobr.builds.build_from_spec(spec))
+        except ValueError as exc:
+            parser.error(str(exc))
+
+    if len(builds) == 0:
+        parser.error('Missing build: specify BR-ROOT-DIR or `--build`')
+
+    if args.build_time_log and args.listen:
+        parser.error('`--build-time-log` and `--listen` are mutually exclusive')
+
+    if len(builds) > 1:
+        if args.transition_log is not None:
+            parser.error('`--transition-log` only works with a single build')
+
+        if args.metrics is not None:
+            parser.error('`--metrics` only works with a single build')
+
+    args.builds = yobr.builds.with_unique_names(builds)
+
+    if args.interval <= 0:
+        parser.error('Refresh interval must be positive')
+
+    if args.jobs < 1:
+        parser.error('Number of jobs must be positive')
+
+    return args
+
+
+# a monitored build (`yobr.builds.Build`) with its package build
+# monitor and analyses
+class _MonitoredBuild:
+    def __init__(self, build, pkg_build_monitor, use_ansi, history=None,
+                 jobs=1):
+        self._build = build
+        self._pkg_build_monitor = pkg_build_monitor
+        self._critical_path = yobr.analysis.PkgBuildCriticalPath(pkg_build_monitor)
+        self._duration_recorder = None
+        self._eta = None
+
+        if history is not None:
+            self._duration_recorder = yobr.history.PkgBuildDurationRecorder(pkg_build_monitor,
+                                                                            history)
+            expected_durations = history.expected_durations(pkg_build_monitor.graph.pkg_infos)
+            self._eta = yobr.analysis.PkgBuildEta(pkg_build_monitor,
+                                                  expected_durations, jobs)
+
+        self._renderer = _Renderer(pkg_build_monitor, use_ansi,
+                                   self._critical_path, self._eta)
+
+    @property
+    def build(self):
+        return self._build
+
+    @property
+    def pkg_build_monitor(self):
+        return self._pkg_build_monitor
+
+    @property
+    def critical_path(self):
+        return self._critical_path
+
+    @property
+    def renderer(self):
+        return self._renderer
+
+    # updates the analyses considering that the stages of the package
+    # builds `changed_pkg_builds` changed, returning the current build
+    # estimate, if any
+    def update(self, changed_pkg_builds):
+        if self._duration_recorder is not None:
+            self._duration_recorder.update(changed_pkg_builds)
+
+        self._critical_path.update(changed_pkg_builds)
+
+        if self._eta is not None:
+            return self._eta.update(changed_pkg_builds)
+
+
+# reader of single key presses from the terminal `file` (character
+# mode, no echo) until close()
+class _KeyReader:
+    def __init__(self, file):
+        self._fd = file.fileno()
+        self._attrs = termios.tcgetattr(self._fd)
+        tty.setcbreak(self._fd)
+
+    def fileno(self):
+        return self._fd
+
+    # available key presses (string)
+    def read(self):
+        return os.read(self._fd, 64).decode(errors='replace')
+
+    def close(self):
+        termios.tcsetattr(self._fd, termios.TCSADRAIN, self._attrs)
+
+
+# summary lines (header and one line per build) of the monitored
+# builds `monitored_builds` (list) when the index of the selected build
+# is `selected_index` (`None` if none)
+def _summary_lines(monitored_builds, selected_index):
+    width = shutil.get_terminal_size().columns
+    renderer = monitored_builds[0].renderer
+    title = 'yobr-cli: {} builds'.format(len(monitored_builds))
+    lines = renderer.header_lines(title)
+    name_width = max(len(mb.build.name) for mb in monitored_builds)
+
+    for index, monitored_build in enumerate(monitored_builds):
+        mark = '>' if index == selected_index else ' '
+        prefix = '{} {} '.format(mark, index + 1)
+        line = monitored_build.renderer.summary_line(monitored_build.build.name,
+                                                     name_width,
+                                                     width - len(prefix))
+
+        if index == selected_index:
+            line = renderer._style(line, _ANSI_BOLD)
+
+        lines.append(prefix + line)
+
+    return lines
+
+
+# detail lines of the monitored build `monitored_build`
+def _build_detail_lines(monitored_build, height=None):
+    build = monitored_build.build
+    renderer = monitored_build.renderer
+    lines = [
+        renderer._style('{} ({})'.format(build.name, build.br_build_dir),
+                        _ANSI_BOLD),
+        '',
+    ]
+
+    if height is not None:
+        height -= len(lines)
+
+    return lines + renderer.lines(height, False)
+
+
+# whole screen lines for the monitored builds `monitored_builds` (list)
+# when the index of the selected build is `selected_index` (`None` for
+# the summary only)
+def _multi_build_lines(monitored_builds, selected_index, height):
+    lines = _summary_lines(monitored_builds, selected_index)
+    lines.append('')
+
+    if selected_index is None:
+        hint = 'Press 1-{} to show the details of a build, Tab for the next one, 0 for the summary only, q to quit.'
+        lines.append(monitored_builds[0].renderer._style(hint.format(len(monitored_builds)),
+                                                         _ANSI_DIM))
+        return lines
+
+    return lines + _build_detail_lines(monitored_builds[selected_index],
+                                       height - len(lines))
+
+
+# new index of the selected build, out of `count` builds, after the key
+# presses `keys`, `selected_index` being the current one
+def _select_build(keys, selected_index, count):
+    for key in keys:
+        if key == '0':
+            selected_index = None
+        elif key.isdigit() and int(key) <= count:
+            selected_index = int(key) - 1
+        elif key == '\t':
+            if selected_index is None:
+                selected_index = 0
+            else:
+                selected_index = (selected_index + 1) % count
+
+    return selected_index
+
+
+def _run(args):
+    logging.basicConfig(level=getattr(logging, args.log_level.upper()),
+                        style='{',
+                        format='{asctime} [{name}] {{{levelname}}}: {message}')
+    builds = args.builds
+
+    for build in builds:
+        if not os.path.isdir(build.br_root_dir):
+            raise RuntimeError('`{}` is not a directory.'.format(build.br_root_dir))
+
+    is_tty = sys.stdout.isatty()
+    is_multi = len(builds) > 1
+    loader = yobr.builds.PkgBuildsLoader(not args.no_pkg_info_cache,
+                                         args.refresh_pkg_info)
+    transition_log = None
+    history = None
+    exporter = None
+    key_reader = None
+    monitored_builds = []
+
+    if args.transition_log is not None:
+        transition_log = yobr.timeline.PkgBuildStageTransitionLog(args.transition_log)
+
+    if not args.no_history:
+        history = yobr.history.PkgBuildDurationHistory()
+
+    try:
+        for build in builds:
+            if is_tty:
+                print('Getting package information from `{}`...'.format(build.br_root_dir))
+
+            pkg_builds = loader.pkg_builds(build)
+
+            if len(pkg_builds) == 0:
+                # weird
+                raise RuntimeError('No packages found in `{}`!'.format(build.br_root_dir))
+
+            step_event_source = None
+
+            if args.build_time_log:
+                path = yobr.br.build_time_log_path(build.br_build_dir)
+                step_event_source = yobr.br.BuildTimeLogTailer(path)
+            elif args.listen and not args.once:
+                path = yobr.br.step_event_socket_path(build.br_build_dir)
+                step_event_source = yobr.br.create_pkg_build_step_event_receiver(path)
+
+            stamp_watcher = None
+
+            # with pushed events, the stamp files are only a slow
+            # consistency check: don't watch them
+            if not args.once and not isinstance(step_event_source,
+                                                yobr.br.PkgBuildStepEventReceiver):
+                stamp_watcher = yobr.br.create_pkg_build_stamp_watcher(pkg_builds,
+                                                                       build.br_build_dir)
+
+            shared_state = None
+
+            if args.share_state and not args.once:
+                first_pkg_build = next(iter(pkg_builds.values()))
+                shared_state = yobr.shared.SharedPkgBuildState(yobr.shared.default_state_path(build.br_build_dir),
+                                                               first_pkg_build.info.graph)
+
+            monitor = yobr.br.PkgBuildMonitor(pkg_builds, stamp_watcher,
+                                              transition_log, shared_state,
+                                              step_event_source)
+            monitored_builds.append(_MonitoredBuild(build, monitor, is_tty,
+                                                    history, args.jobs))
+
+        monitored_builds_by_monitor = {mb.pkg_build_monitor: mb
+                                       for mb in monitored_builds}
+        scheduler = yobr.builds.PkgBuildMonitorScheduler(monitored_builds_by_monitor,
+                                                         args.interval)
+
+        if args.metrics is not None and not args.once:
+            exporter = yobr.metrics.MetricsExporter(monitored_builds[0].pkg_build_monitor,
+                                                    *yobr.metrics.parse_address(args.metrics))
+            exporter.start()
+
+        if is_tty and not args.once:
+            sys.stdout.write(_ANSI_HIDE_CURSOR)
+
+            if is_multi and sys.stdin.isatty():
+                key_reader = _KeyReader(sys.stdin)
+
+        _loop(args, scheduler, monitored_builds_by_monitor, monitored_builds,
+              exporter, key_reader, is_tty)
+    finally:
+        if is_tty and not args.once:
+            sys.stdout.write(_ANSI_SHOW_CURSOR + '\n')
+            sys.stdout.flush()
+
+        if key_reader is not None:
+            key_reader.close()
+
+        for monitored_build in monitored_builds:
+            monitor = monitored_build.pkg_build_monitor
+
+            if monitor.stamp_watcher is not None:
+                monitor.stamp_watcher.close()
+
+            if monitor.shared_state is not None:
+                monitor.shared_state.close()
+
+            if monitor.step_event_source is not None:
+                monitor.step_event_source.close()
+
+        if transition_log is not None:
+            transition_log.close()
+
+        if history is not None:
+            history.close()
+
+        if exporter is not None:
+            exporter.close()
+
+
+# update and print loop of _run()
+def _loop(args, scheduler, monitored_builds_by_monitor, monitored_builds,
+          exporter, key_reader, is_tty):
+    is_multi = len(monitored_builds) > 1
+    is_first = True
+
+    # monitors to the last printed failed package builds (not a
+    # terminal)
+    printed_failed_pkg_builds = {}
+    selected_index = None
+    key_files = []
+
+    if key_reader is not None:
+        key_files.append(key_reader)
+
+    while True:
+        changes = scheduler.update()
+
+        for monitor, changed_pkg_builds in changes.items():
+            monitored_build = monitored_builds_by_monitor[monitor]
+            estimate = monitored_build.update(changed_pkg_builds)
+
+            if exporter is not None:
+                exporter.update(changed_pkg_builds, estimate,
+                                monitored_build.critical_path)
+
+        if args.once:
+            if is_multi:
+                lines = _summary_lines(monitored_builds, None)
+
+                for monitored_build in monitored_builds:
+                    lines.append('')
+                    lines += _build_detail_lines(monitored_build)
+            else:
+                lines = monitored_builds[0].renderer.lines()
+
+            print('\n'.join(lines))
+            break
+
+        if is_tty:
+            # redraw the whole screen
+            height = shutil.get_terminal_size().lines
+
+            if is_multi:
+                lines = _multi_build_lines(monitored_builds, selected_index,
+                                           height)
+            else:
+                lines = monitored_builds[0].renderer.lines(height)
+
+            sys.stdout.write(_ANSI_HOME_CLEAR + '\n'.join(lines))
+            sys.stdout.flush()
+        else:
+            # not a terminal: one line per change
+            for monitor, changed_pkg_builds in changes.items():
+                failed_pkg_build = monitor.failed_pkg_build
+                is_new_failure = failed_pkg_build is not printed_failed_pkg_builds.get(monitor)
+                printed_failed_pkg_builds[monitor] = failed_pkg_build
+
+                if len(changed_pkg_builds) == 0 and not is_first and not is_new_failure:
+                    continue
+
+                prefix = ''
+
+                if is_multi:
+                    prefix = '{}: '.format(monitored_builds_by_monitor[monitor].build.name)
+
+                for pkg_build in sorted(changed_pkg_builds,
+                                        key=lambda pb: pb.info.name):
+                    print('{}{}: {}'.format(prefix, pkg_build.info.name,
+                                            monitor.stage(pkg_build).value))
+
+                if is_new_failure and failed_pkg_build is not None:
+                    print('{}{}: failed'.format(prefix,
+                                                failed_pkg_build.info.name))
+
+                print('{}{}/{} built, {} installed'.format(prefix,
+                                                           monitor.built_count,
+                                                           len(monitor.pkg_builds),
+                                                           monitor.installed_count),
+                      flush=True)
+
+        is_first = False
+
+        while True:
+            if key_reader in scheduler.wait(key_files):
+                keys = key_reader.read()
+
+                if 'q' in keys:
+                    return
+
+                new_index = _select_build(keys, selected_index,
+                                          len(monitored_builds))
+
+                if new_index != selected_index:
+                    # redraw now
+                    selected_index = new_index
+                    break
+
+                continue
+
+            break
+
+
+def main():
+    args = _parse_args()
+
+    try:
+        _run(args)
+    except KeyboardInterrupt:
+        pass
+    except Exception as exc:
+        _perror(str(exc))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+# Copyright (c) 2020 Philippe Proulx <eepp.ca>
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# colours of the user interfaces (no Qt: the command-line UI uses them
+# too)
+
+import yobr.br
+
+
+# build stage colours when used as background colours
+BUILD_STAGE_COLORS_BG = {
+    yobr.br.PkgBuildStage.UNKNOWN: '#bdc3c7',
+    yobr.br.PkgBuildStage.DOWNLOADED: '#b280c7',
+    yobr.br.PkgBuildStage.EXTRACTED: '#8e44ad',
+    yobr.br.PkgBuildStage.CONFIGURED: '#f1c40f',
+    yobr.br.PkgBuildStage.PATCHED: '#e67e22',
+    yobr.br.PkgBuildStage.BUILT: '#1abc9c',
+    yobr.br.PkgBuildStage.INSTALLED: '#2ecc71',
+}
+
+# build stage colours when used as foreground colours (slightly darker)
+BUILD_STAGE_COLORS_FG = {
+    yobr.br.PkgBuildStage.UNKNOWN: '#838e96',
+    yobr.br.PkgBuildStage.DOWNLOADED: '#914dae',
+    yobr.br.PkgBuildStage.EXTRACTED: '#8e44ad',
+    yobr.br.PkgBuildStage.CONFIGURED: '#c29d0b',
+    yobr.br.PkgBuildStage.PATCHED: '#a85913',
+    yobr.br.PkgBuildStage.BUILT: '#148f77',
+    yobr.br.PkgBuildStage.INSTALLED: '#17a351',
+}
+
+# colour of a package build which `make` failed to build
+FAILED_COLOR = '#e74c3c'
@@ -0,0 +1,441 @@
+# Copyright (c) 2020 Philippe Proulx <eepp.ca>
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# dialogs of the graphical UI (imported when first shown)
+
+import yobr
+import yobr.br
+import yobr.gui
+import yobr.colors
+import yobr.utils
+import yobr.timeline
+import math
+import datetime
+import PyQt5.QtWidgets as qtwidgets
+import PyQt5.QtCore as qtcore
+import PyQt5.QtGui as qtgui
+
+
+class _AutoAdjustDialog(qtwidgets.QDialog):
+    def showEvent(self, event):
+        res = super().showEvent(event)
+
+        # adjust this dialog's size to content
+        self.setFixedSize(self.sizeHint())
+        return res
+
+
+# the build stage legend dialog
+class BuildStageLegendDialog(_AutoAdjustDialog):
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.setWindowTitle('Build stage legend')
+        self.setModal(True)
+        self.setSizeGripEnabled(False)
+
+        # colors are easier to differentiate on a dark background
+        self.setStyleSheet('QDialog { background-color: #202020; }')
+        self._build_ui()
+
+    def _build_ui(self):
+        def add_label(stage):
+            lbl = qtwidgets.QLabel()
+            font = qtgui.QFont(yobr.gui._mono_font(True))
+            font.setPointSize(16)
+            lbl.setFont(font)
+            yobr.gui._set_build_stage_label(lbl, stage,
+                                            yobr.colors.BUILD_STAGE_COLORS_BG)
+            vbox.addWidget(lbl)
+
+        vbox = qtwidgets.QVBoxLayout()
+        add_label(yobr.br.PkgBuildStage.UNKNOWN)
+        add_label(yobr.br.PkgBuildStage.DOWNLOADED)
+        add_label(yobr.br.PkgBuildStage.EXTRACTED)
+        add_label(yobr.br.PkgBuildStage.PATCHED)
+        add_label(yobr.br.PkgBuildStage.CONFIGURED)
+        add_label(yobr.br.PkgBuildStage.BUILT)
+        add_label(yobr.br.PkgBuildStage.INSTALLED)
+        self.setLayout(vbox)
+
+
+# the about dialog
+class AboutDialog(_AutoAdjustDialog):
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.setWindowTitle('About yobr')
+        self.setModal(True)
+        self.setSizeGripEnabled(False)
+        self._build_ui()
+
+    def _build_ui(self):
+        hbox = qtwidgets.QHBoxLayout()
+        pixmap = yobr.gui._icon_pixmap().scaled(128, 128,
+                                                qtcore.Qt.IgnoreAspectRatio,
+                                                qtcore.Qt.SmoothTransformation)
+        lbl = qtwidgets.QLabel()
+        lbl.setPixmap(pixmap)
+        hbox.addWidget(lbl)
+        self.setLayout(hbox)
+        vbox = qtwidgets.QVBoxLayout()
+        lbl = qtwidgets.QLabel('YO Buildroot!')
+        font = lbl.font()
+        font.setPointSize(14)
+        font.setItalic(True)
+        font.setBold(True)
+        lbl.setFont(font)
+        vbox.addWidget(lbl)
+        lbl = qtwidgets.QLabel('v{}'.format(yobr.__version__))
+        lbl.setStyleSheet('color: rgba(0, 0, 0, .6); font-style: italic;')
+        vbox.addWidget(lbl)
+        vbox.addWidget(qtwidgets.QLabel())
+        lbl = qtwidgets.QLabel('<b>Author</b>: <a href="https://eepp.ca/">Philippe Proulx</a>')
+        vbox.addWidget(lbl)
+        lbl = qtwidgets.QLabel('<b>Icon</b>: <i>srip</i> from <a href="https://www.flaticon.com/">www.flaticon.com</a>')
+        vbox.addWidget(lbl)
+        lbl = qtwidgets.QLabel('<b>Website</b>: <a href="https://github.com/eepp/yobr">github.com/eepp/yobr</a>')
+        vbox.addWidget(lbl)
+        vbox.addStretch()
+        hbox.addSpacing(10)
+        hbox.addLayout(vbox)
+
+
+# the find package dialog
+class FindPkgBuildDialog(_AutoAdjustDialog):
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.setWindowTitle('Find package build')
+        self.setModal(True)
+        self.setSizeGripEnabled(False)
+        self._build_ui()
+
+    def _build_ui(self):
+        hbox = qtwidgets.QHBoxLayout()
+        hbox.addWidget(qtwidgets.QLabel('Find package build:'))
+        self._edit = qtwidgets.QLineEdit()
+        self._edit.setFont(yobr.gui._mono_font(True))
+        self._edit.setPlaceholderText('Globbing pattern')
+        self._edit.setFixedWidth(300)
+        self._edit.returnPressed.connect(self.accept)
+        hbox.addWidget(self._edit)
+        self.setLayout(hbox)
+
+    @property
+    def pattern(self):
+        return self._edit.text()
+
+
+# a table item which sorts on `key` instead of on its text
+class _SortKeyTableItem(qtwidgets.QTableWidgetItem):
+    def __init__(self, text, key):
+        super().__init__(text)
+        self._key = key
+
+    def __lt__(self, other):
+        return self._key < other._key
+
+
+# the slowest packages dialog: the step durations of the package builds
+# `pkg_builds` (see `yobr.br.PkgBuild.stage_duration()`), sortable
+class SlowestPkgBuildsDialog(qtwidgets.QDialog):
+    # build stages (the step which reaches each one) of the columns
+    _STAGES = (
+        yobr.br.PkgBuildStage.EXTRACTED,
+        yobr.br.PkgBuildStage.PATCHED,
+        yobr.br.PkgBuildStage.CONFIGURED,
+        yobr.br.PkgBuildStage.BUILT,
+        yobr.br.PkgBuildStage.INSTALLED,
+    )
+
+    def __init__(self, parent, pkg_builds):
+        super().__init__(parent)
+        self.setWindowTitle('Slowest packages')
+        self.setModal(True)
+        self._build_ui(pkg_builds)
+        self.resize(720, 480)
+
+    def _build_ui(self, pkg_builds):
+        def create_duration_item(duration):
+            if duration is None:
+                # unknown durations sort first (ascending order)
+                return _SortKeyTableItem('', -1)
+
+            item = _SortKeyTableItem(yobr.utils._format_duration(duration),
+                                     duration)
+            item.setTextAlignment(qtcore.Qt.AlignRight | qtcore.Qt.AlignVCenter)
+            return item
+
+        # rows: package builds with at least one known duration
+        rows = []
+
+        for pkg_build in pkg_builds:
+            durations = pkg_build.stage_durations
+
+            if len(durations) > 0:
+                rows.append((pkg_build, durations))
+
+        headers = ['Package']
+        headers += [stage.value.capitalize() for stage in self._STAGES]
+        headers.append('Total')
+        table = qtwidgets.QTableWidget(len(rows), len(headers))
+        table.setHorizontalHeaderLabels(headers)
+        table.setEditTriggers(qtwidgets.QAbstractItemView.NoEditTriggers)
+        table.setSelectionBehavior(qtwidgets.QAbstractItemView.SelectRows)
+        table.verticalHeader().setVisible(False)
+
+        for row, (pkg_build, durations) in enumerate(rows):
+            item = _SortKeyTableItem(pkg_build.info.name, pkg_build.info.name)
+            item.setFont(yobr.gui._mono_font(True))
+            table.setItem(row, 0, item)
+
+            for col, stage in enumerate(self._STAGES, 1):
+                table.setItem(row, col, create_duration_item(durations.get(stage)))
+
+            table.setItem(row, len(headers) - 1,
+                          create_duration_item(sum(durations.values())))
+
+        # slowest first
+        table.setSortingEnabled(True)
+        table.sortItems(len(headers) - 1, qtcore.Qt.DescendingOrder)
+        table.resizeColumnsToContents()
+        vbox = qtwidgets.QVBoxLayout()
+        lbl = qtwidgets.QLabel('Durations between consecutive stamp files; click a header to sort.')
+        vbox.addWidget(lbl)
+        vbox.addWidget(table)
+        self.setLayout(vbox)
+
+
+# the painted Gantt chart of a build timeline, with the concurrency
+# (number of package builds in progress) over time on top
+class _TimelineView(qtwidgets.QWidget):
+    def __init__(self):
+        super().__init__()
+        self._bars = []
+        self._steps = []
+        self._start_time = 0.
+        self._end_time = 1.
+
+        # geometry
+        self._name_width = 200
+        self._row_height = 14
+        self._chart_height = 80
+        self._spacing = 5
+        self.setMouseTracking(True)
+        self.setSizePolicy(qtwidgets.QSizePolicy.Ignored,
+                           qtwidgets.QSizePolicy.Fixed)
+
+    # sets the timeline bars (`yobr.timeline.PkgBuildTimelineBar`) and
+    # concurrency steps to show
+    def set_bars(self, bars, steps):
+        self._bars = bars
+        self._steps = steps
+
+        if len(bars) > 0:
+            self._start_time = min(bar.start_time for bar in bars)
+            self._end_time = max(max(bar.end_time for bar in bars),
+                                 self._start_time + 1)
+
+        self.setFixedHeight(self._bars_top() + len(bars) * self._row_height + self._spacing)
+        self.update()
+
+    def _bars_top(self):
+        return self._chart_height + 2 * self._spacing
+
+    # x position of the time `t`
+    def _x(self, t):
+        left = self._name_width + self._spacing
+        width = max(self.width() - left - self._spacing, 1)
+        return left + (t - self._start_time) * width / (self._end_time - self._start_time)
+
+    # bar at `pos`, or `None`
+    def _bar_at(self, pos):
+        index = (pos.y() - self._bars_top()) // self._row_height
+
+        if pos.y() < self._bars_top() or index >= len(self._bars):
+            return
+
+        return self._bars[index]
+
+    def _paint_chart(self, painter):
+        if len(self._steps) == 0:
+            return
+
+        max_count = max(count for _, count in self._steps)
+
+        if max_count == 0:
+            return
+
+        bottom = self._spacing + self._chart_height
+        unit = self._chart_height / max_count
+        path = qtgui.QPainterPath()
+        path.moveTo(self._x(self._steps[0][0]), bottom)
+        prev_y = bottom
+
+        for step_time, count in self._steps:
+            x = self._x(step_time)
+            y = bottom - count * unit
+            path.lineTo(x, prev_y)
+            path.lineTo(x, y)
+            prev_y = y
+
+        path.lineTo(self._x(self._end_time), prev_y)
+        path.lineTo(self._x(self._end_time), bottom)
+        path.closeSubpath()
+        painter.setPen(qtcore.Qt.NoPen)
+        painter.setBrush(qtgui.QColor('#3498db'))
+        painter.drawPath(path)
+
+        # horizontal lines for each count
+        painter.setPen(qtgui.QColor(0, 0, 0, 40))
+
+        for count in range(1, max_count + 1):
+            y = int(bottom - count * unit)
+            painter.drawLine(self._name_width + self._spacing, y,
+                             self.width() - self._spacing, y)
+
+        painter.setPen(qtgui.QColor(0, 0, 0, 200))
+        painter.drawText(qtcore.QRect(self._spacing, self._spacing,
+                                      self._name_width - self._spacing,
+                                      self._chart_height),
+                         qtcore.Qt.AlignRight | qtcore.Qt.AlignTop,
+                         'Concurrency (max. {})'.format(max_count))
+
+    def paintEvent(self, event):
+        painter = qtgui.QPainter(self)
+        rect = event.rect()
+        self._paint_chart(painter)
+
+        # only the rows which intersect the exposed rectangle
+        top = self._bars_top()
+        first = max(0, (rect.top() - top) // self._row_height)
+        last = min(len(self._bars) - 1, (rect.bottom() - top) // self._row_height)
+        painter.setFont(yobr.gui._mono_font())
+
+        for index in range(first, last + 1):
+            bar = self._bars[index]
+            y = top + index * self._row_height
+            painter.setPen(qtgui.QColor(0, 0, 0, 230))
+            painter.drawText(qtcore.QRect(self._spacing, y,
+                                          self._name_width - self._spacing,
+                                          self._row_height),
+                             qtcore.Qt.AlignRight | qtcore.Qt.AlignVCenter,
+                             bar.pkg_build.info.name)
+            painter.setPen(qtcore.Qt.NoPen)
+
+            for stage, start_time, end_time in bar.segments:
+                x = self._x(start_time)
+                width = max(self._x(end_time) - x, 1)
+                painter.setBrush(yobr.gui._BUILD_STAGE_BRUSHES_BG[stage])
+                painter.drawRect(qtcore.QRectF(x, y + 2, width,
+                                               self._row_height - 4))
+
+    def event(self, event):
+        if event.type() == qtcore.QEvent.ToolTip:
+            # tooltip: name and step durations
+            bar = self._bar_at(event.pos())
+
+            if bar is None:
+                qtwidgets.QToolTip.hideText()
+                event.ignore()
+                return True
+
+            lines = [bar.pkg_build.info.name]
+
+            for stage, start_time, end_time in bar.segments:
+                lines.append('{}: {}'.format(stage.value.capitalize(),
+                                             yobr.utils._format_duration(end_time - start_time)))
+
+            if not bar.is_done:
+                lines[-1] += ' (in progress)'
+
+            qtwidgets.QToolTip.showText(event.globalPos(), '\n'.join(lines),
+                                        self)
+            return True
+
+        return super().event(event)
+
+
+# the build timeline dialog: a Gantt chart of the package builds of the
+# package build monitor `pkg_build_monitor` (from extracted to done) and
+# the concurrency over time, updated with the monitor
+class TimelineDialog(qtwidgets.QDialog):
+    def __init__(self, parent, pkg_build_monitor):
+        super().__init__(parent)
+        self._pkg_build_monitor = pkg_build_monitor
+        self.setWindowTitle('Build timeline')
+        self.setModal(True)
+
+        # `True` if some package builds of the timeline are in progress
+        self._has_open_bars = False
+
+        self._build_ui()
+        self._update()
+        self._pkg_build_monitor.updated.connect(self._update)
+        self.resize(900, 600)
+
+    def _build_ui(self):
+        vbox = qtwidgets.QVBoxLayout()
+        self._stats_lbl = qtwidgets.QLabel()
+        self._stats_lbl.setWordWrap(True)
+        vbox.addWidget(self._stats_lbl)
+        self._view = _TimelineView()
+        scroll_area = qtwidgets.QScrollArea()
+        scroll_area.setWidgetResizable(True)
+        scroll_area.setWidget(self._view)
+        scroll_area.setHorizontalScrollBarPolicy(qtcore.Qt.ScrollBarAlwaysOff)
+        vbox.addWidget(scroll_area)
+        self.setLayout(vbox)
+
+    def _update(self, changed_pkg_builds=None):
+        if changed_pkg_builds is not None and len(changed_pkg_builds) == 0 and not self._has_open_bars:
+            # nothing changed and nothing in progress: don't move the
+            # end of the timeline at each tick
+            return
+
+        # otherwise, at each tick, the bars of the package builds in
+        # progress extend to now
+        bars = yobr.timeline.pkg_build_timeline_bars(self._pkg_build_monitor.pkg_builds.values())
+        self._has_open_bars = any(not bar.is_done for bar in bars)
+        steps = yobr.timeline.timeline_concurrency(bars)
+        self._view.set_bars(bars, steps)
+        max_count, average_count, durations = yobr.timeline.timeline_concurrency_stats(steps)
+
+        if len(bars) == 0:
+            self._stats_lbl.setText('No extracted packages yet.')
+            return
+
+        start = datetime.datetime.fromtimestamp(bars[0].start_time)
+        total_duration = sum(durations.values())
+        text = 'Since {}: {} packages, maximum concurrency: {}, average concurrency: {:.2f}'.format(start.strftime('%H:%M:%S'),
+                                                                                                 len(bars),
+                                                                                                 max_count,
+                                                                                                 average_count)
+
+        if total_duration > 0:
+            # part of the time with at most one package in progress:
+            # more jobs wouldn't help then
+            serial_ratio = (durations.get(0, 0.) + durations.get(1, 0.)) / total_duration
+            text += ', at most one package in progress {}% of the time'.format(math.floor(serial_ratio * 100))
+
+        self._stats_lbl.setText(text + '.')
+
+    def done(self, result):
+        self._pkg_build_monitor.updated.disconnect(self._update)
+        return super().done(result)
@@ -0,0 +1,1712 @@
+# Copyright (c) 2020 Philippe Proulx <eepp.ca>
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# graphical UI (Qt); `yobr.ui.main()` imports this module once the
+# command-line arguments are valid
+
+import yobr
+import yobr.br
+import yobr.utils
+import yobr.timeline
+import yobr.analysis
+import yobr.history
+import yobr.metrics
+import yobr.shared
+import yobr.colors
+import sys
+import math
+import logging
+import functools
+import datetime
+import signal
+import fnmatch
+import importlib.resources
+import PyQt5.QtWidgets as qtwidgets
+import PyQt5.QtCore as qtcore
+import PyQt5.QtGui as qtgui
+
+
+# common fonts, created on first use (after the application exists)
+_MONO_FONT_FAMILY = 'DejaVu Sans Mono, Bitstream Vera Sans Mono, monospace'
+_mono_fonts = {}
+
+
+# common monospace font (bold if `is_bold` is `True`)
+def _mono_font(is_bold=False):
+    font = _mono_fonts.get(is_bold)
+
+    if font is None:
+        font = qtgui.QFont(_MONO_FONT_FAMILY, 10)
+        font.setBold(is_bold)
+        _mono_fonts[is_bold] = font
+
+    return font
+
+
+# yobr's icon (`QPixmap`), from the package's data
+def _icon_pixmap():
+    try:
+        data = importlib.resources.files('yobr').joinpath('icon.png').read_bytes()
+    except AttributeError:
+        # Python < 3.9
+        data = importlib.resources.read_binary('yobr', 'icon.png')
+
+    pixmap = qtgui.QPixmap()
+    pixmap.loadFromData(data)
+    return pixmap
+
+
+# precomputed colours, brushes, and pens to paint package build states
+# (no style sheets to parse when painting)
+_BUILD_STAGE_QCOLORS_BG = {stage: qtgui.QColor(colour) for stage, colour in yobr.colors.BUILD_STAGE_COLORS_BG.items()}
+_BUILD_STAGE_BRUSHES_BG = {stage: qtgui.QBrush(colour) for stage, colour in _BUILD_STAGE_QCOLORS_BG.items()}
+_SELECTED_BG_BRUSH = qtgui.QBrush(qtgui.QColor(0, 0, 0, 242))
+_HOVERED_BG_BRUSH = qtgui.QBrush(qtgui.QColor('#fcfcfc'))
+_HOVERED_BORDER_PEN = qtgui.QPen(qtgui.QColor(0, 0, 0, 204))
+_NAME_COLOUR = qtgui.QColor(0, 0, 0, 230)
+_PBAR_FG_COLOUR = qtgui.QColor(0, 0, 0, 191)
+_PBAR_BG_COLOUR = qtgui.QColor(255, 255, 255, 230)
+_CRITICAL_PATH_BRUSH = qtgui.QBrush(qtgui.QColor('#c0392b'))
+
+
+# paints a package build state with `painter` within `rect`
+#
+# `name` is the package name, `stage` its build stage, `dep_progress`
+# a `(value, maximum)` pair for the dependency progress bar (`None` to
+# hide it), and `is_selected`, `is_hovered`, and `is_critical` (on the
+# critical path) the state of the item.
+def _paint_pkg_build_state(painter, rect, name, stage, dep_progress,
+                           is_selected, is_hovered, is_critical=False):
+    painter.save()
+    painter.setRenderHint(qtgui.QPainter.Antialiasing)
+
+    # background
+    if is_selected:
+        painter.setPen(qtcore.Qt.NoPen)
+        painter.setBrush(_SELECTED_BG_BRUSH)
+    elif is_hovered:
+        painter.setPen(_HOVERED_BORDER_PEN)
+        painter.setBrush(_HOVERED_BG_BRUSH)
+    else:
+        painter.setPen(qtcore.Qt.NoPen)
+        painter.setBrush(_BUILD_STAGE_BRUSHES_BG[stage])
+
+    painter.drawRoundedRect(qtcore.QRectF(rect).adjusted(.5, .5, -.5, -.5),
+                            2, 2)
+
+    # critical path marker (left stripe)
+    if is_critical:
+        painter.setPen(qtcore.Qt.NoPen)
+        painter.setBrush(_CRITICAL_PATH_BRUSH)
+        painter.drawRect(qtcore.QRect(rect.left(), rect.top(), 3,
+                                      rect.height()))
+
+    # progress bar (right)
+    text_right = rect.right() - 5
+
+    if dep_progress is not None:
+        fg_colour = _PBAR_FG_COLOUR
+        bg_colour = _PBAR_BG_COLOUR
+
+        if is_selected:
+            # this item's background colour is black
+            fg_colour, bg_colour = bg_colour, fg_colour
+
+        pbar_rect = qtcore.QRectF(rect.right() - 5 - 24,
+                                  rect.top() + (rect.height() - 8) / 2, 24, 8)
+        painter.setPen(fg_colour)
+        painter.setBrush(bg_colour)
+        painter.drawRoundedRect(pbar_rect.adjusted(.5, .5, -.5, -.5), 2, 2)
+        value, maximum = dep_progress
+
+        if maximum > 0 and value > 0:
+            chunk_rect = qtcore.QRectF(pbar_rect)
+            chunk_rect.setWidth(pbar_rect.width() * value / maximum)
+            painter.setPen(qtcore.Qt.NoPen)
+            painter.setBrush(fg_colour)
+            painter.drawRect(chunk_rect)
+
+        text_right = pbar_rect.left() - 5
+
+    # name
+    if is_selected:
+        # background is black: name has the build stage colour
+        painter.setPen(_BUILD_STAGE_QCOLORS_BG[stage])
+    else:
+        painter.setPen(_NAME_COLOUR)
+
+    painter.setFont(_mono_font(True))
+    text_rect = qtcore.QRect(rect.left() + 5, rect.top(),
+                             int(text_right) - rect.left() - 5, rect.height())
+    text = painter.fontMetrics().elidedText(name, qtcore.Qt.ElideRight,
+                                            text_rect.width())
+    painter.drawText(text_rect, qtcore.Qt.AlignLeft | qtcore.Qt.AlignVCenter,
+                     text)
+    painter.restore()
+
+
+# package build state (single widget)
+class _PkgBuildState(qtwidgets.QWidget):
+    def __init__(self, pkg_build, pkg_build_monitor):
+        super().__init__()
+        self._pkg_build = pkg_build
+        self._pkg_build_monitor = pkg_build_monitor
+        self._logger = yobr.utils._get_obj_logger(self, pkg_build.info.name)
+        self._logger.debug('Creating.')
+        self._is_selected = False
+        self._is_hovered = False
+        self._build_ui()
+
+    # the monitored package build object
+    @property
+    def pkg_build(self):
+        return self._pkg_build
+
+    # `True` if this package build state is selected
+    @property
+    def is_selected(self):
+        return self._is_selected
+
+    @is_selected.setter
+    def is_selected(self, is_selected):
+        self._logger.debug('Selected: {}.'.format(is_selected))
+        self._is_selected = is_selected
+        self.update()
+
+    def _build_ui(self):
+        # whole widget's tooltip: name and version (if any)
+        tooltip = self._pkg_build.info.name
+
+        if self._pkg_build.info.version is not None:
+            tooltip += ' {}'.format(self._pkg_build.info.version)
+
+        self.setToolTip(tooltip)
+
+        # horizontal size policy is to ignore so that this widget takes
+        # as much horizontal space as possible
+        self.setSizePolicy(qtwidgets.QSizePolicy.Ignored,
+                           qtwidgets.QSizePolicy.Fixed)
+        self.setFixedHeight(24)
+
+    # updates this package build state from the package build monitor;
+    # its owner calls this when the stage of this package build or of
+    # one of its dependencies changes
+    def refresh(self):
+        self._logger.debug('Refreshing.')
+        self.update()
+
+    def paintEvent(self, event):
+        monitor = self._pkg_build_monitor
+        dep_progress = None
+
+        if not monitor.is_built(self._pkg_build):
+            # `+ 1` because we count this package build as its own
+            # dependency so that, when all a package build's
+            # dependencies are built, its progress bar is not complete
+            dep_progress = (monitor.built_dependency_count(self._pkg_build),
+                            len(self._pkg_build.info.dependencies) + 1)
+
+        painter = qtgui.QPainter(self)
+        _paint_pkg_build_state(painter, self.rect(), self._pkg_build.info.name,
+                               monitor.stage(self._pkg_build), dep_progress,
+                               self._is_selected, self._is_hovered,
+                               monitor.is_critical(self._pkg_build))
+
+    def mouseReleaseEvent(self, event):
+        if event.button() == qtcore.Qt.LeftButton:
+            self._logger.debug('Clicked.')
+            self.clicked.emit()
+
+        return super().mouseReleaseEvent(event)
+
+    def enterEvent(self, event):
+        self._is_hovered = True
+        self.update()
+        return super().enterEvent(event)
+
+    def leaveEvent(self, event):
+        self._is_hovered = False
+        self.update()
+        return super().leaveEvent(event)
+
+    # any part of this widget is clicked
+    clicked = qtcore.pyqtSignal()
+
+
+# all the package build states
+#
+# This widget paints all the package build states itself, only painting
+# the ones within the exposed region, instead of having one widget per
+# package build: creating, positioning, and repainting the states cost
+# the same whatever the number of package builds.
+class _PkgBuildStateGrid(qtwidgets.QWidget):
+    def __init__(self, pkg_build_monitor):
+        super().__init__()
+        self._pkg_build_monitor = pkg_build_monitor
+        self._logger = yobr.utils._get_obj_logger(self)
+        self._logger.debug('Creating.')
+
+        # this seems reasonable for most Buildroot package names
+        self._min_item_width = 200
+
+        # fixed height of a package build state
+        self._item_height = 24
+
+        # spacing around and between the package build states
+        self._spacing = 5
+
+        # package builds in grid order (sorted by package name) and
+        # their grid index
+        self._pkg_builds = sorted(self._pkg_build_monitor.pkg_builds.values(),
+                                  key=lambda pb: pb.info.name)
+        self._pkg_build_indexes = {pb: i for i, pb in enumerate(self._pkg_builds)}
+
+        # start with no selected or hovered package build state
+        self._selected_index = None
+        self._hovered_index = None
+
+        # package builds on the critical path, as last painted
+        self._critical_pkg_builds = frozenset()
+
+        # computed by _layout()
+        self._items_per_row = 1
+        self._item_width = self._min_item_width
+
+        # we know this widget's height, but its width can change as
+        # desired
+        self.setSizePolicy(qtwidgets.QSizePolicy.Ignored,
+                           qtwidgets.QSizePolicy.Fixed)
+
+        # for hovering
+        self.setMouseTracking(True)
+
+        # only repaint what changed
+        self._pkg_build_monitor.updated.connect(self._update)
+
+    def _update(self, changed_pkg_builds):
+        pkg_builds = self._pkg_build_monitor.with_dependants(changed_pkg_builds)
+
+        # also the ones which joined or left the critical path
+        critical_pkg_builds = self._pkg_build_monitor.critical_pkg_builds
+        pkg_builds |= critical_pkg_builds ^ self._critical_pkg_builds
+        self._critical_pkg_builds = critical_pkg_builds
+
+        for pkg_build in pkg_builds:
+            self._update_item(self._pkg_build_indexes[pkg_build])
+
+    # schedules a repaint of the item at index `index`, if any
+    def _update_item(self, index):
+        if index is not None:
+            self.update(self._item_rect(index))
+
+    # a package build state is selected
+    pkg_build_selected = qtcore.pyqtSignal(object)
+
+    # no package build state is selected
+    no_pkg_build_selected = qtcore.pyqtSignal()
+
+    def _layout(self):
+        # content width: widget's width without padding
+        content_width = self.width() - 2 * self._spacing
+
+        # number of package build states per row
+        items_per_row = content_width // (self._min_item_width + self._spacing)
+
+        if items_per_row == 0:
+            # content width is less than the minimum width of an item:
+            # use a single item
+            items_per_row = 1
+
+        self._items_per_row = items_per_row
+
+        # number of rows
+        rows = math.ceil(len(self._pkg_builds) / items_per_row)
+
+        # now we know this widget's height
+        self.setFixedHeight(rows * (self._item_height + self._spacing) + self._spacing)
+
+        # a single package build state's width: remove spacing from
+        # content width and divide by number of items per row
+        self._item_width = (content_width - (items_per_row - 1) * self._spacing) // items_per_row
+
+    # rectangle of the item at index `index`
+    def _item_rect(self, index):
+        row, col = divmod(index, self._items_per_row)
+        x = self._spacing + col * (self._item_width + self._spacing)
+        y = self._spacing + row * (self._item_height + self._spacing)
+        return qtcore.QRect(x, y, self._item_width, self._item_height)
+
+    # index of the item at `pos`, or `None`
+    def _index_at(self, pos):
+        x = pos.x() - self._spacing
+        y = pos.y() - self._spacing
+
+        if x < 0 or y < 0:
+            return
+
+        col, col_offset = divmod(x, self._item_width + self._spacing)
+        row, row_offset = divmod(y, self._item_height + self._spacing)
+
+        if col >= self._items_per_row or col_offset >= self._item_width:
+            # right of the last column or within horizontal spacing
+            return
+
+        if row_offset >= self._item_height:
+            # within vertical spacing
+            return
+
+        index = row * self._items_per_row + col
+
+        if index >= len(self._pkg_builds):
+            return
+
+        return index
+
+    def _paint_item(self, painter, index):
+        pkg_build = self._pkg_builds[index]
+        monitor = self._pkg_build_monitor
+        dep_progress = None
+
+        if not monitor.is_built(pkg_build):
+            # `+ 1` because we count this package build as its own
+            # dependency so that, when all a package build's
+            # dependencies are built, its progress bar is not complete
+            dep_progress = (monitor.built_dependency_count(pkg_build),
+                            len(pkg_build.info.dependencies) + 1)
+
+        _paint_pkg_build_state(painter, self._item_rect(index),
+                               pkg_build.info.name, monitor.stage(pkg_build),
+                               dep_progress, index == self._selected_index,
+                               index == self._hovered_index,
+                               pkg_build in self._critical_pkg_builds)
+
+    def paintEvent(self, event):
+        painter = qtgui.QPainter(self)
+        rect = event.rect()
+        row_height = self._item_height + self._spacing
+
+        # only the rows which intersect the exposed rectangle
+        first_row = max(0, (rect.top() - self._spacing) // row_height)
+        last_row = (rect.bottom() - self._spacing) // row_height
+
+        for row in range(first_row, last_row + 1):
+            for col in range(self._items_per_row):
+                index = row * self._items_per_row + col
+
+                if index >= len(self._pkg_builds):
+                    return
+
+                if self._item_rect(index).intersects(rect):
+                    self._paint_item(painter, index)
+
+    def resizeEvent(self, event):
+        self._logger.debug('Resized: {}×{}'.format(self.width(), self.height()))
+        res = super().resizeEvent(event)
+
+        # recompute the grid geometry
+        self._layout()
+        return res
+
+    def _set_hovered_index(self, index):
+        if index == self._hovered_index:
+            return
+
+        self._update_item(self._hovered_index)
+        self._hovered_index = index
+        self._update_item(index)
+
+    def mouseMoveEvent(self, event):
+        self._set_hovered_index(self._index_at(event.pos()))
+        return super().mouseMoveEvent(event)
+
+    def leaveEvent(self, event):
+        self._set_hovered_index(None)
+        return super().leaveEvent(event)
+
+    def mouseReleaseEvent(self, event):
+        if event.button() == qtcore.Qt.LeftButton:
+            index = self._index_at(event.pos())
+
+            if index is not None:
+                self._item_clicked(index)
+
+        return super().mouseReleaseEvent(event)
+
+    def event(self, event):
+        if event.type() == qtcore.QEvent.ToolTip:
+            # tooltip: name and version (if any)
+            index = self._index_at(event.pos())
+
+            if index is None:
+                qtwidgets.QToolTip.hideText()
+                event.ignore()
+                return True
+
+            info = self._pkg_builds[index].info
+            tooltip = info.name
+
+            if info.version is not None:
+                tooltip += ' {}'.format(info.version)
+
+            qtwidgets.QToolTip.showText(event.globalPos(), tooltip, self,
+                                        self._item_rect(index))
+            return True
+
+        return super().event(event)
+
+    # the item at index `index` is clicked
+    def _item_clicked(self, index):
+        self._logger.debug('Clicked `{}`.'.format(self._pkg_builds[index].info.name))
+
+        if index == self._selected_index:
+            # selected one was clicked: do not select any other
+            self._selected_index = None
+            self._update_item(index)
+            self.no_pkg_build_selected.emit()
+            return
+
+        # select clicked package build
+        self.selected_pkg_build = self._pkg_builds[index]
+
+    # the currently selected package build, if any
+    @property
+    def selected_pkg_build(self):
+        if self._selected_index is None:
+            return
+
+        return self._pkg_builds[self._selected_index]
+
+    @selected_pkg_build.setter
+    def selected_pkg_build(self, pkg_build):
+        self._logger.debug('Selecting package build state `{}`.'.format(pkg_build.info.name))
+
+        # unselect previous one, if any, and select new one
+        self._update_item(self._selected_index)
+        self._selected_index = self._pkg_build_indexes[pkg_build]
+        self._update_item(self._selected_index)
+
+        # signal
+        self.pkg_build_selected.emit(pkg_build)
+
+    # rectangle of the package build state of `pkg_build`
+    def pkg_build_rect(self, pkg_build):
+        return self._item_rect(self._pkg_build_indexes[pkg_build])
+
+
+# build stage label palettes, created on demand, keyed on the colour
+_build_stage_palettes = {}
+
+
+# sets the text to and colour of a build stage label `lbl` for the
+# build stage `stage` using the colours `colours`
+def _set_build_stage_label(lbl, stage, colours=yobr.colors.BUILD_STAGE_COLORS_FG):
+    stage_colour = colours[stage]
+    palette = _build_stage_palettes.get(stage_colour)
+
+    if palette is None:
+        palette = qtgui.QPalette(lbl.palette())
+        palette.setColor(qtgui.QPalette.WindowText, qtgui.QColor(stage_colour))
+        _build_stage_palettes[stage_colour] = palette
+
+    lbl.setPalette(palette)
+    lbl.setText(stage.value.capitalize())
+
+
+# the details of a package build state
+class _PkgBuildStateDetails(qtwidgets.QWidget):
+    def __init__(self, pkg_build_monitor):
+        super().__init__()
+        self._pkg_build_monitor = pkg_build_monitor
+        self._logger = yobr.utils._get_obj_logger(self)
+        self._logger.debug('Creating.')
+        self._pkg_build_monitor.updated.connect(self._update)
+        self._pkg_build = None
+
+        # package build states of the dependencies and dependants
+        self._pkg_build_states = []
+
+        # output lines (tuple) and failure, as last shown
+        self._output = None
+        self._is_failed = None
+
+        # package builds on the critical path, as last painted
+        self._critical_pkg_builds = frozenset()
+        self._build_ui()
+
+    def _build_ui(self):
+        def create_mono_label(is_bold=False):
+            lbl = qtwidgets.QLabel()
+            lbl.setFont(_mono_font(is_bold))
+            return lbl
+
+        # main layout is a vertical box
+        vbox = qtwidgets.QVBoxLayout()
+
+        # package's name
+        self._name_lbl = create_mono_label(True)
+        font = self._name_lbl.font()
+        font.setPointSize(12)
+        self._name_lbl.setFont(font)
+        vbox.addWidget(self._name_lbl)
+        vbox.addSpacing(12)
+
+        def create_base_form(stage_lbl_attr, version_lbl_attr,
+                             is_virtual_lbl_attr):
+            form = qtwidgets.QFormLayout()
+            form.setContentsMargins(0, 0, 0, 0)
+            form.setVerticalSpacing(2)
+            form.setHorizontalSpacing(16)
+            lbl = create_mono_label(True)
+            setattr(self, stage_lbl_attr, lbl)
+            form.addRow('Build stage:', lbl)
+            lbl = create_mono_label()
+            setattr(self, version_lbl_attr, lbl)
+            form.addRow('Version:', lbl)
+            lbl = create_mono_label()
+            setattr(self, is_virtual_lbl_attr, lbl)
+            form.addRow('Virtual?', lbl)
+            return form
+
+        # textual information (target)
+        form = create_base_form('_target_stage_lbl', '_target_version_lbl',
+                                '_target_virtual_lbl')
+        self._install_target_lbl = create_mono_label()
+        form.addRow('Install (target)?', self._install_target_lbl)
+        self._install_staging_lbl = create_mono_label()
+        form.addRow('Install (staging)?', self._install_staging_lbl)
+        self._install_images_lbl = create_mono_label()
+        form.addRow('Install (images)?', self._install_images_lbl)
+        self._target_info = qtwidgets.QWidget()
+        self._target_info.setLayout(form)
+        vbox.addWidget(self._target_info)
+
+        # textual information (host)
+        form = create_base_form('_host_stage_lbl', '_host_version_lbl',
+                                '_host_virtual_lbl')
+        self._host_info = qtwidgets.QWidget()
+        self._host_info.setLayout(form)
+        vbox.addWidget(self._host_info)
+
+        # stage times and durations
+        vbox.addSpacing(12)
+        vbox.addWidget(qtwidgets.QLabel('Stage times:'))
+        form = qtwidgets.QFormLayout()
+        form.setContentsMargins(0, 0, 0, 0)
+        form.setVerticalSpacing(2)
+        form.setHorizontalSpacing(16)
+        self._stage_time_lbls = {}
+
+        for stage in list(yobr.br.PkgBuildStage)[1:]:
+            lbl = create_mono_label()
+            self._stage_time_lbls[stage] = lbl
+            form.addRow('{}:'.format(stage.value.capitalize()), lbl)
+
+        # only known with a step event source
+        self._active_step_lbl = create_mono_label()
+        form.addRow('Current step:', self._active_step_lbl)
+        vbox.addLayout(form)
+
+        # last output lines: only known with `yobr-make`
+        self._output_title_lbl = qtwidgets.QLabel()
+        self._output_edit = qtwidgets.QPlainTextEdit()
+        self._output_edit.setReadOnly(True)
+        self._output_edit.setFont(_mono_font())
+        self._output_edit.setLineWrapMode(qtwidgets.QPlainTextEdit.NoWrap)
+        self._output_widget = qtwidgets.QWidget()
+        output_vbox = qtwidgets.QVBoxLayout()
+        output_vbox.setContentsMargins(0, 12, 0, 0)
+        output_vbox.addWidget(self._output_title_lbl)
+        output_vbox.addWidget(self._output_edit)
+        self._output_widget.setLayout(output_vbox)
+        self._output_widget.setVisible(False)
+        vbox.addWidget(self._output_widget)
+
+        # dependencies and dependants are within their own vertical box
+        # (empty for the moment)
+        self._dependencies_vbox = qtwidgets.QVBoxLayout()
+        vbox.addLayout(self._dependencies_vbox)
+        self._dependants_vbox = qtwidgets.QVBoxLayout()
+        vbox.addLayout(self._dependants_vbox)
+
+        vbox.addStretch()
+
+        # set main vertical box as this widget's layout
+        self.setLayout(vbox)
+
+    # a dependency package build state is clicked
+    pkg_build_state_clicked = qtcore.pyqtSignal(object)
+
+    def _pkg_build_state_clicked(self):
+        self.pkg_build_state_clicked.emit(self.sender())
+
+    # resets package build states with vertical box `vbox`; clears the
+    # layout and creates new one for the items of `pkg_infos` (set)
+    def _reset_pkg_build_states(self, vbox, name, pkg_infos):
+        # get vertical box layout's current items
+        items = []
+
+        for i in range(vbox.count()):
+            items.append(vbox.itemAt(i))
+
+        # remove items
+        for item in items:
+            vbox.removeItem(item)
+
+            # we own `item` now: delete it later
+            if item.layout() is not None:
+                item.layout().deleteLater()
+
+            if item.widget() is not None:
+                item.widget().deleteLater()
+
+        if len(pkg_infos) == 0:
+            # nothing to show
+            return
+
+        # title
+        vbox.addSpacing(12)
+        text = '{} ({}):'.format(name, len(pkg_infos))
+        vbox.addWidget(qtwidgets.QLabel(text))
+
+        # create one package build state for each dependency (sorted by
+        # name)
+        for pkg_info in sorted(list(pkg_infos), key=lambda pi: pi.name):
+            pkg_build = self._pkg_build_monitor.pkg_builds[pkg_info.name]
+            pkg_build_state = _PkgBuildState(pkg_build, self._pkg_build_monitor)
+            pkg_build_state.clicked.connect(self._pkg_build_state_clicked)
+            vbox.addWidget(pkg_build_state)
+            self._pkg_build_states.append(pkg_build_state)
+
+    # package build which this widget explains
+    @property
+    def pkg_build(self):
+        return self._pkg_build
+
+    @pkg_build.setter
+    def pkg_build(self, pkg_build):
+        def update_bool_lbl(lbl, value):
+            if value:
+                text = 'Yes'
+            else:
+                text = 'No'
+
+            lbl.setText(text)
+
+        self._logger.debug('Updating details for `{}`.'.format(pkg_build.info.name))
+        self._pkg_build = pkg_build
+        info = self._pkg_build.info
+        self._name_lbl.setText(info.name)
+
+        if type(info) is yobr.br.TargetPkgInfo:
+            update_bool_lbl(self._install_target_lbl, info.install_target)
+            update_bool_lbl(self._install_staging_lbl, info.install_staging)
+            update_bool_lbl(self._install_images_lbl, info.install_images)
+            self._target_info.setVisible(True)
+            self._host_info.setVisible(False)
+            version_lbl = self._target_version_lbl
+            virtual_lbl = self._target_virtual_lbl
+        elif type(info) is yobr.br.HostPkgInfo:
+            self._host_info.setVisible(True)
+            self._target_info.setVisible(False)
+            version_lbl = self._host_version_lbl
+            virtual_lbl = self._host_virtual_lbl
+
+        if info.version is not None:
+            version = info.version
+        else:
+            version = '<i>N/A</i>'
+
+        version_lbl.setText(version)
+        update_bool_lbl(virtual_lbl, info.is_virtual)
+
+        # reset dependency and dependant package build states
+        self._pkg_build_states = []
+        self._reset_pkg_build_states(self._dependencies_vbox,
+                                     'Direct dependencies',
+                                     pkg_build.info.dependencies)
+        self._reset_pkg_build_states(self._dependants_vbox, 'Direct dependants',
+                                     pkg_build.info.dependants)
+
+        # update UI
+        self._output = None
+        self._update_stage()
+        self._update_output()
+
+    def _update(self, changed_pkg_builds):
+        if self._pkg_build is None:
+            # nothing to show
+            return
+
+        # a step can start and output can come without a stage change
+        self._update_active_step()
+        self._update_output()
+
+        if len(changed_pkg_builds) == 0:
+            # nothing changed
+            return
+
+        self._logger.debug('Updating.')
+        pkg_builds = self._pkg_build_monitor.with_dependants(changed_pkg_builds)
+        critical_pkg_builds = self._pkg_build_monitor.critical_pkg_builds
+        pkg_builds |= critical_pkg_builds ^ self._critical_pkg_builds
+        self._critical_pkg_builds = critical_pkg_builds
+
+        for pkg_build_state in self._pkg_build_states:
+            if pkg_build_state.pkg_build in pkg_builds:
+                pkg_build_state.refresh()
+
+        if self._pkg_build in changed_pkg_builds:
+            self._update_stage()
+
+    def _update_stage(self):
+        # update build stage
+        if type(self._pkg_build.info) is yobr.br.TargetPkgInfo:
+            stage_lbl = self._target_stage_lbl
+        elif type(self._pkg_build.info) is yobr.br.HostPkgInfo:
+            stage_lbl = self._host_stage_lbl
+
+        stage = self._pkg_build_monitor.stage(self._pkg_build)
+        _set_build_stage_label(stage_lbl, stage)
+
+        # update stage times: they change with the stage
+        for stage, lbl in self._stage_time_lbls.items():
+            stage_time = self._pkg_build.stage_time(stage)
+
+            if stage_time is None:
+                lbl.setText('<i>N/A</i>')
+                continue
+
+            text = datetime.datetime.fromtimestamp(stage_time).strftime('%H:%M:%S')
+            duration = self._pkg_build.stage_duration(stage)
+
+            if duration is not None:
+                text += ' ({})'.format(yobr.utils._format_duration(duration))
+
+            lbl.setText(text)
+
+        self._update_active_step()
+
+    def _update_active_step(self):
+        step = self._pkg_build_monitor.active_step(self._pkg_build)
+
+        if step is None:
+            self._active_step_lbl.setText('<i>N/A</i>')
+            return
+
+        start = datetime.datetime.fromtimestamp(step.start_time).strftime('%H:%M:%S')
+        self._active_step_lbl.setText('{} (since {})'.format(step.name, start))
+
+    def _update_output(self):
+        output = self._pkg_build_monitor.output(self._pkg_build)
+        is_failed = self._pkg_build_monitor.failed_pkg_build is self._pkg_build
+
+        if output is self._output and is_failed == self._is_failed:
+            # keep the scroll position
+            return
+
+        self._output = output
+        self._is_failed = is_failed
+        self._output_widget.setVisible(len(output) > 0)
+
+        if is_failed:
+            self._output_title_lbl.setText('Last output (<b><code>make</code> failed here</b>):')
+            self._output_title_lbl.setStyleSheet('color: #c0392b;')
+        else:
+            self._output_title_lbl.setText('Last output:')
+            self._output_title_lbl.setStyleSheet('')
+
+        self._output_edit.setPlainText('\n'.join(output))
+
+        # last lines first
+        scroll_bar = self._output_edit.verticalScrollBar()
+        scroll_bar.setValue(scroll_bar.maximum())
+
+
+# yobr's window
+#
+# The window initially shows a loading state: call
+# set_pkg_build_monitor() to show the package build states, or
+# show_error() to show why they're not available.
+class _YoBrWindow(qtwidgets.QMainWindow):
+    def __init__(self, app):
+        super().__init__()
+        self._app = app
+        self._pkg_build_monitor = None
+        self._logger = yobr.utils._get_obj_logger(self)
+        self._logger.debug('Creating.')
+        self._build_ui()
+
+    # sets the package build monitor to show, replacing the loading
+    # state
+    def set_pkg_build_monitor(self, pkg_build_monitor):
+        self._pkg_build_monitor = pkg_build_monitor
+        self._pkg_build_monitor.updated.connect(self._update)
+        self._build_ui_pkg_build_monitor()
+        self._refresh_action.setEnabled(True)
+        self._slowest_action.setEnabled(True)
+        self._timeline_action.setEnabled(True)
+        self._find_action.setEnabled(True)
+
+    # replaces the loading state with the error message `msg`
+    def show_error(self, msg):
+        self._msg_lbl.setText(msg)
+        self._msg_lbl.setStyleSheet('color: #c0392b;')
+        self._msg_lbl.setAlignment(qtcore.Qt.AlignLeft | qtcore.Qt.AlignTop)
+        self._msg_lbl.setFont(_mono_font())
+        self._status_bar.showMessage('Cannot get package information')
+
+    def _no_pkg_build_selected(self):
+        # no selected package build state: hide details pane
+        self._details_scroll_area.setVisible(False)
+
+    def _pkg_build_selected(self, pkg_build):
+        # selected package build state: show details pane to explain
+        # this package build state
+        self._details.pkg_build = pkg_build
+        self._details_scroll_area.setVisible(True)
+
+        # make sure it's visible within the grid
+        rect = self._pkg_build_state_grid.pkg_build_rect(pkg_build)
+        self._grid_scroll_area.ensureVisible(rect.center().x(),
+                                             rect.center().y(), 0,
+                                             rect.height())
+
+    def _build_ui_progress_bars(self):
+        def create_pbar(max, fmt):
+            pbar = qtwidgets.QProgressBar()
+            pbar.setRange(0, max)
+            pbar.setFormat(fmt)
+            pbar.setValue(0)
+            pbar.setFixedHeight(16)
+            pbar.setStyleSheet('font-size: 10px; font-weight: bold;')
+            return pbar
+
+        # built
+        self._built_pbar = create_pbar(len(self._pkg_build_monitor.pkg_builds),
+                                       '%v/%m packages built')
+
+        # installed
+        count = 0
+
+        for pkg_build in self._pkg_build_monitor.pkg_builds.values():
+            if pkg_build.info.is_installable:
+                count += 1
+
+        self._installed_pbar = create_pbar(count, '%v/%m packages installed')
+
+        # expected build time (per mille); hidden until there's an
+        # estimate
+        self._expected_pbar = create_pbar(1000, '%p% of the expected build time')
+        self._expected_pbar.setVisible(False)
+
+    def _set_icon(self):
+        self.setWindowIcon(qtgui.QIcon(_icon_pixmap()))
+
+    def _build_ui(self):
+        # set window's title from application name
+        self.setWindowTitle(self._app.applicationName())
+
+        # set icon
+        self._set_icon()
+
+        # build menu bar and status bar
+        self._build_ui_menu_bar()
+        self._build_ui_status_bar()
+
+        # loading state: a message label until we know the package
+        # builds
+        self._msg_lbl = qtwidgets.QLabel('Getting package information...')
+        self._msg_lbl.setAlignment(qtcore.Qt.AlignCenter)
+        self._msg_lbl.setTextInteractionFlags(qtcore.Qt.TextSelectableByMouse)
+        self._msg_lbl.setMargin(10)
+        self._msg_lbl.setWordWrap(True)
+        self.setCentralWidget(self._msg_lbl)
+        self._status_bar.showMessage('Loading')
+        self.resize(800, 600)
+
+    def _build_ui_pkg_build_monitor(self):
+        # main layout is a vertical box
+        main_layout = qtwidgets.QVBoxLayout()
+        w = qtwidgets.QWidget()
+        w.setLayout(main_layout)
+        self.setCentralWidget(w)
+        self._msg_lbl = None
+
+        # build progress (top) and package build state grid
+        self._build_ui_progress_bars()
+        main_layout.addWidget(self._built_pbar)
+        main_layout.addWidget(self._installed_pbar)
+        main_layout.addWidget(self._expected_pbar)
+        self._build_ui_pkg_build_state_grid()
+
+        # wrap the grid within a scroll area
+        self._grid_scroll_area = qtwidgets.QScrollArea()
+        self._grid_scroll_area.setWidgetResizable(True)
+        self._grid_scroll_area.setWidget(self._pkg_build_state_grid)
+        self._grid_scroll_area.setMinimumWidth(300)
+
+        # center of the window is the grid on the left and, possibly,
+        # the details on the right
+        hbox = qtwidgets.QHBoxLayout()
+        hbox.addWidget(self._grid_scroll_area)
+
+        # build the details pane and add to center horizontal box
+        self._build_ui_details()
+        hbox.addWidget(self._details_scroll_area)
+        main_layout.addLayout(hbox)
+
+    # refresh interval (ms) changed
+    refresh_interval_changed = qtcore.pyqtSignal(int)
+
+    def _emit_refresh_interval_changed(self, interval):
+        self.refresh_interval_changed.emit(interval)
+
+    def _build_ui_status_bar(self):
+        self._status_bar = qtwidgets.QStatusBar()
+        self.setStatusBar(self._status_bar)
+
+    def _build_ui_pkg_build_state_grid(self):
+        self._pkg_build_state_grid = _PkgBuildStateGrid(self._pkg_build_monitor)
+        self._pkg_build_state_grid.pkg_build_selected.connect(self._pkg_build_selected)
+        self._pkg_build_state_grid.no_pkg_build_selected.connect(self._no_pkg_build_selected)
+
+    def _build_ui_details(self):
+        def pkg_build_state_details_clicked(pkg_build_state):
+            # change globally selected package build state
+            self._pkg_build_state_grid.selected_pkg_build = pkg_build_state.pkg_build
+
+        self._details = _PkgBuildStateDetails(self._pkg_build_monitor)
+        self._details.pkg_build_state_clicked.connect(pkg_build_state_details_clicked)
+
+        # wrap into a scroll area
+        self._details_scroll_area = qtwidgets.QScrollArea()
+        self._details_scroll_area.setWidgetResizable(True)
+        self._details_scroll_area.setWidget(self._details)
+
+        # no horizontal scrollbar: too ugly
+        self._details_scroll_area.setHorizontalScrollBarPolicy(qtcore.Qt.ScrollBarAlwaysOff)
+
+        # this seems to be enough
+        self._details_scroll_area.setFixedWidth(300)
+
+        # initially invisible
+        self._details_scroll_area.setVisible(False)
+
+    def _build_ui_menu_bar(self):
+        def add_refresh_interval_action(name, interval):
+            action = menu.addAction('Refresh every {}'.format(name))
+            action.setCheckable(True)
+            refresh_interval_action_group.addAction(action)
+            action.triggered.connect(functools.partial(self._emit_refresh_interval_changed,
+                                                       interval))
+            return action
+
+        # dialogs are only imported when first shown
+        def show_legend_window(checked):
+            import yobr.dialogs
+
+            dlg = yobr.dialogs.BuildStageLegendDialog(self)
+            dlg.exec()
+
+        def show_about_window(checked):
+            import yobr.dialogs
+
+            dlg = yobr.dialogs.AboutDialog(self)
+            dlg.exec()
+
+        def show_slowest_pkg_builds_window(checked):
+            import yobr.dialogs
+
+            dlg = yobr.dialogs.SlowestPkgBuildsDialog(self,
+                                                      self._pkg_build_monitor.pkg_builds.values())
+            dlg.exec()
+
+        def show_timeline_window(checked):
+            import yobr.dialogs
+
+            dlg = yobr.dialogs.TimelineDialog(self, self._pkg_build_monitor)
+            dlg.exec()
+
+        def find_package(checked):
+            import yobr.dialogs
+
+            dlg = yobr.dialogs.FindPkgBuildDialog(self)
+
+            if dlg.exec() != qtwidgets.QDialog.Accepted:
+                return
+
+            pattern = dlg.pattern.strip()
+            self._logger.debug('Searching for package build `{}`.'.format(pattern))
+
+            for pkg_build in sorted(self._pkg_build_monitor.pkg_builds.values(),
+                                    key=lambda pb: pb.info.name):
+                if fnmatch.fnmatch(pkg_build.info.name, pattern):
+                    self._pkg_build_state_grid.selected_pkg_build = pkg_build
+                    break
+
+        # file menu
+        menu = self.menuBar().addMenu('&File')
+        action = menu.addAction('&Quit')
+        action.setShortcut(qtgui.QKeySequence.Quit)
+        action.triggered.connect(self._app.quit)
+
+        # state menu
+        menu = self.menuBar().addMenu('&State')
+        self._refresh_action = menu.addAction('&Refresh now')
+        self._refresh_action.setShortcut(qtgui.QKeySequence.Refresh)
+        self._refresh_action.setEnabled(False)
+        self._slowest_action = menu.addAction('&Slowest packages...')
+        self._slowest_action.triggered.connect(show_slowest_pkg_builds_window)
+        self._slowest_action.setEnabled(False)
+        self._timeline_action = menu.addAction('Build &timeline...')
+        self._timeline_action.triggered.connect(show_timeline_window)
+        self._timeline_action.setEnabled(False)
+        menu.addSeparator()
+        refresh_interval_action_group = qtwidgets.QActionGroup(self)
+        refresh_interval_action_group.setExclusive(True)
+        action = add_refresh_interval_action('500 ms', 500)
+        action = add_refresh_interval_action('second', 1000)
+        action = add_refresh_interval_action('two seconds', 2000)
+        action.setChecked(True) # default
+        action = add_refresh_interval_action('three seconds', 3000)
+        action = add_refresh_interval_action('five seconds', 5000)
+        action = add_refresh_interval_action('ten seconds', 10000)
+        action = add_refresh_interval_action('30 seconds', 30000)
+        action = add_refresh_interval_action('minute', 60000)
+
+        # find menu
+        menu = self.menuBar().addMenu('&Find')
+        self._find_action = menu.addAction('Find &package build...')
+        self._find_action.setShortcut(qtgui.QKeySequence.Find)
+        self._find_action.triggered.connect(find_package)
+        self._find_action.setEnabled(False)
+
+        # help menu
+        menu = self.menuBar().addMenu('&Help')
+        action = menu.addAction('Build stage &legend...')
+        action.triggered.connect(show_legend_window)
+        menu.addSeparator()
+        action = menu.addAction('&About yobr...')
+        action.triggered.connect(show_about_window)
+
+    # the "Refresh now" action
+    @property
+    def refresh_action(self):
+        return self._refresh_action
+
+    def _update(self, changed_pkg_builds):
+        self._logger.debug('Updating.')
+
+        # update status bar with the last refresh time
+        now = datetime.datetime.now()
+        status_text = now.strftime('Last update: %H:%M:%S')
+        estimate = self._pkg_build_monitor.estimate
+
+        if estimate is not None and estimate.end_time is not None:
+            # cheap: the estimate only changes with the stages
+            timestamp = now.timestamp()
+            remaining = estimate.remaining(timestamp)
+            end = datetime.datetime.fromtimestamp(estimate.end_time)
+            status_text += '    ETA: {} ({})'.format(yobr.utils._format_duration(remaining),
+                                                     end.strftime('%H:%M:%S'))
+            self._expected_pbar.setValue(int(estimate.progress(timestamp) * 1000))
+            self._expected_pbar.setVisible(True)
+
+        critical_path_pkg_builds = self._pkg_build_monitor.critical_path_pkg_builds
+
+        if len(critical_path_pkg_builds) > 0:
+            length = self._pkg_build_monitor.critical_path_length
+            status_text += '    Critical path: {} packages ({}), ending with {}'.format(len(critical_path_pkg_builds),
+                                                                                          yobr.utils._format_duration(length),
+                                                                                          critical_path_pkg_builds[-1].info.name)
+
+        failed_pkg_build = self._pkg_build_monitor.failed_pkg_build
+
+        if failed_pkg_build is not None:
+            status_text += '    `make` failed while building {}'.format(failed_pkg_build.info.name)
+
+        self._status_bar.showMessage(status_text)
+
+        if len(changed_pkg_builds) == 0:
+            # nothing changed
+            return
+
+        # update progress bar for built packages
+        self._built_pbar.setValue(self._pkg_build_monitor.built_count)
+
+        # update progress bar for installed packages
+        self._installed_pbar.setValue(self._pkg_build_monitor.installed_count)
+
+
+# snapshot of the state of a `yobr.br.PkgBuildMonitor` object, safe to
+# use from any thread
+class _PkgBuildMonitorSnapshot:
+    def __init__(self, stages, stage_counts, changed_pkg_builds,
+                 critical_path_pkg_builds=(), critical_path_length=0.,
+                 estimate=None, active_steps=None, outputs=None,
+                 failed_pkg_build=None):
+        if active_steps is None:
+            active_steps = {}
+
+        if outputs is None:
+            outputs = {}
+
+        self._stages = stages
+        self._active_steps = active_steps
+        self._outputs = outputs
+        self._failed_pkg_build = failed_pkg_build
+        self._estimate = estimate
+        self._stage_counts = stage_counts
+        self._changed_pkg_builds = changed_pkg_builds
+        self._critical_path_pkg_builds = critical_path_pkg_builds
+        self._critical_pkg_builds = frozenset(critical_path_pkg_builds)
+        self._critical_path_length = critical_path_length
+
+    # build stages (`yobr.br.PkgBuildStages`)
+    @property
+    def stages(self):
+        return self._stages
+
+    # build stage of the package build object `pkg_build`
+    def stage(self, pkg_build):
+        return self._stages.stage(pkg_build.info)
+
+    # active step (`yobr.br.PkgBuildStep`) of the package build object
+    # `pkg_build`, or `None` if unknown
+    def active_step(self, pkg_build):
+        return self._active_steps.get(pkg_build)
+
+    # last output lines (tuple) of the package build object `pkg_build`
+    def output(self, pkg_build):
+        return self._outputs.get(pkg_build, ())
+
+    # package build which `make` failed to build, or `None`
+    @property
+    def failed_pkg_build(self):
+        return self._failed_pkg_build
+
+    # number of package builds per stage (dictionary)
+    @property
+    def stage_counts(self):
+        return self._stage_counts
+
+    @property
+    def built_count(self):
+        return (self._stage_counts[yobr.br.PkgBuildStage.BUILT] +
+                self._stage_counts[yobr.br.PkgBuildStage.INSTALLED])
+
+    @property
+    def installed_count(self):
+        return self._stage_counts[yobr.br.PkgBuildStage.INSTALLED]
+
+    # package builds of which the stage changed since the previous
+    # snapshot
+    @property
+    def changed_pkg_builds(self):
+        return self._changed_pkg_builds
+
+    # package builds of the critical path, from the first to the last
+    # (tuple)
+    @property
+    def critical_path_pkg_builds(self):
+        return self._critical_path_pkg_builds
+
+    # package builds of the critical path (frozen set)
+    @property
+    def critical_pkg_builds(self):
+        return self._critical_pkg_builds
+
+    # duration (seconds) of the critical path
+    @property
+    def critical_path_length(self):
+        return self._critical_path_length
+
+    # estimate of the rest of the build (`yobr.analysis.BuildEstimate`),
+    # if any
+    @property
+    def estimate(self):
+        return self._estimate
+
+
+# updates a `yobr.br.PkgBuildMonitor` object within its own thread,
+# sending snapshots of its state with the `updated` signal
+#
+# If `history` is set (`yobr.history.PkgBuildDurationHistory`), the
+# worker records the durations of the package builds which are done and
+# estimates the rest of the build with `jobs` parallel jobs.
+#
+# If `metrics_exporter` is set (`yobr.metrics.MetricsExporter`), the
+# worker renders its metrics after each update.
+class _PkgBuildMonitorWorker(qtcore.QObject):
+    def __init__(self, br_pkg_build_monitor, history=None, jobs=1,
+                 metrics_exporter=None):
+        super().__init__()
+        self._logger = yobr.utils._get_obj_logger(self)
+        self._br_pkg_build_monitor = br_pkg_build_monitor
+        self._stages = br_pkg_build_monitor.stages
+        self._critical_path = yobr.analysis.PkgBuildCriticalPath(br_pkg_build_monitor)
+        self._critical_path_pkg_builds = ()
+        self._history = history
+        self._jobs = jobs
+        self._metrics_exporter = metrics_exporter
+        self._duration_recorder = None
+        self._eta = None
+
+        if history is not None:
+            self._duration_recorder = yobr.history.PkgBuildDurationRecorder(br_pkg_build_monitor,
+                                                                            history)
+
+    # creates the build estimator from the duration history (within
+    # the worker's thread)
+    def _create_eta(self):
+        monitor = self._br_pkg_build_monitor
+
+        try:
+            expected_durations = self._history.expected_durations(monitor.graph.pkg_infos)
+        except Exception as exc:
+            self._logger.error('Cannot read duration history: {}'.format(exc))
+            expected_durations = {}
+
+        self._logger.info('Expected durations of {} packages.'.format(len(expected_durations)))
+        self._eta = yobr.analysis.PkgBuildEta(monitor, expected_durations,
+                                              self._jobs)
+
+    # a snapshot (`_PkgBuildMonitorSnapshot`) of the updated monitor
+    updated = qtcore.pyqtSignal(object)
+
+    def _create_snapshot(self, changed_pkg_builds):
+        monitor = self._br_pkg_build_monitor
+
+        if len(changed_pkg_builds) > 0:
+            # new copy (cheap: an array of bytes); a previous snapshot
+            # could still be in use
+            self._stages = monitor.stages
+
+            # only the changed package builds and their dependants
+            if self._critical_path.update(changed_pkg_builds):
+                self._critical_path_pkg_builds = self._critical_path.pkg_builds
+
+        estimate = None
+
+        if self._history is not None:
+            if self._eta is None:
+                self._create_eta()
+
+            self._duration_recorder.update(changed_pkg_builds)
+            estimate = self._eta.update(changed_pkg_builds)
+
+        if self._metrics_exporter is not None:
+            self._metrics_exporter.update(changed_pkg_builds, estimate,
+                                          self._critical_path)
+
+        return _PkgBuildMonitorSnapshot(self._stages, monitor.stage_counts,
+                                        changed_pkg_builds,
+                                        self._critical_path_pkg_builds,
+                                        self._critical_path.length, estimate,
+                                        monitor.active_steps, monitor.outputs,
+                                        monitor.failed_pkg_build)
+
+    def update(self):
+        self._logger.debug('Updating.')
+
+        try:
+            changed_pkg_builds = self._br_pkg_build_monitor.update()
+        except Exception as exc:
+            # keep the previous state: next update could work
+            self._logger.error('Cannot update package build monitor: {}'.format(exc))
+            changed_pkg_builds = set()
+
+        self.updated.emit(self._create_snapshot(changed_pkg_builds))
+
+
+# `metrics_address`: `(host, port)` pair on which to serve OpenMetrics,
+# or `None`
+#
+# `shared_state` and `step_event_source`: see `yobr.br.PkgBuildMonitor`.
+class _PkgBuildMonitor(qtcore.QObject):
+    def __init__(self, pkg_builds, stamp_watcher=None, transition_log=None,
+                 history=None, jobs=1, metrics_address=None,
+                 shared_state=None, step_event_source=None):
+        super().__init__()
+        self._logger = yobr.utils._get_obj_logger(self)
+        self._logger.debug('Creating.')
+        br_pkg_build_monitor = yobr.br.PkgBuildMonitor(pkg_builds,
+                                                       stamp_watcher,
+                                                       transition_log,
+                                                       shared_state,
+                                                       step_event_source)
+        self._transition_log = transition_log
+        self._shared_state = shared_state
+        self._step_event_source = step_event_source
+        self._history = history
+        self._pkg_builds = br_pkg_build_monitor.pkg_builds
+        self._metrics_exporter = None
+
+        if metrics_address is not None:
+            try:
+                self._metrics_exporter = yobr.metrics.MetricsExporter(br_pkg_build_monitor,
+                                                                      *metrics_address)
+                self._metrics_exporter.start()
+            except OSError as exc:
+                self._logger.error('Cannot serve metrics: {}'.format(exc))
+
+        # initial snapshot: nothing is known yet
+        self._snapshot = _PkgBuildMonitorSnapshot(br_pkg_build_monitor.stages,
+                                                  br_pkg_build_monitor.stage_counts,
+                                                  set())
+
+        # `True` if the worker is currently updating
+        self._is_updating = False
+
+        # `True` if an update was requested while the worker was
+        # updating
+        self._is_update_pending = False
+
+        # the worker lives in its own thread so that reading the
+        # filesystem never blocks the UI; signals between this object
+        # and the worker are queued
+        self._thread = qtcore.QThread(self)
+        self._worker = _PkgBuildMonitorWorker(br_pkg_build_monitor, history,
+                                              jobs, self._metrics_exporter)
+        self._worker.moveToThread(self._thread)
+        self._update_requested.connect(self._worker.update)
+        self._worker.updated.connect(self._worker_updated)
+        self._thread.start()
+        self._notifiers = []
+
+        # update as soon as the stamp watcher or the step event source
+        # has events
+        for waitable in br_pkg_build_monitor.waitables:
+            notifier = qtcore.QSocketNotifier(waitable.fileno(),
+                                              qtcore.QSocketNotifier.Read,
+                                              self)
+            notifier.activated.connect(self._notifier_activated)
+            self._notifiers.append(notifier)
+
+    def _notifier_activated(self):
+        # the worker reads the events: stop being notified until it's
+        # done
+        self._logger.debug('Stamp watcher or step event source has events.')
+
+        for notifier in self._notifiers:
+            notifier.setEnabled(False)
+
+        self.update()
+
+    _update_requested = qtcore.pyqtSignal()
+
+    def _worker_updated(self, snapshot):
+        self._logger.debug('Worker updated.')
+        self._snapshot = snapshot
+        self._is_updating = False
+
+        for notifier in self._notifiers:
+            notifier.setEnabled(True)
+
+        self.updated.emit(snapshot.changed_pkg_builds)
+
+        if self._is_update_pending:
+            # coalesced update requests
+            self._is_update_pending = False
+            self.update()
+
+    # stops the worker thread
+    def stop(self):
+        self._thread.quit()
+        self._thread.wait()
+
+        if self._transition_log is not None:
+            self._transition_log.close()
+
+        if self._history is not None:
+            self._history.close()
+
+        if self._metrics_exporter is not None:
+            self._metrics_exporter.close()
+
+        if self._shared_state is not None:
+            self._shared_state.close()
+
+        if self._step_event_source is not None:
+            self._step_event_source.close()
+
+    @property
+    def pkg_builds(self):
+        return self._pkg_builds
+
+    # set of the package builds `pkg_builds` and of all their direct
+    # dependants (the package builds to refresh when the stages of
+    # `pkg_builds` change)
+    def with_dependants(self, pkg_builds):
+        res = set(pkg_builds)
+
+        for pkg_build in pkg_builds:
+            for pkg_info in pkg_build.info.dependants:
+                res.add(self._pkg_builds[pkg_info.name])
+
+        return res
+
+    def stage(self, pkg_build):
+        return self._snapshot.stage(pkg_build)
+
+    # active step (`yobr.br.PkgBuildStep`) of `pkg_build`, or `None`
+    def active_step(self, pkg_build):
+        return self._snapshot.active_step(pkg_build)
+
+    # last output lines (tuple) of `pkg_build` (only with `yobr-make`)
+    def output(self, pkg_build):
+        return self._snapshot.output(pkg_build)
+
+    # package build which `make` failed to build, or `None` (only with
+    # `yobr-make`)
+    @property
+    def failed_pkg_build(self):
+        return self._snapshot.failed_pkg_build
+
+    # number of built (or installed) direct dependencies of `pkg_build`
+    def built_dependency_count(self, pkg_build):
+        return self._snapshot.stages.built_dependency_count(pkg_build.info)
+
+    def is_built(self, pkg_build):
+        return self._snapshot.stages.is_built(pkg_build.info)
+
+    # `True` if `pkg_build` is on the critical path
+    def is_critical(self, pkg_build):
+        return pkg_build in self._snapshot.critical_pkg_builds
+
+    # package builds of the critical path, from the first to the last
+    # (tuple)
+    @property
+    def critical_path_pkg_builds(self):
+        return self._snapshot.critical_path_pkg_builds
+
+    # package builds of the critical path (frozen set)
+    @property
+    def critical_pkg_builds(self):
+        return self._snapshot.critical_pkg_builds
+
+    # duration (seconds) of the critical path
+    @property
+    def critical_path_length(self):
+        return self._snapshot.critical_path_length
+
+    # estimate of the rest of the build (`yobr.analysis.BuildEstimate`),
+    # if any
+    @property
+    def estimate(self):
+        return self._snapshot.estimate
+
+    # set of the package builds of which the stage changed
+    updated = qtcore.pyqtSignal(object)
+
+    # requests an update; `updated` is emitted when it's done
+    #
+    # If the worker is already updating, this method doesn't queue
+    # another update, but makes sure that a single update follows.
+    def update(self):
+        if self._is_updating:
+            self._logger.debug('Already updating: update pending.')
+            self._is_update_pending = True
+            return
+
+        self._logger.debug('Requesting update.')
+        self._is_updating = True
+        self._update_requested.emit()
+
+    # number of package builds per stage (dictionary)
+    @property
+    def stage_counts(self):
+        return self._snapshot.stage_counts
+
+    @property
+    def built_count(self):
+        return self._snapshot.built_count
+
+    @property
+    def installed_count(self):
+        return self._snapshot.installed_count
+
+
+# gets the package builds of a Buildroot tree within its own thread
+#
+# Emits `loaded` with the dictionary of package names to package builds,
+# or `failed` with an error message.
+class _PkgBuildsLoader(qtcore.QThread):
+    def __init__(self, args):
+        super().__init__()
+        self._args = args
+        self._logger = yobr.utils._get_obj_logger(self)
+        self._canceller = yobr.br.MakeCanceller()
+
+    loaded = qtcore.pyqtSignal(object)
+    failed = qtcore.pyqtSignal(str)
+
+    # terminates `make`, if it's running: call wait() afterwards
+    def cancel(self):
+        self._canceller.cancel()
+
+    def run(self):
+        args = self._args
+        self._logger.info('Getting package information from `{}`.'.format(args.br_root_dir))
+
+        try:
+            pkg_builds = yobr.br.pkg_builds_from_make(args.br_root_dir,
+                                                      args.br_build_dir,
+                                                      args.use_pkg_info_cache,
+                                                      args.refresh_pkg_info_cache,
+                                                      self._canceller)
+        except Exception as exc:
+            if self._canceller.is_cancelled:
+                self._logger.info('Cancelled.')
+                return
+
+            self._logger.error('Cannot get package information: {}'.format(exc))
+            self.failed.emit(str(exc))
+            return
+
+        if len(pkg_builds) == 0:
+            # weird
+            self.failed.emit('No packages found!')
+            return
+
+        self.loaded.emit(pkg_builds)
+
+
+def _setup_signals():
+    def handler(signum, frame):
+        qtcore.QCoreApplication.quit()
+
+    signal.signal(signal.SIGINT, handler)
+
+
+# runs the graphical UI with the arguments `args` (`yobr.ui._Args`),
+# returning the application's exit code
+def run(args):
+    # refresh timer timeout
+    def refresh_timer_timeout():
+        logger.info('Updating package build monitor.')
+        pkg_build_monitor.update()
+
+    # package builds are loaded
+    def pkg_builds_loaded(pkg_builds):
+        nonlocal pkg_build_monitor
+
+        step_event_source = None
+
+        if args.use_build_time_log:
+            path = yobr.br.build_time_log_path(args.br_build_dir)
+            logger.info('Following `{}`.'.format(path))
+            step_event_source = yobr.br.BuildTimeLogTailer(path)
+        elif args.listen:
+            path = yobr.br.step_event_socket_path(args.br_build_dir)
+            logger.info('Listening on `{}`.'.format(path))
+            step_event_source = yobr.br.create_pkg_build_step_event_receiver(path)
+
+        stamp_watcher = None
+
+        # watch stamps with inotify when possible: the refresh timer
+        # then only polls what cannot be watched (with pushed events,
+        # the stamp files are only a slow consistency check)
+        if not isinstance(step_event_source,
+                          yobr.br.PkgBuildStepEventReceiver):
+            stamp_watcher = yobr.br.create_pkg_build_stamp_watcher(pkg_builds,
+                                                                   args.br_build_dir)
+        transition_log = None
+
+        if args.transition_log_path is not None:
+            logger.info('Writing stage transitions to `{}`.'.format(args.transition_log_path))
+            transition_log = yobr.timeline.PkgBuildStageTransitionLog(args.transition_log_path)
+
+        history = None
+
+        if args.use_history:
+            history = yobr.history.PkgBuildDurationHistory()
+            logger.info('Using duration history `{}`.'.format(history.path))
+
+        shared_state = None
+
+        if args.share_state and len(pkg_builds) > 0:
+            path = yobr.shared.default_state_path(args.br_build_dir)
+            logger.info('Sharing build stages through `{}`.'.format(path))
+            graph = next(iter(pkg_builds.values())).info.graph
+            shared_state = yobr.shared.SharedPkgBuildState(path, graph)
+
+        pkg_build_monitor = _PkgBuildMonitor(pkg_builds, stamp_watcher,
+                                             transition_log, history,
+                                             args.jobs, args.metrics_address,
+                                             shared_state, step_event_source)
+        logger.info('Watching {} packages:'.format(len(pkg_build_monitor.pkg_builds)))
+
+        for pkg_build in sorted(pkg_build_monitor.pkg_builds.values(), key=lambda pb: pb.build_dir):
+            logger.info('  `{}` ({} dependencies)'.format(pkg_build.build_dir,
+                                                          len(pkg_build.info.dependencies)))
+
+        # show package build states
+        w.set_pkg_build_monitor(pkg_build_monitor)
+
+        # connect "Refresh now" action
+        w.refresh_action.triggered.connect(refresh_timer_timeout)
+
+        # connect interval change signal and start timer
+        w.refresh_interval_changed.connect(timer.setInterval)
+        timer.start()
+
+        # stop the monitor's worker thread when quitting
+        app.aboutToQuit.connect(pkg_build_monitor.stop)
+
+        # initial update
+        pkg_build_monitor.update()
+
+    pkg_build_monitor = None
+    logger = logging.getLogger('main')
+
+    # create application (with the Qt options of the command line)
+    app = qtwidgets.QApplication([sys.argv[0]] + args.qt_args)
+    app.setApplicationName('YO Buildroot!')
+    app.setApplicationVersion(yobr.__version__)
+
+    # setup signals
+    _setup_signals()
+
+    # create and show window immediately: it shows a loading state
+    # until the package information is available
+    logger.info('Starting UI.')
+    w = _YoBrWindow(app)
+    w.show()
+
+    # create refresh timer: initial interval is 2 s
+    timer = qtcore.QTimer(app)
+    timer.setInterval(2000)
+    timer.timeout.connect(refresh_timer_timeout)
+
+    # query Buildroot for package information in the background
+    loader = _PkgBuildsLoader(args)
+    loader.loaded.connect(pkg_builds_loaded)
+    loader.failed.connect(w.show_error)
+    loader.start()
+
+    # we're done
+    res = app.exec_()
+
+    # `make` could still be running: don't wait for it
+    loader.cancel()
+    loader.wait()
+    return res
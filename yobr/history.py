@@ -0,0 +1,274 @@
+# Copyright (c) 2020 Philippe Proulx <eepp.ca>
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# package build duration history (SQLite database)
+#
+# The history keeps, for each package name and version, the work
+# durations (see `yobr.analysis.pkg_build_work_duration()`) of its last
+# builds, identified by when they were done, so that recording the same
+# build twice (for example, when starting yobr again) has no effect.
+#
+# The done time of the same build can differ slightly depending on where
+# it comes from (a step event or a stamp file): done times which are at
+# most `_DONE_TIME_TOLERANCE` seconds apart are the same build.
+
+import os
+import os.path
+import sqlite3
+import logging
+import statistics
+import yobr.br
+import yobr.analysis
+
+
+_logger = logging.getLogger(__name__)
+
+# number of builds to keep per package name and version
+_MAX_BUILD_COUNT = 10
+
+# maximum difference (seconds) between two done times of the same build
+_DONE_TIME_TOLERANCE = 5
+
+# number of last builds from which to compute an expected duration
+_EXPECTED_BUILD_COUNT = 5
+
+
+# default path of the duration history database
+def default_history_path():
+    base_dir = os.environ.get('XDG_DATA_HOME')
+
+    if not base_dir:
+        base_dir = os.path.join(os.path.expanduser('~'), '.local', 'share')
+
+    return os.path.join(base_dir, 'yobr', 'durations.sqlite3')
+
+
+# package build duration history at `path`
+#
+# The database connection is opened on first use. A history object is
+# not thread-safe: use it from one thread at a time.
+#
+# The methods never raise because of the database: on error, they log a
+# warning and the history behaves as an empty one which records
+# nothing.
+class PkgBuildDurationHistory:
+    def __init__(self, path=None):
+        if path is None:
+            path = default_history_path()
+
+        self._path = path
+        self._conn = None
+
+        # `False` once the database cannot be opened
+        self._is_available = True
+
+    @property
+    def path(self):
+        return self._path
+
+    # `False` if the database cannot be opened
+    @property
+    def is_available(self):
+        return self._is_available
+
+    def _open(self):
+        dir_path = os.path.dirname(self._path)
+
+        if dir_path:
+            os.makedirs(dir_path, exist_ok=True)
+
+        conn = sqlite3.connect(self._path, check_same_thread=False)
+
+        try:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS durations (
+                    name TEXT NOT NULL,
+                    version TEXT NOT NULL,
+                    done_time REAL NOT NULL,
+                    duration REAL NOT NULL,
+                    PRIMARY KEY (name, version, done_time)
+                )
+            ''')
+            conn.commit()
+        except sqlite3.Error:
+            conn.close()
+            raise
+
+        return conn
+
+    # database connection, or `None` if the database cannot be opened
+    def _get_conn(self):
+        if self._conn is None and self._is_available:
+            try:
+                self._conn = self._open()
+            except (OSError, sqlite3.Error) as exc:
+                _logger.warning('Cannot open duration history `{}` ({}): continuing without it.'.format(self._path,
+                                                                                                       exc))
+                self._is_available = False
+
+        return self._conn
+
+    # records that the package `name` (version `version`, `None` if
+    # none) was done at `done_time` (seconds since the Epoch) and took
+    # `duration` seconds
+    def record(self, name, version, done_time, duration):
+        self.record_many([(name, version, done_time, duration)])
+
+    # records many builds at once (iterable of `(name, version,
+    # done_time, duration)` tuples; see record())
+    def record_many(self, builds):
+        conn = self._get_conn()
+
+        if conn is None:
+            return
+
+        try:
+            self._record_many(conn, builds)
+        except (OSError, sqlite3.Error) as exc:
+            # keep monitoring anyway
+            _logger.warning('Cannot record package build durations: {}'.format(exc))
+
+    def _record_many(self, conn, builds):
+        with conn:
+            for name, version, done_time, duration in builds:
+                version = version or ''
+                row = conn.execute('''
+                    SELECT 1 FROM durations
+                    WHERE name = ? AND version = ? AND done_time BETWEEN ? AND ?
+                ''', (name, version, done_time - _DONE_TIME_TOLERANCE,
+                      done_time + _DONE_TIME_TOLERANCE)).fetchone()
+
+                if row is not None:
+                    # already recorded
+                    continue
+
+                conn.execute('INSERT INTO durations VALUES (?, ?, ?, ?)',
+                             (name, version, done_time, duration))
+
+                # forget the oldest builds
+                conn.execute('''
+                    DELETE FROM durations
+                    WHERE name = ? AND version = ? AND done_time NOT IN (
+                        SELECT done_time FROM durations
+                        WHERE name = ? AND version = ?
+                        ORDER BY done_time DESC LIMIT ?
+                    )
+                ''', (name, version, name, version, _MAX_BUILD_COUNT))
+
+    # expected work durations (seconds) of the packages of which the
+    # information objects are `pkg_infos`, as a dictionary of package
+    # information objects to durations (only the known ones)
+    #
+    # The expected duration of a package is the median of its last
+    # builds with the same version or, if there's none, with any
+    # version.
+    def expected_durations(self, pkg_infos):
+        pkg_infos = list(pkg_infos)
+        conn = self._get_conn()
+
+        if conn is None:
+            return {}
+
+        try:
+            rows = conn.execute('SELECT name, version, duration FROM durations ORDER BY done_time DESC').fetchall()
+        except (OSError, sqlite3.Error) as exc:
+            _logger.warning('Cannot read duration history: {}'.format(exc))
+            return {}
+
+        names = {pkg_info.name for pkg_info in pkg_infos}
+        by_version = {}
+        by_name = {}
+
+        for name, version, duration in rows:
+            if name not in names:
+                continue
+
+            durations = by_version.setdefault((name, version), [])
+
+            if len(durations) < _EXPECTED_BUILD_COUNT:
+                durations.append(duration)
+
+            durations = by_name.setdefault(name, [])
+
+            if len(durations) < _EXPECTED_BUILD_COUNT:
+                durations.append(duration)
+
+        expected_durations = {}
+
+        for pkg_info in pkg_infos:
+            durations = by_version.get((pkg_info.name, pkg_info.version or ''))
+
+            if durations is None:
+                durations = by_name.get(pkg_info.name)
+
+            if durations is not None:
+                expected_durations[pkg_info] = statistics.median(durations)
+
+        return expected_durations
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+# records the builds of the package builds of a package build monitor
+# (`yobr.br.PkgBuildMonitor`) to a duration history when they're done
+#
+# Call update() with the changed package builds after each monitor
+# update.
+class PkgBuildDurationRecorder:
+    def __init__(self, pkg_build_monitor, history):
+        self._pkg_build_monitor = pkg_build_monitor
+        self._history = history
+
+    @property
+    def history(self):
+        return self._history
+
+    # records the package builds of `changed_pkg_builds` which are now
+    # done
+    def update(self, changed_pkg_builds):
+        monitor = self._pkg_build_monitor
+        builds = []
+
+        for pkg_build in changed_pkg_builds:
+            if not yobr.analysis.is_pkg_build_done(monitor, pkg_build):
+                continue
+
+            done_time = yobr.analysis.pkg_build_done_time(pkg_build)
+
+            if done_time is None:
+                continue
+
+            dep_pkg_builds = [monitor.pkg_build(pkg_info.id) for pkg_info in pkg_build.info.dependencies]
+            duration = yobr.analysis.pkg_build_work_duration(pkg_build,
+                                                             dep_pkg_builds)
+
+            if duration <= 0:
+                # not enough stamps to know
+                continue
+
+            builds.append((pkg_build.info.name, pkg_build.info.version,
+                           done_time, duration))
+
+        if len(builds) > 0:
+            self._history.record_many(builds)
@@ -0,0 +1,93 @@
+# Copyright (c) 2020 Philippe Proulx <eepp.ca>
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Buildroot instrumentation script which sends package build step
+# events to a running yobr
+#
+# Set `BR2_INSTRUMENTATION_SCRIPTS` to the path of the installed
+# `yobr-br-hook` program: Buildroot then runs
+#
+#     yobr-br-hook start|end STEP PKG
+#
+# around each package build step. This program sends the event as a
+# datagram to the UNIX domain socket `YOBR_SOCKET`, or to `.yobr.sock`
+# within the Buildroot output directory by default, and ignores any
+# error (no listening yobr, for example): it must never break the
+# build.
+#
+# This module only imports what it needs: Buildroot runs it many times.
+
+import os
+import sys
+import time
+import socket
+
+
+# name of the socket file within the Buildroot output directory
+SOCKET_FILE_NAME = '.yobr.sock'
+
+
+# default socket path considering the environment `env` (dictionary),
+# or `None` if unknown
+def _socket_path(env):
+    path = env.get('YOBR_SOCKET')
+
+    if path:
+        return path
+
+    # Buildroot passes `O` (output directory) and `BUILD_DIR` to
+    # instrumentation scripts
+    output_dir = env.get('O')
+
+    if not output_dir and env.get('BUILD_DIR'):
+        output_dir = os.path.dirname(os.path.normpath(env['BUILD_DIR']))
+
+    if output_dir:
+        return os.path.join(output_dir, SOCKET_FILE_NAME)
+
+
+# datagram of the step event
+def _format_step_event(event_time, kind, step, pkg_name):
+    return '{:.6f} {} {} {}'.format(event_time, kind, step, pkg_name).encode()
+
+
+def main():
+    try:
+        if len(sys.argv) != 4:
+            return
+
+        kind, step, pkg_name = sys.argv[1:]
+        path = _socket_path(os.environ)
+
+        if path is None:
+            return
+
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+            sock.setblocking(False)
+            sock.sendto(_format_step_event(time.time(), kind, step, pkg_name),
+                        path)
+    except Exception:
+        # no listener, full queue, and the rest: not our problem
+        pass
+
+
+if __name__ == '__main__':
+    main()
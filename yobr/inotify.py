@@ -0,0 +1,163 @@
+# Copyright (c) 2020 Philippe Proulx <eepp.ca>
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# minimal Linux inotify binding (through the C library, using `ctypes`)
+
+import ctypes
+import errno
+import os
+import struct
+
+
+# event masks (see `<sys/inotify.h>`)
+IN_ATTRIB = 0x00000004
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+# `struct inotify_event` without its trailing name
+_EVENT_HEADER = struct.Struct('iIII')
+
+# read buffer size: enough for many events at once
+_READ_SIZE = 64 * 1024
+
+_libc = None
+
+
+# returns the C library, raising `OSError` if it has no inotify support
+def _get_libc():
+    global _libc
+
+    if _libc is None:
+        libc = ctypes.CDLL(None, use_errno=True)
+
+        try:
+            libc.inotify_init1
+            libc.inotify_add_watch
+            libc.inotify_rm_watch
+        except AttributeError:
+            raise OSError(errno.ENOSYS, 'inotify is not available')
+
+        libc.inotify_add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p,
+                                           ctypes.c_uint32)
+        libc.inotify_rm_watch.argtypes = (ctypes.c_int, ctypes.c_int)
+        _libc = libc
+
+    return _libc
+
+
+def _raise_errno(path=None):
+    err = ctypes.get_errno()
+    raise OSError(err, os.strerror(err), path)
+
+
+# an inotify event
+class InotifyEvent:
+    def __init__(self, wd, mask, cookie, name):
+        self._wd = wd
+        self._mask = mask
+        self._cookie = cookie
+        self._name = name
+
+    # watch descriptor
+    @property
+    def wd(self):
+        return self._wd
+
+    @property
+    def mask(self):
+        return self._mask
+
+    @property
+    def cookie(self):
+        return self._cookie
+
+    # name of the file within the watched directory, or `None`
+    @property
+    def name(self):
+        return self._name
+
+
+# a non-blocking inotify instance
+class Inotify:
+    def __init__(self):
+        self._libc = _get_libc()
+        fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+
+        if fd < 0:
+            _raise_errno()
+
+        self._fd = fd
+
+    # file descriptor to wait on (readable when events are available)
+    def fileno(self):
+        return self._fd
+
+    # adds (or modifies) a watch for `path`, returning its descriptor
+    def add_watch(self, path, mask):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), mask)
+
+        if wd < 0:
+            _raise_errno(path)
+
+        return wd
+
+    def rm_watch(self, wd):
+        if self._libc.inotify_rm_watch(self._fd, wd) < 0:
+            _raise_errno()
+
+    # reads and returns all the currently available events (list)
+    def read_events(self):
+        events = []
+
+        while True:
+            try:
+                buf = os.read(self._fd, _READ_SIZE)
+            except BlockingIOError:
+                break
+
+            offset = 0
+
+            while offset + _EVENT_HEADER.size <= len(buf):
+                wd, mask, cookie, name_len = _EVENT_HEADER.unpack_from(buf, offset)
+                offset += _EVENT_HEADER.size
+                name = None
+
+                if name_len > 0:
+                    raw_name = buf[offset:offset + name_len].rstrip(b'\0')
+                    name = os.fsdecode(raw_name)
+                    offset += name_len
+
+                events.append(InotifyEvent(wd, mask, cookie, name))
+
+        return events
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
@@ -0,0 +1,434 @@
+# Copyright (c) 2020 Philippe Proulx <eepp.ca>
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+# `make` wrapper which sends live package build events to a running yobr
+#
+#     yobr-make [MAKE-ARG]...
+#
+# This program runs `make` with the arguments `MAKE-ARG`, writes its
+# output as is, and parses the
+#
+#     >>> PKG VERSION STEP
+#
+# banners which Buildroot prints when it starts a package build step.
+# It sends to the same UNIX domain socket as `yobr.hook`:
+#
+# * The step start events, as well as the step end events which the
+#   banners imply.
+#
+# * The last output lines of each package build.
+#
+# * The package which `make` was building when it failed.
+#
+# Like `yobr.hook`, it ignores any error to send: it must never break
+# the build.
+
+import yobr.hook
+import os
+import os.path
+import re
+import pty
+import sys
+import time
+import fcntl
+import errno
+import signal
+import socket
+import select
+import termios
+import subprocess
+import collections
+
+
+# maximum number of output lines to send per package build and flush
+_OUTPUT_LINE_COUNT = 200
+
+# maximum length of an output line to send
+_MAX_OUTPUT_LINE_LEN = 1024
+
+# maximum size of a datagram (see `yobr.br.PkgBuildStepEventReceiver`)
+_MAX_DATAGRAM_SIZE = 60000
+
+# period (seconds) at which to send the pending output lines
+_FLUSH_PERIOD = .5
+
+# ANSI escape sequences (`tput smso` and `tput rmso` around the banners,
+# compiler colours, and the rest)
+_ANSI_ESCAPE_RE = re.compile(r'\x1b(?:\[[0-?]*[ -/]*[@-~]|[()][0-9A-Za-z]|[@-Z\\-_])')
+
+# Buildroot's package build step banner (the version can be empty)
+_BANNER_RE = re.compile(r'^>>> (\S+) \S* ?(.+)$')
+
+# prefixes of the banner messages to Buildroot step names
+_BANNER_STEPS = (
+    ('Downloading', 'download'),
+    ('Syncing from source dir', 'rsync'),
+    ('Extracting', 'extract'),
+    ('Patching', 'patch'),
+    ('Configuring', 'configure'),
+    ('Building', 'build'),
+    ('Installing to host directory', 'install-host'),
+    ('Installing to staging directory', 'install-staging'),
+    ('Installing to target', 'install-target'),
+    ('Installing to images directory', 'install-image'),
+)
+
+
+# output line `line` (string) without ANSI escape sequences and without
+# what a carriage return erased
+def _clean_line(line):
+    line = _ANSI_ESCAPE_RE.sub('', line.rstrip('\r'))
+    return line[line.rfind('\r') + 1:]
+
+
+# Buildroot step name of the banner message `msg`, or `None` if it's
+# not a step (for example, `Updating config.sub and config.guess`)
+def _banner_step(msg):
+    for prefix, step in _BANNER_STEPS:
+        if msg.startswith(prefix):
+            return step
+
+
+# `(pkg_name, step)` of the banner line `line` (cleaned), or `None` if
+# it's not a banner
+#
+# `pkg_name` is `None` for a banner without a package (for example,
+# `>>>   Finalizing target directory`), and `step` is `None` for a
+# package banner which isn't a step start (for example, `>>> foo 1.0
+# Updating config.sub and config.guess`).
+def _parse_banner(line):
+    if not line.startswith('>>> '):
+        return
+
+    match = _BANNER_RE.match(line)
+
+    if match is None:
+        return None, None
+
+    return match.group(1), _banner_step(match.group(2).strip())
+
+
+# value of the last `make` variable assignment `name=VALUE` of `args`,
+# or `None`
+def _make_var(args, name):
+    value = None
+
+    for arg in args:
+        if arg.startswith(name + '='):
+            value = arg[len(name) + 1:]
+
+    return value
+
+
+# directory of the last `-C`/`--directory` option of `args`, or `None`
+def _make_dir(args):
+    value = None
+
+    for i, arg in enumerate(args):
+        if arg in ('-C', '--directory'):
+            if i + 1 < len(args):
+                value = args[i + 1]
+        elif arg.startswith('--directory='):
+            value = arg[len('--directory='):]
+        elif arg.startswith('-C'):
+            value = arg[2:]
+
+    return value
+
+
+# path of the socket to send the events to, considering the `make`
+# arguments `args` and the environment `env` (dictionary)
+def _socket_path(args, env):
+    path = env.get('YOBR_SOCKET')
+
+    if path:
+        return path
+
+    base_dir = os.path.join(os.getcwd(), _make_dir(args) or '')
+    output_dir = _make_var(args, 'O') or env.get('O') or 'output'
+    return os.path.join(base_dir, output_dir, yobr.hook.SOCKET_FILE_NAME)
+
+
+# `True` if the `make` arguments `args` or the environment `env`
+# (dictionary) request parallel jobs
+def _is_parallel(args, env):
+    words = list(args) + env.get('MAKEFLAGS', '').split()
+
+    for i, word in enumerate(words):
+        if word in ('-j', '--jobs'):
+            # `-j` alone means no limit
+            if i + 1 < len(words) and words[i + 1] == '1':
+                continue
+
+            return True
+
+        for prefix in ('--jobs=', '-j'):
+            if word.startswith(prefix) and word[len(prefix):] != '1':
+                return True
+
+    return False
+
+
+# datagram of the output lines `lines` of the package named `pkg_name`,
+# dropping the oldest lines to fit in a datagram
+def _format_output_event(event_time, pkg_name, lines):
+    header = '{:.6f} output {}'.format(event_time, pkg_name).encode()
+    encoded_lines = []
+    size = len(header)
+
+    for line in reversed(lines):
+        encoded_line = line[:_MAX_OUTPUT_LINE_LEN].encode(errors='replace')
+        size += len(encoded_line) + 1
+
+        if size > _MAX_DATAGRAM_SIZE:
+            break
+
+        encoded_lines.append(encoded_line)
+
+    encoded_lines.append(header)
+    return b'\n'.join(reversed(encoded_lines))
+
+
+# datagram of the failure of `make` while building the package named
+# `pkg_name`
+def _format_failure_event(event_time, pkg_name):
+    return '{:.6f} fail {}'.format(event_time, pkg_name).encode()
+
+
+# parser of the output of `make` which sends the events to the socket
+# `path`
+#
+# If `is_parallel` is `False`, a banner also ends the step of the
+# previous banner: `make` runs one recipe at a time.
+class _MakeOutputParser:
+    def __init__(self, path, is_parallel):
+        self._path = path
+        self._is_parallel = is_parallel
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.setblocking(False)
+
+        # incomplete last line (bytes)
+        self._partial_line = b''
+
+        # package names to current steps
+        self._steps = {}
+
+        # name of the package of the last banner, if any
+        self._pkg_name = None
+
+        # package names to output lines to send (ring buffers)
+        self._pending_lines = {}
+        self._flush_time = time.monotonic()
+
+    def _send(self, data):
+        try:
+            self._sock.sendto(data, self._path)
+        except OSError:
+            # no listener, full queue, and the rest: not our problem
+            pass
+
+    def _send_step_event(self, kind, step, pkg_name):
+        self._send(yobr.hook._format_step_event(time.time(), kind, step,
+                                                pkg_name))
+
+    # ends the current step of the package named `pkg_name`, if any
+    def _end_step(self, pkg_name):
+        step = self._steps.pop(pkg_name, None)
+
+        if step is not None:
+            self._send_step_event('end', step, pkg_name)
+
+    # sends the pending output lines
+    def flush(self):
+        now = time.time()
+
+        for pkg_name, lines in self._pending_lines.items():
+            self._send(_format_output_event(now, pkg_name, list(lines)))
+
+        self._pending_lines = {}
+        self._flush_time = time.monotonic()
+
+    # sends the pending output lines if it's time to
+    def flush_if_due(self):
+        if time.monotonic() - self._flush_time >= _FLUSH_PERIOD:
+            self.flush()
+
+    def _parse_line(self, line):
+        line = _clean_line(line.decode(errors='replace'))
+        banner = _parse_banner(line)
+
+        if banner is not None:
+            pkg_name, step = banner
+
+            if step is not None or pkg_name is None:
+                # another recipe: the previous lines belong to the
+                # previous step
+                self.flush()
+
+                if not self._is_parallel and self._pkg_name is not None:
+                    self._end_step(self._pkg_name)
+
+            self._pkg_name = pkg_name
+
+            if step is not None:
+                self._end_step(pkg_name)
+                self._steps[pkg_name] = step
+                self._send_step_event('start', step, pkg_name)
+
+        if self._pkg_name is None:
+            return
+
+        lines = self._pending_lines.get(self._pkg_name)
+
+        if lines is None:
+            lines = collections.deque(maxlen=_OUTPUT_LINE_COUNT)
+            self._pending_lines[self._pkg_name] = lines
+
+        lines.append(line)
+
+    # parses the output data `data` (bytes)
+    def feed(self, data):
+        lines = (self._partial_line + data).split(b'\n')
+
+        # the last element is empty or incomplete
+        self._partial_line = lines.pop()
+
+        for line in lines:
+            self._parse_line(line)
+
+        self.flush_if_due()
+
+    # finishes with the exit status `status` of `make`
+    def finish(self, status):
+        if len(self._partial_line) > 0:
+            self._parse_line(self._partial_line)
+            self._partial_line = b''
+
+        self.flush()
+
+        if status == 0:
+            # all done
+            for pkg_name in list(self._steps):
+                self._end_step(pkg_name)
+        elif self._pkg_name is not None:
+            self._send(_format_failure_event(time.time(), self._pkg_name))
+
+        self._sock.close()
+
+
+# writes all of `data` (bytes) to the file descriptor `fd`
+def _write_all(fd, data):
+    while len(data) > 0:
+        try:
+            count = os.write(fd, data)
+        except BlockingIOError:
+            select.select([], [fd], [])
+            continue
+
+        data = data[count:]
+
+
+# runs `make` with the arguments `args`, passing its output to
+# `parser` and to the standard output, and returns its exit status
+#
+# When the standard output is a terminal, `make` writes to a
+# pseudoterminal so that its output (colours, for example) is the same
+# as without this wrapper; otherwise, its standard error is redirected
+# to its standard output.
+def _run_make(args, parser):
+    out_fd = sys.stdout.fileno()
+
+    if os.isatty(out_fd):
+        read_fd, slave_fd = pty.openpty()
+
+        # same size as the terminal
+        winsize = fcntl.ioctl(out_fd, termios.TIOCGWINSZ, b'\0' * 8)
+        fcntl.ioctl(slave_fd, termios.TIOCSWINSZ, winsize)
+
+        # no output processing: the terminal already does it (`\n` to
+        # `\r\n`, for example)
+        attrs = termios.tcgetattr(slave_fd)
+        attrs[1] &= ~termios.OPOST
+        termios.tcsetattr(slave_fd, termios.TCSANOW, attrs)
+        proc = subprocess.Popen(['make'] + args, stdout=slave_fd,
+                                stderr=slave_fd)
+        os.close(slave_fd)
+    else:
+        proc = subprocess.Popen(['make'] + args, stdout=subprocess.PIPE,
+                                stderr=subprocess.STDOUT)
+        read_fd = proc.stdout.fileno()
+
+    # `make` handles Ctrl+C (same process group): keep reading its
+    # output until it exits
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    while True:
+        readable, _, _ = select.select([read_fd], [], [], _FLUSH_PERIOD)
+
+        if len(readable) == 0:
+            parser.flush_if_due()
+            continue
+
+        try:
+            data = os.read(read_fd, 65536)
+        except OSError as exc:
+            # Linux: no more writers of the pseudoterminal
+            if exc.errno != errno.EIO:
+                raise
+
+            data = b''
+
+        if len(data) == 0:
+            break
+
+        _write_all(out_fd, data)
+        parser.feed(data)
+
+    if proc.stdout is None:
+        os.close(read_fd)
+
+    status = proc.wait()
+
+    if status < 0:
+        # killed by a signal: like a shell
+        status = 128 - status
+
+    return status
+
+
+def main():
+    args = sys.argv[1:]
+    parser = _MakeOutputParser(_socket_path(args, os.environ),
+                               _is_parallel(args, os.environ))
+
+    try:
+        status = _run_make(args, parser)
+    except OSError as exc:
+        print('Error: cannot run `make`: {}'.format(exc), file=sys.stderr)
+        status = 127
+
+    parser.finish(status)
+    sys.exit(status)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,285 @@
+# Copyright (c) 2020 Philippe Proulx <eepp.ca>
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# OpenMetrics (Prometheus) exporter of the state of a package build
+# monitor
+#
+# The exporter serves the metrics over HTTP from its own thread. The
+# thread which updates the monitor also renders the metrics text when
+# something changes (see `MetricsExporter.update()`): a scrape only
+# returns this cached text; it never reads the build directory.
+
+import time
+import socket
+import logging
+import threading
+import http.server
+import yobr.br
+
+
+_logger = logging.getLogger(__name__)
+
+# default TCP port of the HTTP server
+DEFAULT_PORT = 9866
+
+# upper bounds (seconds) of the step duration histogram buckets
+_DURATION_BUCKETS = (1, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600,
+                     7200)
+
+# steps (the stages which they reach) of the step duration histogram
+_STEP_STAGES = (
+    yobr.br.PkgBuildStage.EXTRACTED,
+    yobr.br.PkgBuildStage.PATCHED,
+    yobr.br.PkgBuildStage.CONFIGURED,
+    yobr.br.PkgBuildStage.BUILT,
+    yobr.br.PkgBuildStage.INSTALLED,
+)
+
+_CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+
+def _escape_label_value(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_number(value):
+    if type(value) is int:
+        return str(value)
+
+    return repr(float(value))
+
+
+# renders the OpenMetrics text of the state of the package build
+# monitor `pkg_build_monitor` (`yobr.br.PkgBuildMonitor`)
+#
+# `estimate` (`yobr.analysis.BuildEstimate`) and `critical_path`
+# (`yobr.analysis.PkgBuildCriticalPath`) are optional.
+def render_metrics(pkg_build_monitor, estimate=None, critical_path=None):
+    lines = []
+
+    def add_family(name, metric_type, help_text, unit=None):
+        lines.append('# TYPE {} {}'.format(name, metric_type))
+
+        if unit is not None:
+            lines.append('# UNIT {} {}'.format(name, unit))
+
+        lines.append('# HELP {} {}'.format(name, help_text))
+
+    def add_sample(name, labels, value):
+        if len(labels) > 0:
+            label_text = ','.join('{}="{}"'.format(k, _escape_label_value(v))
+                                  for k, v in labels)
+            name = '{}{{{}}}'.format(name, label_text)
+
+        lines.append('{} {}'.format(name, _format_number(value)))
+
+    monitor = pkg_build_monitor
+    pkg_builds = sorted(monitor.pkg_builds.values(), key=lambda pb: pb.info.name)
+
+    # package counts per stage and type
+    counts = {}
+
+    for pkg_build in pkg_builds:
+        key = (monitor.stage(pkg_build), pkg_build.info.type_name)
+        counts[key] = counts.get(key, 0) + 1
+
+    add_family('yobr_packages', 'gauge', 'Number of packages per build stage and type.')
+
+    for stage in yobr.br.PkgBuildStage:
+        for type_name in ('host', 'target'):
+            add_sample('yobr_packages',
+                       (('stage', stage.value), ('type', type_name)),
+                       counts.get((stage, type_name), 0))
+
+    add_family('yobr_packages_in_progress', 'gauge',
+               'Number of packages which are currently being built.')
+    add_sample('yobr_packages_in_progress', (),
+               len(monitor.in_progress_pkg_builds))
+
+    # current stage of each package
+    add_family('yobr_package_stage', 'stateset', 'Current build stage of each package.')
+
+    for pkg_build in pkg_builds:
+        cur_stage = monitor.stage(pkg_build)
+
+        for stage in yobr.br.PkgBuildStage:
+            add_sample('yobr_package_stage',
+                       (('package', pkg_build.info.name),
+                        ('type', pkg_build.info.type_name),
+                        ('yobr_package_stage', stage.value)),
+                       1 if stage is cur_stage else 0)
+
+    # step durations
+    durations = {stage: [] for stage in _STEP_STAGES}
+
+    for pkg_build in pkg_builds:
+        for stage, duration in pkg_build.stage_durations.items():
+            durations[stage].append(duration)
+
+    add_family('yobr_package_step_duration_seconds', 'histogram',
+               'Durations of the package build steps (from stamp file modification times), per reached stage.',
+               'seconds')
+
+    for stage in _STEP_STAGES:
+        stage_durations = durations[stage]
+        labels = (('stage', stage.value),)
+
+        for bucket in _DURATION_BUCKETS:
+            count = sum(1 for d in stage_durations if d <= bucket)
+            add_sample('yobr_package_step_duration_seconds_bucket',
+                       labels + (('le', _format_number(float(bucket))),),
+                       count)
+
+        add_sample('yobr_package_step_duration_seconds_bucket',
+                   labels + (('le', '+Inf'),), len(stage_durations))
+        add_sample('yobr_package_step_duration_seconds_count', labels,
+                   len(stage_durations))
+        add_sample('yobr_package_step_duration_seconds_sum', labels,
+                   float(sum(stage_durations)))
+
+    if critical_path is not None:
+        add_family('yobr_critical_path_seconds', 'gauge',
+                   'Total duration of the completed steps of the critical path.',
+                   'seconds')
+        add_sample('yobr_critical_path_seconds', (), float(critical_path.length))
+        add_family('yobr_critical_path_packages', 'gauge',
+                   'Number of packages of the critical path.')
+        add_sample('yobr_critical_path_packages', (),
+                   len(critical_path.pkg_builds))
+
+    if estimate is not None and estimate.end_time is not None:
+        add_family('yobr_build_expected_end_timestamp_seconds', 'gauge',
+                   'Expected end time of the build (from the duration history).',
+                   'seconds')
+        add_sample('yobr_build_expected_end_timestamp_seconds', (),
+                   float(estimate.end_time))
+
+    add_family('yobr_last_change_timestamp_seconds', 'gauge',
+               'Time of the last package build stage change.', 'seconds')
+    add_sample('yobr_last_change_timestamp_seconds', (), time.time())
+    lines.append('# EOF')
+    return '\n'.join(lines) + '\n'
+
+
+class _RequestHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?', 1)[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+
+        # cached text only: never read the filesystem here
+        body = self.server.exporter._body
+        self.send_response(200)
+        self.send_header('Content-Type', _CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        _logger.debug('{}: {}'.format(self.address_string(), fmt % args))
+
+
+# threaded HTTP server of which the address family (IPv4 or IPv6) is
+# the one of its host (`http.server.ThreadingHTTPServer` is IPv4 only)
+class _HttpServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, server_address, handler_class):
+        infos = socket.getaddrinfo(server_address[0], server_address[1],
+                                   type=socket.SOCK_STREAM)
+        self.address_family = infos[0][0]
+        super().__init__(server_address, handler_class)
+
+
+# exporter of the state of the package build monitor
+# `pkg_build_monitor` (`yobr.br.PkgBuildMonitor`) as OpenMetrics, served
+# by an HTTP server listening on `host` and `port` (`GET /metrics`)
+#
+# Call update() from the thread which updates the monitor, after each
+# update. The HTTP server runs within its own daemon thread once you
+# call start().
+class MetricsExporter:
+    def __init__(self, pkg_build_monitor, host='127.0.0.1', port=DEFAULT_PORT):
+        self._pkg_build_monitor = pkg_build_monitor
+        self._body = render_metrics(pkg_build_monitor).encode()
+        self._server = _HttpServer((host, port), _RequestHandler)
+        self._server.exporter = self
+        self._thread = None
+
+    # `(host, port)` pair of the HTTP server
+    @property
+    def address(self):
+        return self._server.server_address[:2]
+
+    # starts serving the metrics
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name='yobr-metrics', daemon=True)
+        self._thread.start()
+        host, port = self.address
+
+        if ':' in host:
+            # IPv6
+            host = '[{}]'.format(host)
+
+        _logger.info('Serving metrics on http://{}:{}/metrics.'.format(host, port))
+
+    # renders the metrics again if `changed_pkg_builds` (package builds
+    # of which the stage changed) isn't empty or if `force` is `True`
+    #
+    # `estimate` and `critical_path`: see render_metrics().
+    def update(self, changed_pkg_builds, estimate=None, critical_path=None,
+               force=False):
+        if len(changed_pkg_builds) == 0 and not force:
+            return
+
+        # replace the whole text: the server thread could be sending
+        # the previous one
+        self._body = render_metrics(self._pkg_build_monitor, estimate,
+                                    critical_path).encode()
+
+    # stops serving the metrics
+    def close(self):
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+
+        self._server.server_close()
+
+
+# parses the metrics address `addr` (`[HOST:]PORT`), returning a
+# `(host, port)` pair
+def parse_address(addr):
+    host = '127.0.0.1'
+
+    if ':' in addr:
+        host, port = addr.rsplit(':', 1)
+        host = host.strip('[]')
+    else:
+        port = addr
+
+    try:
+        port = int(port)
+    except ValueError:
+        raise ValueError('Invalid metrics port: `{}`'.format(port))
+
+    return host, port
@@ -0,0 +1,346 @@
+# Copyright (c) 2020 Philippe Proulx <eepp.ca>
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# build stages shared between several yobr instances through a
+# memory-mapped state file
+#
+# The first instance which locks the state file (see
+# `SharedPkgBuildState.acquire()`) is its publisher: it reads the stamp
+# files as usual and writes its stages to the file. The other
+# instances read the stages from the file instead of reading the stamp
+# files, so that the number of instances doesn't change the load on the
+# file system. When the publisher exits, another instance takes over.
+#
+# File format (little endian):
+#
+#     magic (`YOBRSHM\0`)                  8 bytes
+#     format version                       u32
+#     package count (N)                    u32
+#     package graph key                    16 bytes
+#     sequence number                      u64
+#     publisher's process ID               u32
+#     reserved                             u32
+#     stage index per package ID           N bytes (then padding to 8)
+#     stage times per package ID           N * 7 doubles (NaN: unknown)
+#
+# The sequence number is odd while the publisher writes: a reader
+# retries until it reads the same even sequence number before and
+# after copying the data.
+
+import os
+import os.path
+import time
+import math
+import mmap
+import array
+import fcntl
+import struct
+import hashlib
+import logging
+import yobr.br
+import yobr.utils
+
+
+_logger = logging.getLogger(__name__)
+
+_MAGIC = b'YOBRSHM\0'
+_VERSION = 1
+_HEADER = struct.Struct('<8sII16sQII')
+_SEQ = struct.Struct('<Q')
+_SEQ_OFFSET = 32
+_STAGE_COUNT = len(yobr.br._PKG_BUILD_STAGES)
+
+# number of attempts to read a consistent snapshot before giving up
+# until the next update
+_READ_ATTEMPTS = 20
+
+
+# default path of the state file for the Buildroot build directory
+# `br_build_dir`: within its output directory
+def default_state_path(br_build_dir):
+    return os.path.join(yobr.br.br_output_dir(br_build_dir), '.yobr-state')
+
+
+# key (16 bytes) of the package graph `graph`: two instances share
+# their stages only if their keys are equal
+def _graph_key(graph):
+    h = hashlib.sha256()
+
+    for pkg_info in graph.pkg_infos:
+        h.update('{} {}\n'.format(pkg_info.name, pkg_info.version).encode())
+
+    return h.digest()[:16]
+
+
+def _stage_times_offset(count):
+    return _HEADER.size + (count + 7) // 8 * 8
+
+
+def _file_size(count):
+    return _stage_times_offset(count) + count * _STAGE_COUNT * 8
+
+
+# build stages of the package graph `graph` shared through the state
+# file `path`
+#
+# The file doesn't need to exist: acquire() creates it.
+class SharedPkgBuildState:
+    def __init__(self, path, graph):
+        self._logger = yobr.utils._get_obj_logger(self, path)
+        self._path = path
+        self._graph = graph
+        self._key = _graph_key(graph)
+        self._size = _file_size(len(graph))
+        self._times_offset = _stage_times_offset(len(graph))
+        self._fd = None
+        self._is_writable = False
+        self._mm = None
+        self._is_publisher = False
+
+        # publisher: stage times (same layout as in the file) and
+        # `True` if it needs to write all of them
+        self._times = None
+        self._is_published = False
+
+        # reader: sequence number and stage times (bytes) of the last
+        # snapshot
+        self._last_seq = None
+        self._last_times_data = None
+
+    @property
+    def path(self):
+        return self._path
+
+    # `True` if this instance publishes its stages
+    @property
+    def is_publisher(self):
+        return self._is_publisher
+
+    def _open(self):
+        if self._fd is not None:
+            return True
+
+        try:
+            self._fd = os.open(self._path, os.O_RDWR | os.O_CREAT | os.O_CLOEXEC,
+                               0o666)
+            self._is_writable = True
+        except PermissionError:
+            # read only, then
+            try:
+                self._fd = os.open(self._path, os.O_RDONLY | os.O_CLOEXEC)
+            except OSError:
+                return False
+        except OSError:
+            # the output directory doesn't exist yet, for example
+            return False
+
+        return True
+
+    def _unmap(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+
+    # tries to become the publisher, returning `True` if this instance
+    # just became it
+    def acquire(self):
+        if self._is_publisher:
+            return False
+
+        if not self._open() or not self._is_writable:
+            return False
+
+        try:
+            fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            # another instance publishes
+            return False
+        except OSError as exc:
+            self._logger.warning('Cannot lock state file: {}'.format(exc))
+            return False
+
+        try:
+            if os.fstat(self._fd).st_size != self._size:
+                os.ftruncate(self._fd, self._size)
+
+            self._unmap()
+            self._mm = mmap.mmap(self._fd, self._size)
+        except OSError as exc:
+            self._logger.warning('Cannot map state file: {}'.format(exc))
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            return False
+
+        self._is_publisher = True
+        self._is_published = False
+        self._times = array.array('d', [math.nan]) * (len(self._graph) * _STAGE_COUNT)
+        self._logger.info('Publishing the build stages.')
+        return True
+
+    # writes the stages of the package build monitor `pkg_build_monitor`
+    # if the stages of the package builds `changed_pkg_builds` changed
+    # (or if it never wrote them)
+    def publish(self, pkg_build_monitor, changed_pkg_builds):
+        if self._is_published:
+            pkg_builds = changed_pkg_builds
+        else:
+            pkg_builds = pkg_build_monitor.pkg_builds.values()
+
+        if len(pkg_builds) == 0:
+            return
+
+        for pkg_build in pkg_builds:
+            base = pkg_build.info.id * _STAGE_COUNT
+
+            for index in range(_STAGE_COUNT):
+                self._times[base + index] = math.nan
+
+            for stage, stage_time in pkg_build.stage_times.items():
+                self._times[base + yobr.br._PKG_BUILD_STAGE_INDEXES[stage]] = stage_time
+
+        mm = self._mm
+        seq = _HEADER.unpack_from(mm)[4]
+
+        if seq % 2 == 1:
+            # previous publisher died while writing
+            seq += 1
+
+        # odd: writing
+        _SEQ.pack_into(mm, _SEQ_OFFSET, seq + 1)
+        _HEADER.pack_into(mm, 0, _MAGIC, _VERSION, len(self._graph),
+                          self._key, seq + 1, os.getpid(), 0)
+        stages = pkg_build_monitor.stages.indexes.tobytes()
+        mm[_HEADER.size:_HEADER.size + len(stages)] = stages
+        times = self._times.tobytes()
+        mm[self._times_offset:self._times_offset + len(times)] = times
+
+        # even: done
+        _SEQ.pack_into(mm, _SEQ_OFFSET, seq + 2)
+        self._is_published = True
+
+    def _map_for_reading(self):
+        if not self._open():
+            return False
+
+        try:
+            size = os.fstat(self._fd).st_size
+        except OSError:
+            return False
+
+        if self._mm is not None and len(self._mm) == size:
+            return True
+
+        self._unmap()
+        self._last_seq = None
+        self._last_times_data = None
+
+        if size != self._size:
+            # no publisher yet or other package graph
+            return False
+
+        try:
+            self._mm = mmap.mmap(self._fd, size, access=mmap.ACCESS_READ)
+        except OSError:
+            return False
+
+        return True
+
+    # reads the stages which the publisher wrote, returning a dictionary
+    # of package builds of `pkg_build_monitor` to new stages (possibly
+    # empty), or `None` if there's nothing to read (no publisher, or a
+    # publisher with another package graph): the caller needs to read
+    # the stamp files itself
+    #
+    # This method also sets the stage times of the package builds.
+    def read(self, pkg_build_monitor):
+        if not self._map_for_reading():
+            return
+
+        mm = self._mm
+
+        for _ in range(_READ_ATTEMPTS):
+            seq = _SEQ.unpack_from(mm, _SEQ_OFFSET)[0]
+
+            if seq % 2 == 1:
+                # publisher is writing
+                time.sleep(.001)
+                continue
+
+            if seq == self._last_seq:
+                # nothing new
+                return {}
+
+            header = _HEADER.unpack_from(mm)
+            data = mm[_HEADER.size:]
+
+            if _SEQ.unpack_from(mm, _SEQ_OFFSET)[0] == seq:
+                break
+        else:
+            # busy publisher: try again next time
+            return {}
+
+        magic, version, count, key = header[:4]
+
+        if magic != _MAGIC or version != _VERSION or count != len(self._graph) or key != self._key:
+            return
+
+        times_offset = self._times_offset - _HEADER.size
+        times_data = data[times_offset:times_offset + count * _STAGE_COUNT * 8]
+        times = array.array('d')
+        times.frombytes(times_data)
+        pkg_times_size = _STAGE_COUNT * 8
+        stages = {}
+
+        for pkg_id in range(count):
+            pkg_build = pkg_build_monitor.pkg_build(pkg_id)
+            offset = pkg_id * pkg_times_size
+
+            # compare the bytes: NaN isn't equal to itself
+            if self._last_times_data is None or times_data[offset:offset + pkg_times_size] != self._last_times_data[offset:offset + pkg_times_size]:
+                base = pkg_id * _STAGE_COUNT
+                stage_times = {}
+
+                for index, stage_time in enumerate(times[base:base + _STAGE_COUNT]):
+                    if not math.isnan(stage_time):
+                        stage_times[yobr.br._PKG_BUILD_STAGES[index]] = stage_time
+
+                pkg_build._set_stage_times(stage_times)
+
+            stage = yobr.br._PKG_BUILD_STAGES[data[pkg_id]]
+
+            if pkg_build_monitor.stage(pkg_build) is not stage:
+                stages[pkg_build] = stage
+
+        if self._last_seq is None:
+            self._logger.info('Reading the build stages of process {}.'.format(header[5]))
+
+        self._last_seq = seq
+        self._last_times_data = times_data
+        return stages
+
+    def close(self):
+        self._unmap()
+
+        if self._fd is not None:
+            # also releases the lock
+            os.close(self._fd)
+            self._fd = None
+
+        self._is_publisher = False
@@ -0,0 +1,343 @@
+# Copyright (c) 2020 Philippe Proulx <eepp.ca>
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# build timeline: package build stage transition log and timeline bars
+#
+# A transition log is an append-only NDJSON file: each line is a JSON
+# object for one stage transition, for example:
+#
+#     {"time": 1581023645.21, "pkg": "host-m4", "old-stage": "configured",
+#      "new-stage": "built", "stamp-mtime": 1581023644.93}
+#
+# `time` is when yobr observed the transition and `stamp-mtime` is the
+# modification time of the stamp file of the new stage (`null` if
+# unknown), both in seconds since the Epoch.
+#
+# When the log file reaches a maximum size, it's rotated like with
+# `logging.handlers.RotatingFileHandler`: `FILE` becomes `FILE.1`,
+# `FILE.1` becomes `FILE.2`, and so on.
+
+import os
+import json
+import time
+import yobr.br
+
+
+# default maximum size of a transition log file (bytes)
+DEFAULT_MAX_SIZE = 8 * 1024 * 1024
+
+# default number of rotated transition log files to keep
+DEFAULT_BACKUP_COUNT = 3
+
+
+# writer of package build stage transitions to a log file at `path`,
+# keeping at most `backup_count` rotated files of about `max_size`
+# bytes
+class PkgBuildStageTransitionLog:
+    def __init__(self, path, max_size=DEFAULT_MAX_SIZE,
+                 backup_count=DEFAULT_BACKUP_COUNT):
+        self._path = path
+        self._max_size = max_size
+        self._backup_count = backup_count
+        self._file = None
+
+    @property
+    def path(self):
+        return self._path
+
+    def _open(self):
+        if self._file is None:
+            self._file = open(self._path, 'a', encoding='utf-8')
+
+    def _rotate(self):
+        self.close()
+
+        if self._backup_count > 0:
+            for i in range(self._backup_count - 1, 0, -1):
+                src = '{}.{}'.format(self._path, i)
+
+                if os.path.exists(src):
+                    os.replace(src, '{}.{}'.format(self._path, i + 1))
+
+            os.replace(self._path, self._path + '.1')
+        else:
+            os.remove(self._path)
+
+    # appends the stage transitions `transitions` (iterable of
+    # `yobr.br.PkgBuildStageTransition`) to the log
+    def write(self, transitions):
+        self._open()
+        lines = []
+
+        for transition in transitions:
+            obj = {
+                'time': round(transition.observed_time, 3),
+                'pkg': transition.pkg_build.info.name,
+                'old-stage': transition.old_stage.value,
+                'new-stage': transition.new_stage.value,
+                'stamp-mtime': transition.stamp_mtime,
+            }
+            lines.append(json.dumps(obj, separators=(',', ':')) + '\n')
+
+        self._file.write(''.join(lines))
+        self._file.flush()
+
+        if self._max_size > 0 and self._file.tell() >= self._max_size:
+            self._rotate()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+# a package build stage transition read from a transition log
+class LoggedPkgBuildStageTransition:
+    __slots__ = ('_pkg_name', '_old_stage', '_new_stage', '_stamp_mtime',
+                 '_observed_time')
+
+    def __init__(self, pkg_name, old_stage, new_stage, stamp_mtime,
+                 observed_time):
+        self._pkg_name = pkg_name
+        self._old_stage = old_stage
+        self._new_stage = new_stage
+        self._stamp_mtime = stamp_mtime
+        self._observed_time = observed_time
+
+    @property
+    def pkg_name(self):
+        return self._pkg_name
+
+    @property
+    def old_stage(self):
+        return self._old_stage
+
+    @property
+    def new_stage(self):
+        return self._new_stage
+
+    @property
+    def stamp_mtime(self):
+        return self._stamp_mtime
+
+    @property
+    def observed_time(self):
+        return self._observed_time
+
+
+# yields the package build stage transitions
+# (`LoggedPkgBuildStageTransition`) of the transition log at `path`,
+# including its rotated files, from the oldest to the newest
+#
+# Skips the lines which aren't valid transitions (for example, a last
+# line which yobr was writing when it was killed).
+def read_pkg_build_stage_transitions(path):
+    paths = []
+    i = 1
+
+    while os.path.exists('{}.{}'.format(path, i)):
+        paths.append('{}.{}'.format(path, i))
+        i += 1
+
+    paths.reverse()
+
+    if os.path.exists(path):
+        paths.append(path)
+
+    for log_path in paths:
+        with open(log_path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    obj = json.loads(line)
+                    yield LoggedPkgBuildStageTransition(obj['pkg'],
+                                                        yobr.br.PkgBuildStage(obj['old-stage']),
+                                                        yobr.br.PkgBuildStage(obj['new-stage']),
+                                                        obj.get('stamp-mtime'),
+                                                        obj['time'])
+                except (ValueError, KeyError, TypeError):
+                    continue
+
+
+# a bar of a build timeline: when a package build went through its
+# steps, from extracted to done (installed or, if not installable,
+# built)
+#
+# Each segment is a `(stage, start_time, end_time)` tuple (times in
+# seconds since the Epoch) for the step which reaches `stage`. The last
+# segment of a package build in progress ends at the time of the
+# timeline.
+class PkgBuildTimelineBar:
+    __slots__ = ('_pkg_build', '_segments', '_is_done')
+
+    def __init__(self, pkg_build, segments, is_done):
+        self._pkg_build = pkg_build
+        self._segments = tuple(segments)
+        self._is_done = is_done
+
+    @property
+    def pkg_build(self):
+        return self._pkg_build
+
+    @property
+    def segments(self):
+        return self._segments
+
+    @property
+    def start_time(self):
+        return self._segments[0][1]
+
+    @property
+    def end_time(self):
+        return self._segments[-1][2]
+
+    # `True` if the package build is done
+    @property
+    def is_done(self):
+        return self._is_done
+
+
+# stages of the steps of a timeline bar, in build order
+_TIMELINE_STAGES = (
+    yobr.br.PkgBuildStage.EXTRACTED,
+    yobr.br.PkgBuildStage.PATCHED,
+    yobr.br.PkgBuildStage.CONFIGURED,
+    yobr.br.PkgBuildStage.BUILT,
+    yobr.br.PkgBuildStage.INSTALLED,
+)
+
+
+# timeline bar of the package build `pkg_build` at `now` (seconds since
+# the Epoch) from its stage times, or `None` if it's not extracted
+def _pkg_build_timeline_bar(pkg_build, now):
+    times = pkg_build.stage_times
+    start_time = times.get(yobr.br.PkgBuildStage.EXTRACTED)
+
+    if start_time is None:
+        return
+
+    last_stage = yobr.br.PkgBuildStage.INSTALLED
+
+    if not pkg_build.info.is_installable:
+        last_stage = yobr.br.PkgBuildStage.BUILT
+
+    segments = []
+    prev_time = start_time
+    next_stage = None
+
+    for stage in _TIMELINE_STAGES[1:]:
+        stage_time = times.get(stage)
+
+        if stage_time is None:
+            if next_stage is None:
+                next_stage = stage
+
+            continue
+
+        next_stage = None
+
+        if stage_time >= prev_time:
+            segments.append((stage, prev_time, stage_time))
+            prev_time = stage_time
+
+        if stage is last_stage:
+            break
+
+    is_done = last_stage in times
+
+    if not is_done:
+        # step in progress
+        segments.append((next_stage or last_stage, prev_time,
+                         max(now, prev_time)))
+
+    if len(segments) == 0:
+        # extracted and done at the same time
+        segments.append((last_stage, start_time, start_time))
+
+    return PkgBuildTimelineBar(pkg_build, segments, is_done)
+
+
+# timeline bars of the package builds `pkg_builds` at `now` (seconds
+# since the Epoch; current time if `None`), sorted by start time
+def pkg_build_timeline_bars(pkg_builds, now=None):
+    if now is None:
+        now = time.time()
+
+    bars = []
+
+    for pkg_build in pkg_builds:
+        bar = _pkg_build_timeline_bar(pkg_build, now)
+
+        if bar is not None:
+            bars.append(bar)
+
+    bars.sort(key=lambda bar: (bar.start_time, bar.pkg_build.info.name))
+    return bars
+
+
+# concurrency of the timeline bars `bars`: list of `(time, count)`
+# pairs, sorted by time, where `count` is the number of bars (package
+# builds in progress) from `time` to the time of the next pair
+def timeline_concurrency(bars):
+    events = []
+
+    for bar in bars:
+        events.append((bar.start_time, 1))
+        events.append((bar.end_time, -1))
+
+    # at the same time, end before starting
+    events.sort(key=lambda event: (event[0], event[1]))
+    steps = []
+    count = 0
+
+    for event_time, delta in events:
+        count += delta
+
+        if len(steps) > 0 and steps[-1][0] == event_time:
+            steps[-1] = (event_time, count)
+        else:
+            steps.append((event_time, count))
+
+    return steps
+
+
+# statistics of the concurrency steps `steps` (see
+# timeline_concurrency()): `(max_count, average_count, durations)`
+# where `durations` is a dictionary of counts to total durations
+# (seconds)
+def timeline_concurrency_stats(steps):
+    durations = {}
+    max_count = 0
+    weighted_sum = 0.
+    total_duration = 0.
+
+    for (step_time, count), (next_time, _) in zip(steps, steps[1:]):
+        duration = next_time - step_time
+        durations[count] = durations.get(count, 0.) + duration
+        max_count = max(max_count, count)
+        weighted_sum += count * duration
+        total_duration += duration
+
+    average_count = 0.
+
+    if total_duration > 0:
+        average_count = weighted_sum / total_duration
+
+    return max_count, average_count, durations
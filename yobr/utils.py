@@ -29,3 +29,19 @@ def _get_obj_logger(obj, id=None):
         name += ' ({})'.format(id)
 
     return logging.getLogger(name)
+
+
+# formats the duration `seconds` for humans, for example `1h 02m 03s`
+def _format_duration(seconds):
+    seconds = int(round(seconds))
+
+    if seconds < 60:
+        return '{}s'.format(seconds)
+
+    minutes, seconds = divmod(seconds, 60)
+
+    if minutes < 60:
+        return '{}m {:02}s'.format(minutes, seconds)
+
+    hours, minutes = divmod(minutes, 60)
+    return '{}h {:02}m {:02}s'.format(hours, minutes, seconds)